@@ -2,7 +2,7 @@ from flask import Flask
 from config import Config
 import os
 
-def create_app():
+def create_app(warm_up: bool = None):
     # Define paths relative to project root
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     template_folder = os.path.join(project_root, 'templates')
@@ -16,4 +16,11 @@ def create_app():
     from app.routes import main
     app.register_blueprint(main)
     
+    # Load agent/ChromaDB/TTS in the background so the first request does not pay for it
+    if warm_up is None:
+        warm_up = bool(Config.SERVICES_WARMUP)
+    if warm_up:
+        from app import services
+        services.warm_up_async()
+    
     return app
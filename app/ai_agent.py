@@ -1,45 +1,69 @@
-from langchain_openai import AzureChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, List
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 import base64
-import requests
 import json
+import time
 from config import Config
 from app.models import ChromaDBManager
+from app.history import ChatHistoryCompactor
+from app.followup import cosine_similarity, decode_embedding, has_followup_cues, make_anchor, reusable_anchor
+from app.llm_cache import CachedChatModel, LLMCompletionCache
+from app.image_cache import ImageAnalysisCache, perceptual_hash
+from app.image_processing import InvalidImageError, normalize_image_async, pipeline_stats
+from app.upstream import UpstreamOverloaded, UpstreamUnavailable, get_chat_model, http_get, is_available
+from app.tracing import RequestTrace, activate, current_trace, get_trace_writer, sha256_hex, should_trace, traced_stage
 import re
 
+# Tiền tố của các thông báo lỗi do _analyze_image trả về
+IMAGE_ANALYSIS_ERRORS = ("Dữ liệu hình ảnh không hợp lệ", "Không thể phân tích hình ảnh")
+# Câu hỏi chỉ vào chính bức ảnh ("món này", "đây là đâu?", "trong ảnh") cần truy vấn theo mô tả ảnh
+IMAGE_REFERENCE = re.compile(r"(?<!\w)(này|đây|ảnh|hình)(?!\w)", re.IGNORECASE)
+
 class AgentState(TypedDict):
     messages: List[dict]  # Lưu các messages format cho LangChain
     chat_history: List[dict]  # Lưu lịch sử chat
+    history_summary: str  # Tóm tắt các lượt chat cũ đã được nén
+    session_id: str
     query: str
     query_type: str  # "text" or "image"
-    image_data: str
+    image_data: bytes  # Ảnh dạng nhị phân (không còn base64)
+    image_type: str  # MIME type do client gửi lên
+    image_normalized: bool  # Ảnh đã được chuẩn hóa lúc upload
     retrieved_docs: List[str]
+    retrieved_ids: List[str]
+    retrieved_distances: List[float]
+    text_retrieval_done: bool  # Đã truy vấn theo text song song với vision
+    image_reference: bool  # Phần text của câu hỏi nhắc tới chính bức ảnh (IMAGE_REFERENCE)
+    last_retrieval: dict  # Truy vấn + tài liệu của lượt trước, dùng lại cho câu hỏi nối tiếp (app/followup.py)
+    retrieval_mode: str  # "full", "followup" (không gọi embeddings) hoặc "followup_similar"
+    image_analysis: str  # Mô tả ảnh từ vision model
     location_info: str  # Extracted location for weather
     weather_info: str   # Weather information
+    deadline: float  # time.monotonic() hạn chót của request, None = không giới hạn
+    skipped_stages: List[str]  # Bước tùy chọn bị bỏ qua vì sắp hết thời gian
     response: str
 
 class TravelAIAgent:
-    def __init__(self):
-        # Initialize LLM with temperature only if supported
-        llm_params = {
-            'azure_endpoint': Config.AZURE_OPENAI_ENDPOINT,
-            'api_key': Config.AZURE_OPENAI_API_KEY,
-            'api_version': Config.AZURE_OPENAI_API_VERSION,
-            'azure_deployment': Config.AZURE_OPENAI_DEPLOYMENT_NAME
-        }
+    def __init__(self, llm=None, vision_llm=None, db_manager=None):
+        # LLM và vision LLM dùng chung connection pool, khác timeout.
+        # Có thể truyền model/db giả vào để test mà không gọi Azure.
+        self.llm_cache = LLMCompletionCache() if Config.LLM_CACHE_ENABLED else None
+        self.llm = CachedChatModel(llm or get_chat_model('llm'), self.llm_cache, upstream='llm')
+        self.vision_llm = CachedChatModel(vision_llm or get_chat_model('vision'), None, upstream='vision')
         
-        # Only add temperature if it's not 0.7 (unsupported by GPT-5)
-        if Config.AZURE_OPENAI_TEMPERATURE != 0.7:
-            llm_params['temperature'] = Config.AZURE_OPENAI_TEMPERATURE
-            
-        self.llm = AzureChatOpenAI(**llm_params)
+        # Ảnh giống nhau (cùng ảnh viral được upload lại) dùng lại kết quả phân tích
+        self.image_cache = ImageAnalysisCache() if Config.IMAGE_CACHE_ENABLED else None
         
-        # Use same configuration for vision LLM
-        self.vision_llm = AzureChatOpenAI(**llm_params)
+        self.db_manager = db_manager or ChromaDBManager()
         
-        self.db_manager = ChromaDBManager()
+        # Truy vấn ChromaDB theo text chạy song song với vision call
+        self.retrieval_executor = ThreadPoolExecutor(max_workers=Config.RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        
+        # Nén lịch sử chat cũ thành tóm tắt để giới hạn số token gửi lên LLM
+        self.history_compactor = ChatHistoryCompactor(self.llm) if Config.CHAT_HISTORY_SUMMARY_ENABLED else None
         
         # Build the agent workflow
         self.workflow = self._build_workflow()
@@ -49,11 +73,12 @@ class TravelAIAgent:
         workflow = StateGraph(AgentState)
         
         # Add nodes
-        workflow.add_node("analyze_input", self._analyze_input)
-        workflow.add_node("retrieve_docs", self._retrieve_docs)
-        workflow.add_node("generate_response", self._generate_response)
-        workflow.add_node("get_weather", self._get_weather_info)
-        workflow.add_node("final_response", self._generate_final_response)
+        # Thời gian từng node được ghi vào request trace (nếu đang bật)
+        workflow.add_node("analyze_input", traced_stage("analyze_input", self._analyze_input))
+        workflow.add_node("retrieve_docs", traced_stage("retrieve_docs", self._retrieve_docs))
+        workflow.add_node("generate_response", traced_stage("generate_response", self._generate_response))
+        workflow.add_node("get_weather", traced_stage("get_weather", self._get_weather_info))
+        workflow.add_node("final_response", traced_stage("final_response", self._generate_final_response))
         
         # Add edges
         workflow.add_edge("analyze_input", "retrieve_docs")
@@ -69,39 +94,89 @@ class TravelAIAgent:
     
     def _analyze_input(self, state: AgentState) -> AgentState:
         """Analyze user input to determine query type"""
-        print(f"[DEBUG] Analyzing input...{state}")
+        print(f"[DEBUG] Analyzing input... query: {state['query'][:100]}")
         if state.get("image_data"):
+            # Câu hỏi có cả text và ảnh: truy vấn theo text ngay trong lúc chờ vision
+            text_retrieval = None
+            if state["query"].strip():
+                # copy_context: request trace đi theo sang thread retrieval
+                text_retrieval = self.retrieval_executor.submit(copy_context().run, self._query_docs, state["query"])
+                state["image_reference"] = bool(IMAGE_REFERENCE.search(state["query"]))
+            
             # Process image
             try:
-                print(f"[DEBUG] Processing image data, length: {len(state['image_data']) if state['image_data'] else 0}")
-                image_analysis = self._analyze_image(state["image_data"])
+                print(f"[DEBUG] Processing image data, {len(state['image_data'])} bytes")
+                image_analysis = self._analyze_image(state["image_data"], state.get("image_type"),
+                                                     normalized=state.get("image_normalized", False))
+                if not image_analysis.startswith(IMAGE_ANALYSIS_ERRORS):
+                    state["image_analysis"] = image_analysis
                 if state["query"]:
                     state["query"] += " " + image_analysis
                 else:
                     state["query"] = image_analysis
                 state["query_type"] = "image"
                 print(f"[DEBUG] Image analysis result: {image_analysis[:100]}...")
+            except (UpstreamOverloaded, UpstreamUnavailable):
+                raise
             except Exception as e:
                 print(f"[ERROR] Image analysis failed: {str(e)}")
                 import traceback
                 traceback.print_exc()
                 state["query"] = "Không thể phân tích hình ảnh này"
                 state["query_type"] = "text"
+            
+            if text_retrieval is not None:
+                try:
+                    docs, ids, distances = text_retrieval.result()
+                    state["retrieved_docs"], state["retrieved_ids"], state["retrieved_distances"] = docs, ids, distances
+                    state["text_retrieval_done"] = True
+                except (UpstreamOverloaded, UpstreamUnavailable):
+                    raise
+                except Exception as e:
+                    print(f"Error retrieving documents: {e}")
         else:
             # Text query
             state["query_type"] = "text"
         
         return state
     
-    def _analyze_image(self, image_data: str) -> str:
+    def _analyze_image(self, image_bytes: bytes, image_type: str = None, normalized: bool = False) -> str:
         """Analyze image using Vision API"""
         try:
             print("[DEBUG] Starting image analysis...")
             
             # Validate image data
-            if not image_data or len(image_data.strip()) == 0:
+            if not image_bytes:
                 return "Dữ liệu hình ảnh không hợp lệ"
             
+            # Chuẩn hóa ảnh phía server (xoay EXIF, thu nhỏ, nén lại) trước khi gửi vision model
+            mime_type = image_type if image_type and image_type.startswith('image/') else 'image/jpeg'
+            if Config.IMAGE_NORMALIZE_ENABLED and not normalized:
+                try:
+                    image_bytes, mime_type = normalize_image_async(image_bytes).result()
+                    normalized = True
+                except InvalidImageError as e:
+                    print(f"[ERROR] Invalid image: {str(e)}")
+                    return "Dữ liệu hình ảnh không hợp lệ"
+            
+            # Vision API chỉ nhận ảnh dạng data URL base64
+            image_data = base64.b64encode(image_bytes).decode('utf-8')
+            
+            # Tra cache theo perceptual hash trước khi gọi vision model
+            image_hash = None
+            if self.image_cache:
+                try:
+                    image_hash = perceptual_hash(image_bytes)
+                    cached = self.image_cache.get(image_hash)
+                    if cached:
+                        print(f"[DEBUG] Image analysis cache hit ({image_hash:016x})")
+                        trace = current_trace()
+                        if trace is not None:
+                            trace.add_cached('vision', 'image_analysis', {'phash': f"{image_hash:016x}"}, cached)
+                        return cached
+                except Exception as e:
+                    print(f"[ERROR] Image hashing failed: {str(e)}")
+            
             # Prepare messages for vision model
             messages = [
                 SystemMessage(content="""
@@ -112,35 +187,158 @@ class TravelAIAgent:
                 """),
                 HumanMessage(content=[
                     {"type": "text", "text": "Hình ảnh này là gì?"},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}", "detail": "low"}}
+                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_data}", "detail": "low"}}
                 ])
             ]
             
             print("[DEBUG] Calling vision LLM...")
-            response = self.vision_llm.invoke(messages)
+            start = time.perf_counter()
+            response = self.vision_llm.invoke(messages, site='image_analysis')
+            pipeline_stats.record_vision(normalized, len(image_data), time.perf_counter() - start)
             result = response.content
             print(f"[DEBUG] Vision LLM response: {result[:100]}...")
+            
+            if self.image_cache and image_hash is not None and result:
+                self.image_cache.set(image_hash, result)
             return result
             
+        except (UpstreamOverloaded, UpstreamUnavailable):
+            # Vision quá tải/không khả dụng: route trả 429/503 thay vì trả lời theo mô tả lỗi
+            raise
         except Exception as e:
             print(f"[ERROR] Image analysis error: {str(e)}")
             import traceback
             traceback.print_exc()
             return f"Không thể phân tích hình ảnh: {str(e)}"
     
+    def _query_docs(self, query: str, n_results: int = None):
+        """Query ChromaDB, returns (documents, ids, distances)"""
+        return self._search(query, n_results)[:3]
+    
+    def _search(self, query: str, n_results: int = None):
+        """Same as _query_docs, plus the query embedding (None if the store does not return it)"""
+        results = self.db_manager.query_documents(query, n_results=n_results or Config.RETRIEVAL_TOP_K)
+        if not results or not results.get("documents"):
+            return [], [], [], None
+        
+        docs = results["documents"][0]  # First result list
+        ids = results["ids"][0] if results.get("ids") else [None] * len(docs)
+        distances = results["distances"][0] if results.get("distances") else [0.0] * len(docs)
+        return docs, ids, distances, results.get("query_embedding")
+    
+    def _has_budget(self, state: AgentState, stage: str) -> bool:
+        """Enough time left for an optional stage; otherwise it is recorded in skipped_stages"""
+        skipped = state.setdefault("skipped_stages", [])
+        if stage in skipped:
+            return False
+        deadline = state.get("deadline")
+        if deadline is None:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining >= Config.STAGE_MIN_BUDGET.get(stage, 0.0):
+            return True
+        skipped.append(stage)
+        print(f"[DEADLINE] Skipping {stage}, {max(remaining, 0.0):.1f}s left")
+        return False
+    
+    def _merge_docs(self, first, second, n_results: int):
+        """Merge two (documents, ids, distances) results, dedupe by ID and keep the closest"""
+        merged = {}
+        for docs, ids, distances in (first, second):
+            for doc, doc_id, distance in zip(docs, ids, distances):
+                key = doc_id or doc
+                if key not in merged or distance < merged[key][2]:
+                    merged[key] = (doc, doc_id, distance)
+        
+        best = sorted(merged.values(), key=lambda item: item[2])[:n_results]
+        return [item[0] for item in best], [item[1] for item in best], [item[2] for item in best]
+    
+    def _anchor_docs(self, anchor: dict):
+        """The previous turn's documents, fetched by ID in their original order"""
+        found = self.db_manager.get_documents(anchor["ids"])
+        kept = [(found[doc_id], doc_id, distance) for doc_id, distance in zip(anchor["ids"], anchor["distances"])
+                if doc_id in found]
+        return [k[0] for k in kept], [k[1] for k in kept], [k[2] for k in kept]
+    
+    def _retrieve_followup(self, state: AgentState, anchor: dict) -> bool:
+        """Previous documents plus a few unseen ones near the previous query, without an embedding call"""
+        docs, ids, distances = self._anchor_docs(anchor)
+        if not docs:
+            return False
+        
+        seen = anchor.get("seen_ids") or anchor["ids"]
+        extra = Config.FOLLOWUP_EXTRA_DOCS
+        new_ids = []
+        if extra > 0:
+            results = self.db_manager.query_by_embedding(decode_embedding(anchor["embedding"]).tolist(),
+                                                         n_results=len(seen) + extra)
+            if results and results.get("documents"):
+                for doc, doc_id, distance in zip(results["documents"][0], results["ids"][0], results["distances"][0]):
+                    if doc_id not in seen and len(new_ids) < extra:
+                        docs.append(doc)
+                        ids.append(doc_id)
+                        distances.append(distance)
+                        new_ids.append(doc_id)
+        
+        state["retrieved_docs"], state["retrieved_ids"], state["retrieved_distances"] = docs, ids, distances
+        state["last_retrieval"] = dict(anchor, seen_ids=list(seen) + new_ids, followups=anchor.get("followups", 0) + 1)
+        state["retrieval_mode"] = "followup"
+        print(f"[DEBUG] Follow-up question: reused {len(docs) - len(new_ids)} documents, added {len(new_ids)}")
+        return True
+    
+    def _needs_image_retrieval(self, state: AgentState) -> bool:
+        """Whether searching on the image description can change the documents found for the text"""
+        if state.get("image_reference"):
+            return True
+        distances = state.get("retrieved_distances") or []
+        return not distances or min(distances) > Config.IMAGE_RETRIEVAL_MAX_DISTANCE
+    
     def _retrieve_docs(self, state: AgentState) -> AgentState:
         """Retrieve relevant documents from ChromaDB"""
         try:
-            results = self.db_manager.query_documents(state["query"], n_results=3)
+            if state.get("text_retrieval_done"):
+                # Text đã được truy vấn song song với vision. Chỉ truy vấn thêm theo mô tả ảnh khi nó có thể
+                # đổi câu trả lời: câu hỏi chỉ vào ảnh hoặc kết quả text yếu. Còn lại dùng luôn kết quả text,
+                # độ trễ ≈ max(vision, truy vấn text); mô tả ảnh vẫn nằm trong câu hỏi gửi LLM
+                if state.get("image_analysis") and self._needs_image_retrieval(state) and \
+                        self._has_budget(state, "image_retrieval"):
+                    image_docs, image_ids, image_distances, embedding = self._search(state["image_analysis"])
+                    text_results = (state["retrieved_docs"], state.get("retrieved_ids", []), state.get("retrieved_distances", []))
+                    docs, ids, distances = self._merge_docs(text_results, (image_docs, image_ids, image_distances),
+                                                            Config.RETRIEVAL_TOP_K)
+                    state["retrieved_docs"], state["retrieved_ids"], state["retrieved_distances"] = docs, ids, distances
+                    # Câu hỏi tiếp theo về ảnh ("quán này ở đâu?") dựa trên mô tả ảnh
+                    state["last_retrieval"] = make_anchor(state["image_analysis"], embedding, ids, distances)
+                state["retrieval_mode"] = "full"
+                return state
             
-            if results and results.get("documents"):
-                state["retrieved_docs"] = results["documents"][0]  # First result list
-            else:
-                state["retrieved_docs"] = []
+            # Không dùng lại ngữ cảnh cũ cho câu hỏi bằng ảnh
+            anchor = reusable_anchor(state.get("last_retrieval"), getattr(self.db_manager, "embedding_dimensions", None)) \
+                if state.get("query_type") != "image" else None
+            if anchor and has_followup_cues(state["query"], anchor) and self._retrieve_followup(state, anchor):
+                return state
+            
+            docs, ids, distances, embedding = self._search(state["query"])
+            state["retrieval_mode"] = "full"
+            new_anchor = make_anchor(state["query"], embedding, ids, distances)
+            if anchor and new_anchor and \
+                    cosine_similarity(embedding, decode_embedding(anchor["embedding"])) >= Config.FOLLOWUP_SIMILARITY:
+                # Cùng chủ đề với lượt trước: giữ tài liệu cũ bên cạnh kết quả mới
+                docs, ids, distances = self._merge_docs((docs, ids, distances), self._anchor_docs(anchor),
+                                                        Config.RETRIEVAL_TOP_K + Config.FOLLOWUP_EXTRA_DOCS)
+                new_anchor["seen_ids"] = list(dict.fromkeys(anchor.get("seen_ids", []) + ids))
+                new_anchor["followups"] = anchor.get("followups", 0) + 1
+                state["retrieval_mode"] = "followup_similar"
+            state["retrieved_docs"], state["retrieved_ids"], state["retrieved_distances"] = docs, ids, distances
+            state["last_retrieval"] = new_anchor
                 
+        except (UpstreamOverloaded, UpstreamUnavailable):
+            raise
         except Exception as e:
             print(f"Error retrieving documents: {e}")
             state["retrieved_docs"] = []
+            # Không giữ anchor của lượt trước cho tài liệu không còn khớp với câu trả lời này
+            state["last_retrieval"] = None
         
         return state
         
@@ -156,7 +354,7 @@ class TravelAIAgent:
         ])
         
         # Giới hạn lịch sử (giữ 10 lượt gần nhất)
-        max_turns = 10
+        max_turns = Config.CHAT_HISTORY_MAX_TURNS
         if len(state["chat_history"]) > max_turns * 2:
             state["chat_history"] = state["chat_history"][-max_turns * 2:]
         
@@ -182,7 +380,7 @@ class TravelAIAgent:
                 HumanMessage(content=f"Phản hồi cần phân tích: {response_text}")
             ]
             
-            response = self.llm.invoke(messages)
+            response = self.llm.invoke(messages, site='extract_location')
             location = response.content.strip()
             
             # Clean up the response - remove quotes and extra text
@@ -200,6 +398,11 @@ class TravelAIAgent:
     def _get_weather_info(self, state: AgentState) -> AgentState:
         """Get weather information for the location mentioned in the response"""
         try:
+            # Sắp hết thời gian: bỏ trích xuất địa điểm + thời tiết, trả lời ngay
+            if not self._has_budget(state, "weather"):
+                state["weather_info"] = ""
+                return state
+            
             # Extract location from the generated response
             location = self._extract_location(state["response"])
             state["location_info"] = location
@@ -209,6 +412,12 @@ class TravelAIAgent:
                 print(f"[DEBUG] Skipping weather - Location: '{location}', API Key available: {bool(Config.OPENWEATHER_API_KEY)}")
                 return state
             
+            # OpenWeather đang lỗi: bỏ qua thời tiết thay vì chờ timeout
+            if not is_available('weather'):
+                state["weather_info"] = ""
+                print("[DEBUG] Skipping weather - OpenWeather circuit breaker is open")
+                return state
+            
             # Get weather data from OpenWeather API
             weather_url = f"{Config.OPENWEATHER_BASE_URL}/weather"
             params = {
@@ -218,7 +427,7 @@ class TravelAIAgent:
                 'lang': 'vi'  # Vietnamese
             }
             
-            response = requests.get(weather_url, params=params, timeout=5)
+            response = http_get('weather', weather_url, params=params)
             
             if response.status_code == 200:
                 weather_data = response.json()
@@ -279,9 +488,18 @@ class TravelAIAgent:
             # Xây dựng messages array
             state["messages"] = [SystemMessage(content=system_message)]
             
+            # Chỉ gửi tóm tắt + các lượt gần nhất nếu lịch sử vượt ngân sách token
+            history = state.get("chat_history") or []
+            summary = state.get("history_summary", "")
+            if self.history_compactor:
+                history, summary = self.history_compactor.select_for_prompt(state.get("session_id"), history, summary)
+            
+            if summary:
+                state["messages"].append(SystemMessage(content=f"Tóm tắt cuộc trò chuyện trước đó: {summary}"))
+            
             # Thêm chat history
-            if state.get("chat_history"):
-                for msg in state["chat_history"]:
+            if history:
+                for msg in history:
                     if msg["role"] == "user":
                         state["messages"].append(HumanMessage(content=msg["content"]))
                     else:
@@ -291,13 +509,20 @@ class TravelAIAgent:
             state["messages"].append(HumanMessage(content=state["query"]))
             
             # Gọi LLM
-            response = self.llm.invoke(state["messages"])
+            response = self.llm.invoke(state["messages"], site='generate_response')
             state["response"] = response.content
             print(f"[DEBUG] Initial response generated: {state['response'][:100]}...")
             
             # Cập nhật chat history
             self._update_chat_history(state, state["query"], state["response"])
             
+            # Tóm tắt lịch sử cũ ở chế độ nền, không chặn phản hồi hiện tại
+            if self.history_compactor:
+                self.history_compactor.maybe_compact(state.get("session_id"), state["chat_history"], summary)
+            
+        except (UpstreamOverloaded, UpstreamUnavailable):
+            # LLM quá tải/không khả dụng: route trả 429/503 thay vì một câu xin lỗi
+            raise
         except Exception as e:
             state["response"] = f"Xin lỗi, tôi đang gặp sự cố kết nối. Vui lòng thử lại sau. Lỗi: {str(e)}"
         
@@ -313,7 +538,9 @@ class TravelAIAgent:
                 final_response += f"\n\n{state['weather_info']}"
                 
                 # Add weather-based advice
-                weather_advice = self._get_weather_advice(state["weather_info"], state["location_info"])
+                weather_advice = ""
+                if self._has_budget(state, "weather_advice"):
+                    weather_advice = self._get_weather_advice(state["weather_info"], state["location_info"])
                 if weather_advice:
                     final_response += f"\n💡 **Lời khuyên dựa trên thời tiết:** {weather_advice}"
             
@@ -344,7 +571,7 @@ class TravelAIAgent:
                 HumanMessage(content=f"Thông tin thời tiết: {weather_info}")
             ]
             
-            response = self.llm.invoke(messages)
+            response = self.llm.invoke(messages, site='weather_advice')
             return response.content.strip()
             
         except Exception as e:
@@ -368,19 +595,96 @@ class TravelAIAgent:
         result = re.sub(pattern, replace_maps_link, text)
         return result
     
-    def process_query(self, query: str, image_data: str = None, chat_history: List[dict] = None) -> str:
-        """Process query với chat history"""
+    def process_query(self, query: str, image_data=None, chat_history: List[dict] = None,
+                      history_summary: str = "", session_id: str = None, image_type: str = None,
+                      image_normalized: bool = False, last_retrieval: dict = None, deadline: float = None,
+                      skip_stages: List[str] = None) -> str:
+        """Process query với chat history. image_data là bytes (hoặc chuỗi base64 cũ).
+        last_retrieval là giá trị "last_retrieval" của lượt trước trong cùng phiên.
+        deadline là time.monotonic() lúc phải trả lời (mặc định REQUEST_DEADLINE từ bây giờ,
+        float('inf') = không giới hạn); skip_stages là các bước tùy chọn bỏ qua từ đầu"""
+        if isinstance(image_data, str):
+            image_data = base64.b64decode(image_data) if image_data.strip() else None
+
+        chat_history = chat_history or []
+        history_summary = history_summary or ""
+        if deadline is None and Config.REQUEST_DEADLINE > 0:
+            deadline = time.monotonic() + Config.REQUEST_DEADLINE
+        
+        # Áp dụng tóm tắt đã được tạo ở chế độ nền từ lượt trước (nếu có)
+        if self.history_compactor:
+            chat_history, history_summary = self.history_compactor.apply_pending(session_id, chat_history, history_summary)
+        
         initial_state = {
             "messages": [],
-            "chat_history": chat_history or [],
+            "chat_history": chat_history,
+            "history_summary": history_summary,
+            "session_id": session_id,
             "query": query,
             "query_type": "text",
             "image_data": image_data,
+            "image_type": image_type,
+            "image_normalized": image_normalized,
             "retrieved_docs": [],
+            "retrieved_ids": [],
+            "retrieved_distances": [],
+            "text_retrieval_done": False,
+            "image_reference": False,
+            "last_retrieval": last_retrieval,
+            "retrieval_mode": "",
+            "image_analysis": "",
             "location_info": "",
             "weather_info": "",
+            "deadline": deadline if deadline != float('inf') else None,
+            "skipped_stages": list(skip_stages or []),
             "response": ""
         }
         
+        # Replay đã kích hoạt trace riêng; không thì lấy mẫu theo TRACE_SAMPLE_RATE
+        trace = current_trace()
+        write_trace = trace is None and should_trace()
+        if write_trace:
+            trace = RequestTrace()
+        if trace is not None:
+            return self._invoke_traced(trace, initial_state, write_trace)
+        
         final_state = self.workflow.invoke(initial_state)
         return final_state
+    
+    def _invoke_traced(self, trace: RequestTrace, initial_state: dict, write: bool) -> dict:
+        """Run the workflow with the trace active, recording inputs and outputs"""
+        image = initial_state["image_data"]
+        trace.inputs = {
+            "query": initial_state["query"],
+            "image": {
+                "sha256": sha256_hex(image),
+                "bytes": len(image),
+                "type": initial_state["image_type"],
+                "normalized": initial_state["image_normalized"]
+            } if image else None,
+            "chat_history": list(initial_state["chat_history"]),
+            "history_summary": initial_state["history_summary"],
+            "last_retrieval": initial_state["last_retrieval"],
+            "session": sha256_hex(initial_state["session_id"])[:16] if initial_state["session_id"] else None
+        }
+        try:
+            with activate(trace):
+                final_state = self.workflow.invoke(initial_state)
+            trace.outputs = {
+                "response": final_state["response"],
+                "query_type": final_state["query_type"],
+                "image_analysis": final_state.get("image_analysis", ""),
+                "retrieved_ids": final_state.get("retrieved_ids", []),
+                "retrieved_distances": final_state.get("retrieved_distances", []),
+                "retrieval_mode": final_state.get("retrieval_mode", ""),
+                "location": final_state.get("location_info", ""),
+                "has_weather": bool(final_state.get("weather_info")),
+                "skipped_stages": final_state.get("skipped_stages", [])
+            }
+            return final_state
+        except Exception as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if write:
+                get_trace_writer().write(trace.to_dict())
@@ -0,0 +1,103 @@
+"""Reuse the previous turn's retrieval for follow-up questions.
+
+After each text retrieval the session keeps an "anchor": the query, its
+embedding and the retrieved document IDs. A short question with pronoun or
+ellipsis cues ("còn quán nào khác không?", "chỗ đó mở cửa mấy giờ?") that names
+no new place is answered from the anchor's documents plus a few new ones found
+with the stored embedding, so it costs no embedding call. Other questions are embedded as
+usual; if they are close enough to the anchor query the previous documents are
+kept in the context alongside the new results.
+"""
+
+from typing import List, Optional
+import base64
+import re
+import unicodedata
+import numpy as np
+from config import Config
+
+# Đại từ / từ chỉ định và cách hỏi tiếp thường gặp trong câu hỏi nối tiếp
+_CUES = re.compile(
+    r"\b(đó|đấy|ấy|này|kia|nó|họ|chỗ đó|ở đó|nơi đó|còn|nữa|khác|thêm|tiếp|thế còn|vậy còn|"
+    r"cái nào|quán nào|món nào|chỗ nào)\b"
+)
+_LEADING_CUES = ("còn ", "thế ", "vậy ", "và ", "với lại ", "thêm ")
+
+# Địa danh du lịch phổ biến, để nhận ra địa điểm mới cả khi người dùng không viết hoa
+_PLACES = (
+    "hà nội", "hồ chí minh", "sài gòn", "đà nẵng", "hội an", "huế", "nha trang", "đà lạt", "sa pa", "sapa",
+    "phú quốc", "hạ long", "cát bà", "ninh bình", "tràng an", "tam cốc", "hải phòng", "cần thơ", "vũng tàu",
+    "mũi né", "phan thiết", "quy nhơn", "phú yên", "tuy hòa", "quảng bình", "phong nha", "côn đảo", "mộc châu",
+    "hà giang", "đồng văn", "mù cang chải", "cao bằng", "bản giốc", "lào cai", "điện biên", "lai châu", "sơn la",
+    "mai châu", "lạng sơn", "bắc ninh", "nam định", "thanh hóa", "sầm sơn", "nghệ an", "cửa lò", "hà tĩnh",
+    "quảng trị", "quảng nam", "quảng ngãi", "lý sơn", "bình định", "khánh hòa", "ninh thuận", "phan rang",
+    "bình thuận", "lâm đồng", "buôn ma thuột", "đắk lắk", "pleiku", "gia lai", "kon tum", "tây ninh", "mỹ tho",
+    "bến tre", "vĩnh long", "trà vinh", "đồng tháp", "an giang", "châu đốc", "kiên giang", "rạch giá", "hà tiên",
+    "sóc trăng", "bạc liêu", "cà mau", "tam đảo", "ba vì", "bà nà", "cô tô", "bình liêu", "y tý", "tà xùa",
+)
+_PLACE_PATTERN = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(p) for p in sorted(_PLACES, key=len, reverse=True)) + r")(?!\w)",
+    re.IGNORECASE
+)
+
+def encode_embedding(vector) -> str:
+    """float16 base64: small enough to keep in every session"""
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode('ascii')
+
+def decode_embedding(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float16).astype(np.float32)
+
+def cosine_similarity(a, b) -> float:
+    """0 for vectors of different sizes, e.g. an anchor saved before EMBEDDING_DIMENSIONS changed"""
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    if a.shape != b.shape:
+        return 0.0
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+def _proper_nouns(text: str) -> set:
+    # Tên riêng (Hà Nội, Phở Thìn...): từ viết hoa, trừ từ đầu câu
+    words = re.findall(r"\w+", text)
+    return {w.lower() for w in words[1:] if w[:1].isupper()}
+
+def _names(text: str) -> set:
+    """Places from _PLACES ("Sa Pa" and "sapa" are the same) plus any other capitalized names"""
+    text = unicodedata.normalize("NFC", text)
+    places = {m.lower().replace(" ", "") for m in _PLACE_PATTERN.findall(text)}
+    return places | _proper_nouns(_PLACE_PATTERN.sub(" ", text))
+
+def has_followup_cues(query: str, anchor: dict) -> bool:
+    """Short question that refers back to the previous one and names nothing new"""
+    text = query.strip().lower()
+    if not text or len(text.split()) > Config.FOLLOWUP_MAX_WORDS:
+        return False
+    if not (text.startswith(_LEADING_CUES) or _CUES.search(text)):
+        return False
+    # Nhắc tới địa điểm/tên mới (viết hoa hoặc có trong _PLACES) thì là câu hỏi mới
+    return not (_names(query) - _names(anchor.get("query", "")))
+
+def reusable_anchor(anchor: Optional[dict], dimensions: int = None) -> Optional[dict]:
+    """The session anchor if follow-ups may still build on it.
+
+    ``dimensions`` is the vector size of the collection when known; an anchor of another size
+    (saved before an EMBEDDING_DIMENSIONS migration) is treated as absent.
+    """
+    if not Config.FOLLOWUP_REUSE_ENABLED or not anchor or not anchor.get("embedding") or not anchor.get("ids"):
+        return None
+    if anchor.get("followups", 0) >= Config.FOLLOWUP_MAX_TURNS:
+        return None
+    if dimensions and decode_embedding(anchor["embedding"]).size != dimensions:
+        return None
+    return anchor
+
+def make_anchor(query: str, embedding, ids: List[str], distances: List[float]) -> Optional[dict]:
+    if embedding is None or not ids or not all(ids):
+        return None
+    return {
+        "query": query,
+        "embedding": encode_embedding(embedding),
+        "ids": list(ids),
+        "distances": [float(d) for d in distances],
+        "seen_ids": list(ids),
+        "followups": 0
+    }
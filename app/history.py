@@ -0,0 +1,198 @@
+from langchain.schema import HumanMessage, SystemMessage
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import threading
+from config import Config
+
+# Tóm tắt chạy nền, một luồng là đủ vì mỗi phiên chỉ có tối đa một job
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+_encoding = None
+_encoding_loaded = False
+
+def count_tokens(text: str) -> int:
+    """Estimate token count, using tiktoken when available"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"[HISTORY] tiktoken unavailable, using character estimate: {e}")
+            _encoding = None
+
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # Tiếng Việt có dấu: khoảng 3 ký tự / token
+    return len(text) // 3 + 1
+
+def count_history_tokens(history: List[dict]) -> int:
+    """Estimate tokens for a list of chat messages (4 tokens overhead per message)"""
+    return sum(count_tokens(msg["content"]) + 4 for msg in history)
+
+class ChatHistoryCompactor:
+    """Fold old chat turns into a running summary once history exceeds a token budget.
+
+    Summaries are computed in a background thread after the response is sent and
+    applied at the start of the next request of the same session.
+    """
+
+    def __init__(self, llm, token_budget: int = None, keep_turns: int = None, max_turns: int = None):
+        self.llm = llm
+        self.token_budget = token_budget if token_budget is not None else Config.CHAT_HISTORY_TOKEN_BUDGET
+        self.keep_turns = keep_turns if keep_turns is not None else Config.CHAT_HISTORY_KEEP_TURNS
+        self.max_turns = max_turns if max_turns is not None else Config.CHAT_HISTORY_MAX_TURNS
+
+        self._lock = threading.Lock()
+        # Giới hạn theo số phiên tối đa của session store để không rò bộ nhớ
+        self.max_sessions = Config.SESSION_STORE_MAX_ENTRIES
+        self._pending = OrderedDict()  # session_id -> (folded messages, Future[str])
+        self._stats = OrderedDict()   # session_id -> token savings
+        self._folded = OrderedDict()  # session_id -> messages dropped from history, for the no-compaction baseline
+
+    def apply_pending(self, session_id: str, history: List[dict], summary: str) -> Tuple[List[dict], str]:
+        """Merge a finished background summary into the session history"""
+        if not session_id:
+            return history, summary
+
+        with self._lock:
+            pending = self._pending.get(session_id)
+            if not pending or not pending[1].done():
+                return history, summary
+            del self._pending[session_id]
+
+        folded, future = pending
+        try:
+            new_summary = future.result()
+        except Exception as e:
+            print(f"[ERROR] History summarization failed: {str(e)}")
+            return history, summary
+
+        if not new_summary:
+            return history, summary
+
+        # Lịch sử có thể đã bị cắt bớt từ đầu kể từ khi job được tạo,
+        # nên chỉ bỏ phần đầu trùng với đoạn cuối của các tin nhắn đã tóm tắt
+        overlap = 0
+        for k in range(min(len(folded), len(history)), 0, -1):
+            if history[:k] == folded[-k:]:
+                overlap = k
+                break
+
+        with self._lock:
+            dropped = self._folded.get(session_id, []) + history[:overlap]
+            self._folded[session_id] = dropped[-self.max_turns * 2:]
+            self._folded.move_to_end(session_id)
+            while len(self._folded) > self.max_sessions:
+                self._folded.popitem(last=False)
+
+        print(f"[HISTORY] Applied summary for session {session_id[:8]}, folded {overlap} messages")
+        return history[overlap:], new_summary
+
+    def select_for_prompt(self, session_id: str, history: List[dict], summary: str) -> Tuple[List[dict], str]:
+        """Pick the summary and the most recent messages that fit in the token budget"""
+        history = history or []
+        # Không nén thì sẽ gửi nguyên văn tối đa max_turns lượt gần nhất
+        with self._lock:
+            baseline = (self._folded.get(session_id, []) + history)[-self.max_turns * 2:]
+        full_tokens = count_history_tokens(baseline)
+
+        if count_tokens(summary) + count_history_tokens(history) <= self.token_budget:
+            selected = history
+        else:
+            # Luôn giữ nguyên văn các lượt gần nhất, thêm lượt cũ hơn nếu còn ngân sách
+            keep = self.keep_turns * 2
+            selected = history[-keep:] if keep else []
+            used = count_tokens(summary) + count_history_tokens(selected)
+            for msg in reversed(history[:len(history) - len(selected)]):
+                msg_tokens = count_tokens(msg["content"]) + 4
+                if used + msg_tokens > self.token_budget:
+                    break
+                selected = [msg] + selected
+                used += msg_tokens
+
+        sent_tokens = count_tokens(summary) + count_history_tokens(selected)
+        self._record(session_id, full_tokens, sent_tokens)
+        return selected, summary
+
+    def maybe_compact(self, session_id: str, history: List[dict], summary: str) -> bool:
+        """Schedule background summarization if the history is over budget or at the turn cap"""
+        if not session_id or not history:
+            return False
+
+        over_budget = count_tokens(summary) + count_history_tokens(history) > self.token_budget
+        at_cap = len(history) >= self.max_turns * 2
+        if not over_budget and not at_cap:
+            return False
+
+        keep = self.keep_turns * 2
+        folded = list(history[:-keep]) if keep else list(history)
+        if not folded:
+            return False
+
+        with self._lock:
+            if session_id in self._pending:
+                return False
+            future = _summary_executor.submit(self._summarize, summary, folded)
+            self._pending[session_id] = (folded, future)
+            # Phiên không quay lại thì tóm tắt không bao giờ được áp dụng: bỏ job cũ nhất
+            while len(self._pending) > self.max_sessions:
+                _, (_, stale) = self._pending.popitem(last=False)
+                stale.cancel()
+
+        print(f"[HISTORY] Scheduled summary of {len(folded)} messages for session {session_id[:8]}")
+        return True
+
+    def _summarize(self, previous_summary: str, messages: List[dict]) -> str:
+        """Summarize the previous summary plus the folded messages"""
+        transcript = "\n".join(
+            f"{'Người dùng' if msg['role'] == 'user' else 'Trợ lý'}: {msg['content']}"
+            for msg in messages
+        )
+        if previous_summary:
+            transcript = f"Tóm tắt trước đó: {previous_summary}\n\n{transcript}"
+
+        prompt = [
+            SystemMessage(content="""
+            Hãy tóm tắt cuộc trò chuyện du lịch sau thành một đoạn ngắn gọn (tối đa 5 câu) bằng tiếng Việt.
+            Giữ lại: địa điểm, món ăn, nhà hàng đã được nhắc đến, sở thích và kế hoạch của người dùng.
+            Chỉ trả về đoạn tóm tắt, không giải thích thêm.
+            """),
+            HumanMessage(content=transcript)
+        ]
+        response = self.llm.invoke(prompt, site='history_summary')
+        return response.content.strip()
+
+    def _record(self, session_id: str, full_tokens: int, sent_tokens: int):
+        if not session_id:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(session_id, {
+                'requests': 0,
+                'history_tokens_full': 0,
+                'history_tokens_sent': 0,
+                'tokens_saved': 0
+            })
+            stats['requests'] += 1
+            stats['history_tokens_full'] += full_tokens
+            stats['history_tokens_sent'] += sent_tokens
+            stats['tokens_saved'] += max(full_tokens - sent_tokens, 0)
+            self._stats.move_to_end(session_id)
+            while len(self._stats) > self.max_sessions:
+                self._stats.popitem(last=False)
+
+    def get_stats(self, session_id: str) -> dict:
+        """Prompt-token savings for a session"""
+        with self._lock:
+            stats = dict(self._stats.get(session_id, {
+                'requests': 0,
+                'history_tokens_full': 0,
+                'history_tokens_sent': 0,
+                'tokens_saved': 0
+            }))
+            stats['summary_pending'] = session_id in self._pending
+        return stats
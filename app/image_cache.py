@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from typing import Optional
+import io
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """64-bit difference hash (dHash) of the decoded image.
+
+    Re-encoding, resizing and small crops or color shifts change only a few bits,
+    so near-identical photos end up within a small Hamming distance.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = img.tobytes()  # 1 byte/pixel ở chế độ L
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+class ImageAnalysisCache:
+    """LRU cache of vision-model analyses keyed by perceptual hash, persisted in SQLite.
+
+    Near-duplicate lookups scan every hash, so entries are kept in memory; SQLite
+    only receives the changed rows (one insert per analysis, deletes on eviction).
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None, threshold: int = None):
+        self.path = path if path is not None else Config.IMAGE_CACHE_PATH
+        self.max_entries = max_entries or Config.IMAGE_CACHE_MAX_ENTRIES
+        self.threshold = threshold if threshold is not None else Config.IMAGE_CACHE_HAMMING_THRESHOLD
+        self._entries = OrderedDict()  # phash -> analysis
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_cache (
+                    hash TEXT PRIMARY KEY,
+                    analysis TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            rows = conn.execute(
+                "SELECT hash, analysis FROM image_cache ORDER BY last_access DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+            for phash, analysis in reversed(rows):
+                self._entries[int(phash, 16)] = analysis
+            if rows:
+                print(f"[IMAGE CACHE] Loaded {len(self._entries)} entries from {self.path}")
+        except Exception as e:
+            print(f"[IMAGE CACHE] Failed to load cache: {e}")
+            self.path = None  # Chỉ dùng cache trong bộ nhớ
+
+    def _persist(self, statement: str, rows: list):
+        """Write the changed rows only; a broken disk never fails the request"""
+        if not rows or not self.path:
+            return
+        try:
+            self._connect().executemany(statement, rows)
+        except Exception as e:
+            print(f"[IMAGE CACHE] Failed to persist cache: {e}")
+
+    def get(self, phash: int) -> Optional[str]:
+        with self._lock:
+            if phash in self._entries:
+                match = phash
+                self.exact_hits += 1
+            else:
+                # Tìm ảnh gần giống nhất trong ngưỡng Hamming
+                match, best_distance = None, self.threshold + 1
+                for cached_hash in self._entries:
+                    distance = hamming_distance(phash, cached_hash)
+                    if distance < best_distance:
+                        match, best_distance = cached_hash, distance
+                if match is None:
+                    self.misses += 1
+                    return None
+                self.near_hits += 1
+            self._entries.move_to_end(match)
+            analysis = self._entries[match]
+        self._persist("UPDATE image_cache SET last_access = ? WHERE hash = ?", [(time.time(), f"{match:016x}")])
+        return analysis
+
+    def set(self, phash: int, analysis: str):
+        evicted = []
+        with self._lock:
+            self._entries[phash] = analysis
+            self._entries.move_to_end(phash)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.evictions += 1
+        self._persist("INSERT OR REPLACE INTO image_cache (hash, analysis, last_access) VALUES (?, ?, ?)",
+                      [(f"{phash:016x}", analysis, time.time())])
+        self._persist("DELETE FROM image_cache WHERE hash = ?", [(f"{h:016x}",) for h in evicted])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hamming_threshold': self.threshold,
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.exact_hits + self.near_hits) / lookups, 3) if lookups else 0
+            }
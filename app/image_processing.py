@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+import io
+import threading
+import time
+from config import Config
+
+# Pillow nhả GIL khi decode/resize/encode nên thread pool đủ để chạy song song
+_image_executor = ThreadPoolExecutor(max_workers=Config.IMAGE_WORKERS, thread_name_prefix="image-normalize")
+
+class InvalidImageError(Exception):
+    """Uploaded bytes could not be decoded as an image"""
+
+class ImagePipelineStats:
+    """Bytes saved by normalization and vision latency for normalized vs raw payloads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.normalize_seconds = 0.0
+        self.vision = {
+            'normalized': {'calls': 0, 'seconds': 0.0, 'bytes': 0},
+            'raw': {'calls': 0, 'seconds': 0.0, 'bytes': 0}
+        }
+
+    def record_normalize(self, bytes_in: int, bytes_out: int, seconds: float):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.normalize_seconds += seconds
+
+    def record_vision(self, normalized: bool, payload_bytes: int, seconds: float):
+        with self._lock:
+            bucket = self.vision['normalized' if normalized else 'raw']
+            bucket['calls'] += 1
+            bucket['seconds'] += seconds
+            bucket['bytes'] += payload_bytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            vision = {}
+            for name, bucket in self.vision.items():
+                vision[name] = {
+                    'calls': bucket['calls'],
+                    'avg_latency_ms': round(bucket['seconds'] / bucket['calls'] * 1000, 1) if bucket['calls'] else None,
+                    'avg_payload_bytes': bucket['bytes'] // bucket['calls'] if bucket['calls'] else None
+                }
+
+            latency_saved = None
+            if vision['normalized']['calls'] and vision['raw']['calls']:
+                latency_saved = round(vision['raw']['avg_latency_ms'] - vision['normalized']['avg_latency_ms'], 1)
+
+            return {
+                'images': self.images,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'avg_normalize_ms': round(self.normalize_seconds / self.images * 1000, 1) if self.images else None,
+                'vision': vision,
+                'avg_vision_latency_saved_ms': latency_saved
+            }
+
+pipeline_stats = ImagePipelineStats()
+
+def normalize_image(image_bytes: bytes, max_dimension: int = None, quality: int = None) -> Tuple[bytes, str]:
+    """Decode, fix EXIF orientation, downscale and re-encode an image as compact JPEG"""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    max_dimension = max_dimension or Config.IMAGE_MAX_DIMENSION
+    quality = quality or Config.IMAGE_JPEG_QUALITY
+    start = time.perf_counter()
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # Giới hạn bộ nhớ khi decode ảnh lớn: JPEG có thể decode trực tiếp ở kích thước nhỏ hơn
+            img.draft('RGB', (max_dimension, max_dimension))
+            img = ImageOps.exif_transpose(img)
+
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+        raise InvalidImageError(str(e))
+
+    normalized = buffer.getvalue()
+    pipeline_stats.record_normalize(len(image_bytes), len(normalized), time.perf_counter() - start)
+    return normalized, 'image/jpeg'
+
+def normalize_image_async(image_bytes: bytes):
+    """Submit normalization to the image worker pool, returns a Future[(bytes, mime_type)]"""
+    return _image_executor.submit(normalize_image, image_bytes)
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+import os
+import threading
+import time
+import uuid
+from config import Config
+
+_EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}
+_MIME_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+
+class ImageStore:
+    """Short-lived, size-bounded store for uploaded images referenced by ID from /api/chat.
+
+    Images live in a memory LRU; if IMAGE_STORE_DIR is set they are also written
+    there so every worker on the host can resolve an ID uploaded to another worker.
+    The directory is held to the same TTL, entry and byte limits as the memory tier.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl_seconds: int = None, directory: str = None):
+        self.max_entries = max_entries or Config.IMAGE_STORE_MAX_ENTRIES
+        self.max_bytes = max_bytes or Config.IMAGE_STORE_MAX_BYTES
+        self.ttl_seconds = ttl_seconds or Config.IMAGE_STORE_TTL
+        self.directory = directory if directory is not None else Config.IMAGE_STORE_DIR
+        self._images = OrderedDict()  # image_id -> (expires_at, bytes, mime_type)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, image_bytes: bytes, mime_type: str) -> str:
+        image_id = uuid.uuid4().hex
+        expires_at = time.time() + self.ttl_seconds
+
+        with self._lock:
+            self._images[image_id] = (expires_at, image_bytes, mime_type)
+            self._total_bytes += len(image_bytes)
+            evicted = self._evict()
+
+        if self.directory:
+            path = self._path(image_id, mime_type)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, path)
+            for old_id, old_type in evicted:
+                self._remove_file(old_id, old_type)
+            self._cleanup_directory()
+
+        return image_id
+
+    def get(self, image_id: str) -> Optional[Tuple[bytes, str]]:
+        if not image_id or not image_id.isalnum():
+            return None
+
+        with self._lock:
+            entry = self._images.get(image_id)
+            if entry is not None:
+                if entry[0] >= time.time():
+                    self._images.move_to_end(image_id)
+                    return entry[1], entry[2]
+                self._remove(image_id)
+                if self.directory:
+                    self._remove_file(image_id, entry[2])
+                    return None
+
+        if self.directory:
+            return self._get_from_directory(image_id)
+        return None
+
+    def _get_from_directory(self, image_id: str) -> Optional[Tuple[bytes, str]]:
+        for ext, mime_type in list(_MIME_TYPES.items()) + [('bin', 'application/octet-stream')]:
+            path = os.path.join(self.directory, f"{image_id}.{ext}")
+            try:
+                if os.path.getmtime(path) + self.ttl_seconds < time.time():
+                    return None
+                with open(path, 'rb') as f:
+                    return f.read(), mime_type
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _path(self, image_id: str, mime_type: str) -> str:
+        return os.path.join(self.directory, f"{image_id}.{_EXTENSIONS.get(mime_type, 'bin')}")
+
+    def _remove_file(self, image_id: str, mime_type: str):
+        try:
+            os.remove(self._path(image_id, mime_type))
+        except OSError:
+            pass
+
+    def _remove(self, image_id: str):
+        entry = self._images.pop(image_id, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+
+    def _evict(self) -> list:
+        """Drop expired and least recently used images; returns the (image_id, mime_type) removed"""
+        now = time.time()
+        evicted = [(i, entry[2]) for i, entry in self._images.items() if entry[0] < now]
+        for image_id, _ in evicted:
+            self._remove(image_id)
+        while self._images and (len(self._images) > self.max_entries or self._total_bytes > self.max_bytes):
+            image_id, entry = next(iter(self._images.items()))
+            self._remove(image_id)
+            evicted.append((image_id, entry[2]))
+        return evicted
+
+    def _cleanup_directory(self):
+        """Apply the TTL and the entry/byte limits to the files of every worker, oldest first"""
+        cutoff = time.time() - self.ttl_seconds
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                elif not entry.name.endswith('.tmp'):
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                pass
+
+        files.sort()
+        count, total_bytes = len(files), sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            count -= 1
+            total_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._images),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,152 @@
+from langchain.schema import AIMessage
+from typing import List, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+from app.upstream import call_with_retry
+from app.tracing import current_trace, message_payload
+
+def prompt_fingerprint(deployment: str, messages: List, temperature) -> str:
+    """Hash of (deployment, messages, temperature) used as the cache key"""
+    payload = {
+        'deployment': deployment,
+        'temperature': temperature,
+        'messages': message_payload(messages)
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class LLMCompletionCache:
+    """Persistent exact-match completion cache in SQLite with TTL and LRU size limit"""
+
+    def __init__(self, path: str = None, max_entries: int = None, ttl_seconds: int = None):
+        self.path = path or Config.LLM_CACHE_PATH
+        self.max_entries = max_entries or Config.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.LLM_CACHE_TTL
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._site_stats = {}  # site -> {'hits': n, 'misses': n}
+        self.evictions = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                site TEXT,
+                content TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._connect().execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, site: str, field: str):
+        with self._lock:
+            stats = self._site_stats.setdefault(site or 'default', {'hits': 0, 'misses': 0})
+            stats[field] += 1
+
+    def get(self, key: str, site: str = None) -> Optional[str]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT content, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < now:
+            if row is not None:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._count(site, 'misses')
+            return None
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        self._count(site, 'hits')
+        return row[0]
+
+    def set(self, key: str, content: str, site: str = None, ttl_seconds: int = None):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, site, content, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, site, content, now + (ttl_seconds or self.ttl_seconds), now)
+        )
+
+        # Loại các entry ít được dùng nhất khi vượt giới hạn
+        count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            with self._lock:
+                self.evictions += excess
+
+    def clear(self):
+        self._connect().execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            sites = {site: dict(s) for site, s in self._site_stats.items()}
+        for s in sites.values():
+            total = s['hits'] + s['misses']
+            s['hit_rate'] = round(s['hits'] / total, 3) if total else 0
+        return {
+            'entries': self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0],
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'sites': sites
+        }
+
+class CachedChatModel:
+    """Wrap a LangChain chat model with an exact-match completion cache.
+
+    Only call sites listed in LLM_CACHE_SITES (or passed in ``sites``) are cached;
+    every other call goes straight to the model through the upstream retry layer.
+    """
+
+    def __init__(self, model, cache: LLMCompletionCache = None, upstream: str = 'llm',
+                 deployment: str = None, temperature=None, sites=None):
+        self.model = model
+        self.cache = cache
+        self.upstream = upstream
+        self.deployment = deployment or Config.AZURE_OPENAI_DEPLOYMENT_NAME
+        self.temperature = temperature if temperature is not None else getattr(model, 'temperature', None)
+        self.sites = set(sites) if sites is not None else set(Config.LLM_CACHE_SITES)
+
+    def invoke(self, messages: List, site: str = None):
+        use_cache = self.cache is not None and site in self.sites
+        trace = current_trace()
+        if use_cache:
+            key = prompt_fingerprint(self.deployment, messages, self.temperature)
+            cached = self.cache.get(key, site)
+            if cached is not None:
+                print(f"[LLM CACHE] Hit for {site}")
+                if trace is not None:
+                    trace.add_cached(self.upstream, site, message_payload(messages), cached)
+                return AIMessage(content=cached)
+
+        if trace is None:
+            response = call_with_retry(self.upstream, self.model.invoke, messages)
+        else:
+            content = trace.call(self.upstream, site, message_payload(messages),
+                                 lambda: call_with_retry(self.upstream, self.model.invoke, messages).content)
+            response = AIMessage(content=content)
+
+        if use_cache and isinstance(response.content, str):
+            self.cache.set(key, response.content, site)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
@@ -1,9 +1,25 @@
 import chromadb
 from chromadb.config import Settings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from openai import AzureOpenAI
 import os
+import time
+import numpy as np
 from config import Config
+from app.upstream import UpstreamOverloaded, UpstreamUnavailable, get_embedding_client, call_with_retry
+from app.tracing import current_trace, decode_vector, encode_vector
+
+def reduce_dimensions(vectors, dimensions):
+    """Keep the first ``dimensions`` values of each vector and rescale to unit length.
+
+    text-embedding-3 vectors put the most important information first, so this
+    matches what the API returns when asked for ``dimensions`` directly.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if not dimensions or dimensions >= matrix.shape[-1]:
+        return matrix
+    matrix = matrix[..., :dimensions]
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
 
 class ChromaDBManager:
     def __init__(self):
@@ -11,28 +27,84 @@ class ChromaDBManager:
         self.collection_name = "travel_knowledge"
         self.collection = self.chroma_client.get_or_create_collection(
             name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=self.collection_metadata()
         )
         
-        # Initialize embeddings client
-        self.embedding_client = AzureOpenAI(
-            azure_endpoint=Config.AZURE_OPENAI_EMBEDDING_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_EMBEDDING_API_KEY,
-            api_version=Config.AZURE_OPENAI_EMBEDDING_API_VERSION
-        )
+        # Embeddings client dùng chung connection pool của process
+        self.embedding_client = get_embedding_client()
         self.embedding_deployment = Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME
+        self.embedding_dimensions = Config.EMBEDDING_DIMENSIONS or None
+        self.embedding_dimensions_mode = Config.EMBEDDING_DIMENSIONS_MODE
+        self._apply_hnsw_settings()
+    
+    @staticmethod
+    def collection_metadata():
+        return {
+            "hnsw:space": "cosine",
+            "hnsw:M": Config.HNSW_M,
+            "hnsw:construction_ef": Config.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": Config.HNSW_SEARCH_EF
+        }
+    
+    def hnsw_settings(self):
+        """HNSW parameters the collection is actually using"""
+        hnsw = (self.collection.configuration or {}).get('hnsw') or {}
+        return {
+            'M': hnsw.get('max_neighbors'),
+            'construction_ef': hnsw.get('ef_construction'),
+            'search_ef': hnsw.get('ef_search')
+        }
+    
+    def _apply_hnsw_settings(self):
+        settings = self.hnsw_settings()
+        # search_ef đổi được trên collection có sẵn, nhưng chỉ trước lần tìm kiếm đầu tiên của process
+        # (index đã load giữ giá trị cũ); M và construction_ef cần xây lại index
+        if settings['search_ef'] != Config.HNSW_SEARCH_EF:
+            self.collection.modify(configuration={"hnsw": {"ef_search": Config.HNSW_SEARCH_EF}})
+        if (settings['M'], settings['construction_ef']) != (Config.HNSW_M, Config.HNSW_CONSTRUCTION_EF):
+            print(f"[CHROMA] Index was built with M={settings['M']}, construction_ef={settings['construction_ef']}; "
+                  f"HNSW_M={Config.HNSW_M}, HNSW_CONSTRUCTION_EF={Config.HNSW_CONSTRUCTION_EF} "
+                  f"apply after: python migrate_embeddings.py")
+    
+    def warm_up_index(self, queries=None):
+        """Load the HNSW index and run a few searches with stored vectors (no embedding calls).
+
+        The first search after a restart reads the index from disk; doing it here
+        keeps that cost out of the first user request. Returns the seconds spent.
+        """
+        queries = Config.HNSW_WARMUP_QUERIES if queries is None else queries
+        count = self.collection.count()
+        if count == 0 or queries <= 0:
+            return 0.0
+        start = time.perf_counter()
+        sample = self.collection.get(limit=queries, include=['embeddings'])
+        for embedding in sample['embeddings']:
+            self.collection.query(query_embeddings=[embedding], n_results=min(Config.RETRIEVAL_TOP_K, count), include=[])
+        elapsed = time.perf_counter() - start
+        print(f"[CHROMA] Index warmed up with {len(sample['ids'])} searches in {elapsed * 1000:.0f}ms")
+        return elapsed
+    
+    def stored_dimensions(self):
+        """Vector size of the documents already in the collection, None if it is empty"""
+        sample = self.collection.get(limit=1, include=['embeddings'])
+        if len(sample['ids']) == 0:
+            return None
+        return len(sample['embeddings'][0])
+    
+    def reset_collection(self, metadata=None):
+        """Drop the collection and create it again, empty"""
+        self.chroma_client.delete_collection(self.collection_name)
+        self.collection = self.chroma_client.get_or_create_collection(
+            name=self.collection_name,
+            metadata=metadata or self.collection_metadata()
+        )
+        return self.collection
     
     def add_documents(self, texts, metadatas=None):
         """Add documents to the ChromaDB collection"""
         try:
             # Create embeddings using AzureOpenAI client
-            embeddings = []
-            for text in texts:
-                response = self.embedding_client.embeddings.create(
-                    input=text,
-                    model=self.embedding_deployment
-                )
-                embeddings.append(response.data[0].embedding)
+            embeddings = [self._create_embedding(text) for text in texts]
             
             # Generate unique IDs
             import uuid
@@ -52,26 +124,74 @@ class ChromaDBManager:
             print(f"Error adding documents: {e}")
             return False
     
+    def _create_embedding(self, text):
+        """One embedding at the configured EMBEDDING_DIMENSIONS"""
+        kwargs = {}
+        if self.embedding_dimensions and self.embedding_dimensions_mode == 'api':
+            kwargs['dimensions'] = self.embedding_dimensions
+        response = call_with_retry(
+            'embeddings',
+            self.embedding_client.embeddings.create,
+            input=text,
+            model=self.embedding_deployment,
+            **kwargs
+        )
+        embedding = response.data[0].embedding
+        # Chế độ 'truncate', hoặc deployment bỏ qua tham số dimensions
+        if self.embedding_dimensions and len(embedding) > self.embedding_dimensions:
+            embedding = reduce_dimensions(embedding, self.embedding_dimensions).tolist()
+        return embedding
+    
+    def _embed_query(self, query_text):
+        """Embedding of a search query, recorded in (or replayed from) the active request trace"""
+        trace = current_trace()
+        if trace is None:
+            return self._create_embedding(query_text)
+        request = {'input': query_text, 'model': self.embedding_deployment}
+        if self.embedding_dimensions:
+            request['dimensions'] = self.embedding_dimensions
+        return trace.call('embeddings', 'query', request, lambda: self._create_embedding(query_text),
+                          encode=encode_vector, decode=decode_vector)
+    
     def query_documents(self, query_text, n_results=5):
         """Query documents from ChromaDB"""
         try:
             # Create query embedding using AzureOpenAI client
-            response = self.embedding_client.embeddings.create(
-                input=query_text,
-                model=self.embedding_deployment
-            )
-            query_embedding = response.data[0].embedding
+            query_embedding = self._embed_query(query_text)
             
             # Query collection
             results = self.collection.query(
                 query_embeddings=[query_embedding],
                 n_results=n_results
             )
+            # Lượt hỏi tiếp theo có thể tìm lại bằng embedding này mà không gọi Azure
+            results["query_embedding"] = query_embedding
             
             return results
+        except (UpstreamOverloaded, UpstreamUnavailable):
+            # Embeddings quá tải/không khả dụng: route trả 429/503
+            raise
+        except Exception as e:
+            print(f"Error querying documents: {e}")
+            return None
+    
+    def query_by_embedding(self, embedding, n_results=5):
+        """Query with an embedding computed earlier (no embedding call)"""
+        try:
+            return self.collection.query(
+                query_embeddings=[embedding],
+                n_results=max(1, min(n_results, self.collection.count()))
+            )
         except Exception as e:
             print(f"Error querying documents: {e}")
             return None
+    
+    def get_documents(self, ids):
+        """Documents by ID, as {id: document}; missing IDs are left out"""
+        if not ids:
+            return {}
+        results = self.collection.get(ids=list(ids), include=['documents'])
+        return dict(zip(results['ids'], results['documents']))
 
 class DocumentProcessor:
     def __init__(self):
@@ -1,19 +1,31 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Blueprint, Response, render_template, request, jsonify, session, redirect, url_for, flash, stream_with_context
 from werkzeug.utils import secure_filename
 import os
 import base64
+import uuid
+import time
 from config import Config
-from app.ai_agent import TravelAIAgent
-from app.tts_service import TTSService
-from app.models import ChromaDBManager, DocumentProcessor
+from app import services
+from app.services import get_ai_agent, get_db_manager, get_doc_processor, get_tts_service
+from app.tts_workers import TTSBusyError
+from app.session_store import create_session_store
+from app.upstream import (UpstreamOverloaded, UpstreamUnavailable, admission_slot, get_breaker,
+                          is_available, upstream_stats)
+from app.image_processing import InvalidImageError, normalize_image_async, pipeline_stats
+from app.image_store import ImageStore
 
 main = Blueprint('main', __name__)
 
-# Initialize services
-ai_agent = TravelAIAgent()
-tts_service = TTSService()
-db_manager = ChromaDBManager()
-doc_processor = DocumentProcessor()
+# Agent, ChromaDB, TTS và document processor được khởi tạo lần đầu khi cần (app/services.py)
+session_store = create_session_store()
+image_store = ImageStore()
+started_at = time.time()
+
+def _get_session_id():
+    """Stable per-browser ID used to key server-side chat state"""
+    if 'session_id' not in session:
+        session['session_id'] = uuid.uuid4().hex
+    return session['session_id']
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -49,20 +61,72 @@ def admin_logout():
     session.pop('admin_logged_in', None)
     return redirect(url_for('main.index'))
 
+def _parse_chat_request():
+    """Read message and image from a multipart or JSON chat request.
+
+    Returns (message, image_bytes, image_type, image_normalized, error).
+    """
+    if request.mimetype == 'multipart/form-data':
+        message = request.form.get('message', '')
+        image_id = request.form.get('image_id')
+        file = request.files.get('image')
+        if file and file.filename:
+            try:
+                image_bytes, image_type, image_normalized = _prepare_uploaded_image(file.read(), file.mimetype)
+            except InvalidImageError:
+                return message, None, None, False, 'Invalid image file'
+            return message, image_bytes, image_type, image_normalized, None
+    else:
+        data = request.get_json(silent=True)
+        if not data:
+            return None, None, None, False, 'No data provided'
+        message = data.get('message', '')
+        image_id = data.get('image_id')
+
+        # Client cũ vẫn gửi ảnh base64 trong JSON
+        if data.get('image_data'):
+            try:
+                image_bytes = base64.b64decode(data['image_data'])
+            except (ValueError, TypeError):
+                return message, None, None, False, 'Invalid image data'
+            return message, image_bytes, data.get('image_type'), False, None
+
+    if image_id:
+        stored = image_store.get(image_id)
+        if stored is None:
+            return message, None, None, False, 'Image expired or not found, please upload again'
+        return message, stored[0], stored[1], Config.IMAGE_NORMALIZE_ENABLED, None
+
+    return message, None, None, False, None
+
+def _prepare_uploaded_image(image_bytes, mime_type):
+    """Normalize an uploaded image in the worker pool. Returns (bytes, mime_type, normalized)"""
+    if not Config.IMAGE_NORMALIZE_ENABLED:
+        return image_bytes, mime_type, False
+    normalized_bytes, normalized_type = normalize_image_async(image_bytes).result()
+    return normalized_bytes, normalized_type, True
+
+def _upstream_error_response(error):
+    """429 when we shed load ourselves, 503 when the upstream is down; both with Retry-After"""
+    response = jsonify({
+        'error': 'Hệ thống đang quá tải, vui lòng thử lại sau ít phút' if isinstance(error, UpstreamOverloaded)
+                 else 'Dịch vụ AI tạm thời không khả dụng, vui lòng thử lại sau',
+        'status': 'error'
+    })
+    response.status_code = 429 if isinstance(error, UpstreamOverloaded) else 503
+    response.headers['Retry-After'] = str(max(1, int(error.retry_after + 0.999)))
+    return response
+
 @main.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat requests"""
+    # Hạn chót tính từ lúc request đến, gồm cả thời gian chờ admission slot
+    deadline = time.monotonic() + Config.REQUEST_DEADLINE if Config.REQUEST_DEADLINE > 0 else None
     try:
-        data = request.get_json()
-        print(f"[DEBUG] Received data: {data}")  # Debug log
-        
-        if not data:
-            print("[DEBUG] No data provided")
-            return jsonify({'error': 'No data provided'}), 400
-        
-        message = data.get('message', '')
-        image_data = data.get('image_data')
-        image_type = data.get('image_type')
+        message, image_data, image_type, image_normalized, error = _parse_chat_request()
+        if error:
+            print(f"[DEBUG] {error}")
+            return jsonify({'error': error}), 400
         
         print(f"[DEBUG] Message: {message[:50] if message else 'None'}...")
         print(f"[DEBUG] Has image: {bool(image_data)}")
@@ -71,19 +135,44 @@ def chat():
             print("[DEBUG] No message or image provided")
             return jsonify({'error': 'Message or image is required'}), 400
         
-        # Lấy chat history từ session
-        chat_history = session.get('chat_history', [])
+        # Lấy chat history từ session store phía server (cookie chỉ giữ session_id)
+        session_id = _get_session_id()
+        chat_state = session_store.get(session_id) or {}
+        chat_history = list(chat_state.get('chat_history', []))
+        history_summary = chat_state.get('history_summary', '')
+        last_retrieval = chat_state.get('last_retrieval')
 
+        # LLM đang lỗi: từ chối ngay thay vì chạy cả pipeline rồi mới thất bại
+        if not is_available('llm'):
+            return _upstream_error_response(UpstreamUnavailable('llm', get_breaker('llm').retry_after()))
+        
         # Process query with AI agent
-        result = ai_agent.process_query(message, image_data, chat_history)
+        with admission_slot('chat'):
+            result = get_ai_agent().process_query(message, image_data, chat_history,
+                                                  history_summary=history_summary, session_id=session_id,
+                                                  image_type=image_type, image_normalized=image_normalized,
+                                                  last_retrieval=last_retrieval, deadline=deadline)
+
+        # Cập nhật chat history vào session store
+        session_store.set(session_id, {
+            'chat_history': result['chat_history'],
+            'history_summary': result.get('history_summary', ''),
+            'last_retrieval': result.get('last_retrieval')
+        })
 
-        session['chat_history'] = result['chat_history']  # Cập nhật chat history vào session
+        if Config.TTS_SPECULATIVE_ENABLED:
+            # Người dùng thường bấm nghe ngay sau khi nhận câu trả lời: tổng hợp trước vài câu đầu
+            get_tts_service().speculate_async(result['response'])
 
         return jsonify({
             'response': result['response'],
+            'skipped_stages': result.get('skipped_stages', []),
             'status': 'success'
         })
         
+    except (UpstreamOverloaded, UpstreamUnavailable) as e:
+        print(f"[ADMISSION] Chat rejected: {e}")
+        return _upstream_error_response(e)
     except Exception as e:
         print(f"[ERROR] Chat error: {str(e)}")
         import traceback
@@ -93,9 +182,80 @@ def chat():
             'status': 'error'
         }), 500
 
+@main.route('/api/chat/history_stats', methods=['GET'])
+def chat_history_stats():
+    """Prompt-token savings from history compaction for the current session"""
+    ai_agent = get_ai_agent()
+    if not ai_agent.history_compactor:
+        return jsonify({'enabled': False, 'status': 'success'})
+    
+    stats = ai_agent.history_compactor.get_stats(_get_session_id())
+    stats.update({'enabled': True, 'status': 'success'})
+    return jsonify(stats)
+
+@main.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is serving; reports which services are loaded"""
+    return jsonify({
+        'status': 'ok',
+        'uptime_seconds': round(time.time() - started_at, 1),
+        'services': services.status()
+    })
+
+@main.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 503 until the services in READINESS_SERVICES are loaded"""
+    readiness = services.readiness()
+    readiness['services'] = services.status()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+@main.route('/api/upstreams', methods=['GET'])
+def upstreams_status():
+    """Circuit breaker state, admission queues (wait times, rejections) and connection reuse for every upstream"""
+    return jsonify(upstream_stats())
+
+@main.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit rates of the response caches"""
+    ai_agent = get_ai_agent()
+    # Không load model TTS chỉ để lấy thống kê
+    tts_service = get_tts_service() if services.is_loaded('tts') else None
+    return jsonify({
+        'llm': ai_agent.llm_cache.stats() if ai_agent.llm_cache else None,
+        'image': ai_agent.image_cache.stats() if ai_agent.image_cache else None,
+        'tts': tts_service.audio_cache.stats() if tts_service and tts_service.audio_cache else None
+    })
+
+@main.route('/api/image_stats', methods=['GET'])
+def image_stats():
+    """Bytes and vision latency saved by server-side image normalization"""
+    stats = pipeline_stats.snapshot()
+    stats['store'] = image_store.stats()
+    return jsonify(stats)
+
+def _negotiate_audio_format():
+    """Pick wav/ogg/mp3 from ?format= or the Accept header; 'json' keeps the legacy base64 response"""
+    from app.tts_service import AUDIO_FORMATS
+    
+    requested = request.args.get('format', '').lower()
+    if requested in AUDIO_FORMATS or requested == 'json':
+        return requested
+    
+    by_mimetype = {mimetype: fmt for fmt, (mimetype, _, _) in AUDIO_FORMATS.items()}
+    by_mimetype['application/json'] = 'json'
+    # WAV đứng đầu nên là mặc định khi client gửi */*
+    best = request.accept_mimetypes.best_match(list(by_mimetype), default='audio/wav')
+    return by_mimetype[best]
+
+def _tts_busy_response(error: TTSBusyError):
+    response = jsonify({'success': False, 'error': 'TTS đang quá tải, vui lòng thử lại sau'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @main.route('/api/tts', methods=['POST'])
 def text_to_speech():
-    """Convert text to speech"""
+    """Convert text to speech, returned as binary audio (wav, ogg/opus or mp3)"""
     try:
         data = request.get_json()
         text = data.get('text', '')
@@ -105,17 +265,26 @@ def text_to_speech():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
+        audio_format = _negotiate_audio_format()
+        
         # Generate audio
-        audio_data = tts_service.text_to_speech(text)
+        from app.tts_service import AUDIO_FORMATS
+        tts_service = get_tts_service()
+        audio_data = tts_service.text_to_speech(text, 'wav' if audio_format == 'json' else audio_format)
         
         if audio_data:
-            # Convert to base64 for JSON response
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             print(f"[TTS] Generated {len(audio_data)} bytes audio")
-            return jsonify({
-                'success': True,
-                'audio': audio_base64
-            })
+            if audio_format == 'json':
+                # Client cũ: base64 trong JSON
+                return jsonify({
+                    'success': True,
+                    'audio': base64.b64encode(audio_data).decode('utf-8')
+                })
+            return Response(
+                audio_data,
+                mimetype=AUDIO_FORMATS[audio_format][0],
+                headers={'Vary': 'Accept', 'X-Sample-Rate': str(tts_service.sampling_rate)}
+            )
         else:
             print("[TTS] Failed to generate audio")
             return jsonify({
@@ -123,6 +292,8 @@ def text_to_speech():
                 'error': 'Failed to generate audio'
             }), 500
             
+    except TTSBusyError as e:
+        return _tts_busy_response(e)
     except Exception as e:
         print(f"[TTS] Error: {str(e)}")
         import traceback
@@ -132,6 +303,65 @@ def text_to_speech():
             'error': f'TTS Error: {str(e)}'
         }), 500
 
+@main.route('/api/tts/stream', methods=['POST'])
+def text_to_speech_stream():
+    """Stream speech as 16-bit PCM WAV, sentence by sentence"""
+    data = request.get_json(silent=True) or {}
+    text = data.get('text', '')
+    
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    
+    tts_service = get_tts_service()
+    if not tts_service.ready:
+        return jsonify({'success': False, 'error': 'TTS model not loaded'}), 503
+    
+    print(f"[TTS] Streaming text: {text[:100]}...")
+    
+    try:
+        audio_stream = tts_service.stream_wav(text)
+    except TTSBusyError as e:
+        return _tts_busy_response(e)
+    
+    return Response(
+        stream_with_context(audio_stream),
+        mimetype='audio/wav',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@main.route('/api/tts_stats', methods=['GET'])
+def tts_metrics():
+    """Time-to-first-audio and real-time factor for full vs streamed TTS, worker pool load and speculation hit rate"""
+    from app.tts_service import speculation_stats, tts_stats
+    
+    tts_service = get_tts_service() if services.is_loaded('tts') else None
+    stats = tts_stats.snapshot()
+    stats['inference_mode'] = tts_service.inference_mode if tts_service else None
+    stats['workers'] = tts_service.pool.stats() if tts_service and tts_service.pool else None
+    stats['speculation'] = speculation_stats.snapshot() if Config.TTS_SPECULATIVE_ENABLED else None
+    return jsonify(stats)
+
+@main.route('/api/tts_cache/warm', methods=['POST'])
+def warm_tts_cache():
+    """Pre-synthesize audio for the given texts, or the most requested ones (admin only)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    tts_service = get_tts_service()
+    if tts_service.audio_cache is None or not tts_service.ready:
+        return jsonify({'error': 'TTS cache is not available'}), 503
+    
+    data = request.get_json(silent=True) or {}
+    texts = data.get('texts') or None
+    if texts is not None and not isinstance(texts, list):
+        return jsonify({'error': 'texts must be a list'}), 400
+    
+    tts_service.warm_cache_async(texts)
+    return jsonify({
+        'status': 'started',
+        'texts': len(texts) if texts else len(tts_service.audio_cache.popular_texts(Config.TTS_CACHE_WARM_TOP))
+    }), 202
+
 @main.route('/api/upload', methods=['POST'])
 def upload_document():
     """Upload and process documents for admin"""
@@ -160,11 +390,11 @@ def upload_document():
         file_ext = filename.rsplit('.', 1)[1].lower()
         
         if file_ext == 'txt':
-            chunks = doc_processor.process_text_file(file_path)
+            chunks = get_doc_processor().process_text_file(file_path)
         elif file_ext == 'pdf':
-            chunks = doc_processor.process_pdf_file(file_path)
+            chunks = get_doc_processor().process_pdf_file(file_path)
         elif file_ext == 'docx':
-            chunks = doc_processor.process_docx_file(file_path)
+            chunks = get_doc_processor().process_docx_file(file_path)
         else:
             return jsonify({'error': 'Unsupported file type'}), 400
         
@@ -174,7 +404,7 @@ def upload_document():
         # Add chunks to ChromaDB
         metadatas = [{'source': filename, 'chunk_id': i} for i in range(len(chunks))]
         
-        success = db_manager.add_documents(chunks, metadatas)
+        success = get_db_manager().add_documents(chunks, metadatas)
         
         # Clean up uploaded file
         os.remove(file_path)
@@ -205,15 +435,25 @@ def upload_image():
         if file.filename == '':
             return jsonify({'error': 'No image selected'}), 400
         
-        # Read and encode image
+        # Chuẩn hóa một lần và giữ ảnh phía server, client chỉ cần gửi lại image_id
         image_data = file.read()
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        image_bytes, image_type, _ = _prepare_uploaded_image(image_data, file.mimetype)
+        image_id = image_store.put(image_bytes, image_type)
         
         return jsonify({
-            'image_data': image_base64,
+            'image_id': image_id,
+            'image_type': image_type,
+            'size': len(image_bytes),
+            'original_size': len(image_data),
+            'expires_in': image_store.ttl_seconds,
             'status': 'success'
         })
         
+    except InvalidImageError:
+        return jsonify({
+            'error': 'Invalid image file',
+            'status': 'error'
+        }), 400
     except Exception as e:
         return jsonify({
             'error': f'Image upload error: {str(e)}',
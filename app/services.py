@@ -0,0 +1,154 @@
+"""Process-wide services, built lazily on first use.
+
+Routes get the agent, vector store, document processor and TTS through the
+getters below instead of constructing them at import time, so ``create_app()``
+stays cheap and heavy libraries (torch, transformers, chromadb, langgraph) are
+only imported when a service is actually needed or by the background warm-up.
+"""
+
+from typing import List
+import threading
+import time
+from config import Config
+
+class LazyService:
+    """Build an instance once, on first ``get()``, even with concurrent callers"""
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.state = 'not_loaded'  # not_loaded | loading | loaded | failed
+        self.load_seconds = None
+        self.error = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self):
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self._instance is None:
+                self.state = 'loading'
+                start = time.perf_counter()
+                try:
+                    instance = self.factory()
+                except Exception as e:
+                    self.state, self.error = 'failed', str(e)
+                    print(f"[SERVICES] Failed to load {self.name}: {e}")
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self._instance, self.state, self.error = instance, 'loaded', None
+                print(f"[SERVICES] {self.name} loaded in {self.load_seconds:.2f}s")
+        return self._instance
+
+    def set(self, instance):
+        """Replace the instance (tests, benchmarks)"""
+        with self._lock:
+            self._instance = instance
+            self.state = 'loaded' if instance is not None else 'not_loaded'
+            self.load_seconds = self.error = None
+
+    def status(self) -> dict:
+        status = {
+            'state': self.state,
+            'load_ms': round(self.load_seconds * 1000, 1) if self.load_seconds is not None else None
+        }
+        if self.error:
+            status['error'] = self.error
+        # TTS có thể khởi tạo xong nhưng không load được model
+        if self._instance is not None and hasattr(self._instance, 'ready'):
+            status['ready'] = bool(self._instance.ready)
+        return status
+
+def _build_db_manager():
+    from app.models import ChromaDBManager
+    db_manager = ChromaDBManager()
+    db_manager.warm_up_index()
+    return db_manager
+
+def _build_ai_agent():
+    from app.ai_agent import TravelAIAgent
+    # Dùng chung ChromaDBManager với route upload tài liệu
+    return TravelAIAgent(db_manager=get_db_manager())
+
+def _build_doc_processor():
+    from app.models import DocumentProcessor
+    return DocumentProcessor()
+
+def _build_tts_service():
+    from app.tts_service import TTSService
+    if Config.TTS_WORKERS > 0:
+        from app.tts_workers import TTSWorkerPool
+        # Không chờ worker load model: TTS báo chưa sẵn sàng (503, /readyz) cho tới khi có worker
+        return TTSService(pool=TTSWorkerPool())
+    return TTSService()
+
+_services = {
+    'db': LazyService('db', _build_db_manager),
+    'agent': LazyService('agent', _build_ai_agent),
+    'documents': LazyService('documents', _build_doc_processor),
+    'tts': LazyService('tts', _build_tts_service)
+}
+
+def get_db_manager():
+    return _services['db'].get()
+
+def get_ai_agent():
+    return _services['agent'].get()
+
+def get_doc_processor():
+    return _services['documents'].get()
+
+def get_tts_service():
+    return _services['tts'].get()
+
+def is_loaded(name: str) -> bool:
+    return _services[name].loaded
+
+def set_service(name: str, instance):
+    _services[name].set(instance)
+
+def status() -> dict:
+    return {name: service.status() for name, service in _services.items()}
+
+def readiness() -> dict:
+    """Whether every service in READINESS_SERVICES is loaded (and ready, for TTS)"""
+    waiting = []
+    for name in Config.READINESS_SERVICES:
+        service_status = _services[name].status()
+        if service_status['state'] != 'loaded' or service_status.get('ready') is False:
+            waiting.append(name)
+    return {'ready': not waiting, 'waiting_for': waiting}
+
+def warm_up(names: List[str] = None):
+    """Load services in order; failures are recorded in status() instead of raised"""
+    for name in names if names is not None else Config.SERVICES_WARMUP:
+        try:
+            _services[name].get()
+        except Exception:
+            pass
+
+_warm_up_thread = None
+
+def after_fork(torch_threads: int):
+    """Per-worker setup in a pre-fork server whose master preloaded some services"""
+    global _warm_up_thread
+    _warm_up_thread = None  # Thread warm-up của master không tồn tại trong worker
+    Config.TTS_NUM_THREADS = torch_threads
+    if _services['tts'].loaded:
+        get_tts_service().after_fork(torch_threads)
+    warm_up_async([name for name in Config.SERVICES_WARMUP if not _services[name].loaded])
+
+def warm_up_async(names: List[str] = None) -> threading.Thread:
+    """Start the background warm-up once per process"""
+    global _warm_up_thread
+    if _warm_up_thread is None:
+        _warm_up_thread = threading.Thread(target=warm_up, args=(names,), daemon=True, name="services-warm-up")
+        _warm_up_thread.start()
+    return _warm_up_thread
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from typing import Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+_UPSERT_SESSION = """
+    INSERT INTO chat_sessions (session_id, version, expires_at, data) VALUES (?, 1, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        version = version + 1, expires_at = excluded.expires_at, data = excluded.data
+"""
+_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+class MemorySessionStore:
+    """In-process LRU store for chat sessions with idle TTL"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None):
+        self.max_entries = max_entries or Config.SESSION_STORE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.SESSION_STORE_TTL
+        self._data = OrderedDict()  # session_id -> (expires_at, data)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[dict]:
+        if not session_id:
+            return None
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._data[session_id]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, session_id: str, data: dict):
+        if not session_id:
+            return
+        with self._lock:
+            self._data[session_id] = (time.time() + self.ttl_seconds, data)
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+class SQLiteSessionStore:
+    """SQLite-backed session store shared by all workers on one host.
+
+    Keeps a memory LRU in front of the database; entries are validated by
+    version so a session updated by another worker is never served stale.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None, ttl_seconds: int = None):
+        self.path = path or Config.SESSION_STORE_SQLITE_PATH
+        self.ttl_seconds = ttl_seconds or Config.SESSION_STORE_TTL
+        self.memory = MemorySessionStore(max_entries=max_entries, ttl_seconds=self.ttl_seconds)
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_expires ON chat_sessions(expires_at)")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connection không dùng chung được giữa các thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[dict]:
+        if not session_id:
+            return None
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT version, expires_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            self.memory.delete(session_id)
+            return None
+
+        # Bộ nhớ đệm lưu (version, data)
+        cached = self.memory.get(session_id)
+        if cached is not None and cached[0] == row[0]:
+            return cached[1]
+
+        row = conn.execute(
+            "SELECT version, data FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[1])
+        self.memory.set(session_id, (row[0], data))
+        return data
+
+    def set(self, session_id: str, data: dict):
+        if not session_id:
+            return
+        conn = self._connect()
+        now = time.time()
+        params = (session_id, now + self.ttl_seconds, json.dumps(data, ensure_ascii=False))
+        # Version phải là của chính lần ghi này, không phải của worker khác ghi ngay sau đó
+        if _SUPPORTS_RETURNING:
+            # fetchall() chạy hết câu lệnh để transaction tự commit ngay
+            version = conn.execute(_UPSERT_SESSION + " RETURNING version", params).fetchall()[0][0]
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(_UPSERT_SESSION, params)
+                version = conn.execute(
+                    "SELECT version FROM chat_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self.memory.set(session_id, (version, data))
+
+        # Dọn các phiên hết hạn định kỳ
+        self._writes += 1
+        if self._writes % 500 == 0:
+            conn.execute("DELETE FROM chat_sessions WHERE expires_at < ?", (now,))
+
+    def delete(self, session_id: str):
+        self._connect().execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        self.memory.delete(session_id)
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats['backend'] = 'sqlite'
+        stats['path'] = self.path
+        stats['persisted_entries'] = self._connect().execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+        return stats
+
+def create_session_store():
+    """Build the session store configured by SESSION_STORE_BACKEND"""
+    if Config.SESSION_STORE_BACKEND == 'sqlite':
+        print(f"[SESSION] Using SQLite session store at {Config.SESSION_STORE_SQLITE_PATH}")
+        return SQLiteSessionStore()
+    return MemorySessionStore()
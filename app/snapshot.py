@@ -0,0 +1,150 @@
+"""Portable snapshots of the knowledge-base collection.
+
+A snapshot is a directory with three files:
+
+    embeddings.npy    N x D matrix, one row per document, in documents.jsonl order
+    documents.jsonl   {"id", "document", "metadata"} per line
+    manifest.json     format version, count, dimensions, dtype, embedding model,
+                      collection metadata (distance space, HNSW) and SHA-256 of both files
+
+Importing one loads the stored vectors directly, so a new node is ready without
+any embedding calls. The embedding model is checked against the configured
+deployment because vectors from different models are not comparable. Vectors
+can be stored as float16 (half the size) and are shortened on import when the
+node uses a smaller EMBEDDING_DIMENSIONS. The index is built with this node's
+HNSW settings, not the ones recorded in the manifest.
+"""
+
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from config import Config
+from app.models import reduce_dimensions
+
+SNAPSHOT_FORMAT = 1
+EMBEDDINGS_FILE = 'embeddings.npy'
+DOCUMENTS_FILE = 'documents.jsonl'
+MANIFEST_FILE = 'manifest.json'
+BATCH_SIZE = 1000
+
+class SnapshotError(Exception):
+    """Snapshot is missing, corrupt, or incompatible with this node"""
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_snapshot(db_manager, directory: str, embedding_model: str = None, dtype: str = None) -> dict:
+    """Write the collection to ``directory``; returns the manifest"""
+    dtype = dtype or Config.SNAPSHOT_DTYPE
+    collection = db_manager.collection
+    count = collection.count()
+    os.makedirs(directory, exist_ok=True)
+
+    vectors = []
+    with open(os.path.join(directory, DOCUMENTS_FILE), 'w', encoding='utf-8') as f:
+        # Đọc theo lô để không giữ cả collection dạng list Python trong bộ nhớ
+        for offset in range(0, count, BATCH_SIZE):
+            batch = collection.get(include=['embeddings', 'documents', 'metadatas'], limit=BATCH_SIZE, offset=offset)
+            for doc_id, document, metadata in zip(batch['ids'], batch['documents'], batch['metadatas']):
+                f.write(json.dumps({'id': doc_id, 'document': document, 'metadata': metadata}, ensure_ascii=False) + '\n')
+            vectors.append(np.asarray(batch['embeddings'], dtype=dtype))
+
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=dtype)
+    np.save(os.path.join(directory, EMBEDDINGS_FILE), matrix, allow_pickle=False)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'collection': db_manager.collection_name,
+        'collection_metadata': collection.metadata or {},
+        'count': int(matrix.shape[0]),
+        'dimensions': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        'dtype': str(matrix.dtype),
+        'embedding_model': embedding_model or Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'checksums': {
+            EMBEDDINGS_FILE: _file_sha256(os.path.join(directory, EMBEDDINGS_FILE)),
+            DOCUMENTS_FILE: _file_sha256(os.path.join(directory, DOCUMENTS_FILE))
+        }
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+def read_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise SnapshotError(f"No {MANIFEST_FILE} in {directory}")
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')}")
+    return manifest
+
+def verify_snapshot(directory: str) -> dict:
+    """Check both files against the manifest checksums; returns the manifest"""
+    manifest = read_manifest(directory)
+    for name, expected in manifest['checksums'].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            raise SnapshotError(f"Missing {name}")
+        if _file_sha256(path) != expected:
+            raise SnapshotError(f"Checksum mismatch for {name}")
+    return manifest
+
+def import_snapshot(db_manager, directory: str, embedding_model: str = None, replace: bool = False,
+                    allow_model_mismatch: bool = False, dimensions: int = None) -> dict:
+    """Load a snapshot into the collection without calling the embedding API.
+
+    Existing documents with the same IDs are overwritten; ``replace`` empties
+    the collection first. Vectors are cut to ``dimensions`` (default
+    EMBEDDING_DIMENSIONS) and renormalized. Returns the manifest plus import timing.
+    """
+    start = time.perf_counter()
+    manifest = verify_snapshot(directory)
+
+    expected_model = embedding_model or Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME
+    if manifest['embedding_model'] != expected_model and not allow_model_mismatch:
+        raise SnapshotError(f"Snapshot was embedded with '{manifest['embedding_model']}', "
+                            f"this node uses '{expected_model}'")
+
+    matrix = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode='r', allow_pickle=False)
+    with open(os.path.join(directory, DOCUMENTS_FILE), encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if len(records) != matrix.shape[0] or len(records) != manifest['count']:
+        raise SnapshotError(f"Snapshot has {len(records)} documents and {matrix.shape[0]} embeddings, "
+                            f"manifest says {manifest['count']}")
+
+    dimensions = dimensions or Config.EMBEDDING_DIMENSIONS or manifest['dimensions']
+    if records and dimensions > manifest['dimensions']:
+        raise SnapshotError(f"Snapshot vectors have {manifest['dimensions']} dimensions, this node uses "
+                            f"{dimensions}; re-embed the documents instead")
+
+    if replace:
+        collection = db_manager.reset_collection()
+    else:
+        collection = db_manager.collection
+
+    # Chroma giới hạn số bản ghi mỗi lần ghi
+    batch_size = min(BATCH_SIZE * 5, db_manager.chroma_client.get_max_batch_size())
+    for offset in range(0, len(records), batch_size):
+        batch = records[offset:offset + batch_size]
+        collection.upsert(
+            ids=[r['id'] for r in batch],
+            documents=[r['document'] for r in batch],
+            metadatas=[r['metadata'] for r in batch],
+            embeddings=reduce_dimensions(matrix[offset:offset + batch_size], dimensions)
+        )
+
+    manifest['imported_dimensions'] = int(dimensions)
+    manifest['import_seconds'] = round(time.perf_counter() - start, 3)
+    return manifest
+
+def describe(manifest: dict) -> str:
+    return (f"{manifest['count']} documents, {manifest['dimensions']}d {manifest['dtype']}, "
+            f"model '{manifest['embedding_model']}', created {manifest['created_at']}")
@@ -0,0 +1,129 @@
+"""Offline stand-ins shared by the tests, benchmarks and the load-test server.
+
+Nothing here downloads a model or calls Azure: ``build_tiny_tts`` builds a
+small random-weight VITS with the same interface as facebook/mms-tts-vie,
+``build_fake_db_manager`` answers embedding calls with ``FakeEmbeddings`` and
+``build_offline_agent`` wires fake LLMs into TravelAIAgent. ``config_overrides``
+scopes Config changes to a single test.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+SAMPLE_TEXT = (
+    "Hà Nội là thủ đô của Việt Nam với nhiều địa điểm du lịch hấp dẫn. "
+    "Bạn có thể bắt đầu buổi sáng bằng một tô phở bò nóng hổi ở phố Lò Đúc. "
+    "Sau đó hãy dạo quanh hồ Hoàn Kiếm, ghé thăm đền Ngọc Sơn và cầu Thê Húc. "
+    "Buổi trưa, bún chả Hàng Mành là lựa chọn rất được du khách yêu thích. "
+    "Buổi chiều bạn nên tham quan Văn Miếu Quốc Tử Giám, nơi được xem là trường đại học đầu tiên của Việt Nam. "
+    "Nếu trời mưa, bảo tàng Dân tộc học là một điểm đến thú vị để tìm hiểu văn hóa các dân tộc. "
+    "Buổi tối, hãy thưởng thức chả cá Lã Vọng và dạo phố cổ về đêm. "
+    "Đừng quên thử cà phê trứng ở phố Hàng Gai trước khi kết thúc chuyến đi!"
+)
+
+TINY_VOCAB = list(" abcdefghijklmnopqrstuvwxyzàáảãạăắằẳẵặâấầẩẫậèéẻẽẹêếềểễệìíỉĩịòóỏõọôốồổỗộơớờởỡợùúủũụưứừửữựỳýỷỹỵđ.,!?")
+
+@contextmanager
+def config_overrides(**values):
+    """Set Config attributes for the duration of a block (or a decorated test), then restore them"""
+    from config import Config
+
+    saved = {name: getattr(Config, name) for name in values}
+    for name, value in values.items():
+        setattr(Config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+def offline_embedding_settings() -> dict:
+    """Dummy Azure embedding settings (real ones win) so the client can be created without a .env"""
+    from config import Config
+
+    return {
+        'AZURE_OPENAI_EMBEDDING_ENDPOINT': Config.AZURE_OPENAI_EMBEDDING_ENDPOINT or "http://127.0.0.1:9",
+        'AZURE_OPENAI_EMBEDDING_API_KEY': Config.AZURE_OPENAI_EMBEDDING_API_KEY or "test",
+        'AZURE_OPENAI_EMBEDDING_API_VERSION': Config.AZURE_OPENAI_EMBEDDING_API_VERSION or "2024-06-01",
+    }
+
+def hashed_embedding(text: str, dimensions: int = 32) -> list:
+    """Deterministic unit vector per text"""
+    import numpy as np
+
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+class FakeResponse:
+    """Chat model reply with just the ``content`` the app reads"""
+
+    def __init__(self, content):
+        self.content = content
+
+class FakeEmbeddings:
+    """Stands in for ``ChromaDBManager.embedding_client``; ``vector(text, dimensions)`` builds each embedding.
+
+    The keyword arguments of every call are kept in ``calls``; with ``live=False`` any call fails the test.
+    """
+
+    def __init__(self, vector=None, live=True):
+        self.embeddings = self
+        self.vector = vector or (lambda text, dimensions: hashed_embedding(text, dimensions or 32))
+        self.live = live
+        self.calls = []
+
+    def create(self, input, model, **kwargs):
+        assert self.live, "unexpected embedding API call"
+        self.calls.append(kwargs)
+        embedding = [float(x) for x in self.vector(input, kwargs.get("dimensions"))]
+        return SimpleNamespace(data=[SimpleNamespace(embedding=embedding)])
+
+def build_fake_db_manager(path: str, embeddings=None, **settings):
+    """ChromaDBManager stored at ``path`` whose embedding calls go to ``embeddings`` instead of Azure.
+
+    ``settings`` are extra Config overrides applied while the collection is opened.
+    """
+    from app.models import ChromaDBManager
+
+    with config_overrides(CHROMADB_PATH=path, **offline_embedding_settings(), **settings):
+        db = ChromaDBManager()
+    db.embedding_client = embeddings or FakeEmbeddings()
+    return db
+
+def build_offline_agent(llm, vision_llm=None, db_manager=None):
+    """TravelAIAgent with the given fakes and without the on-disk LLM/image caches or history summaries"""
+    from app.ai_agent import TravelAIAgent
+
+    with config_overrides(LLM_CACHE_ENABLED=False, IMAGE_CACHE_ENABLED=False, CHAT_HISTORY_SUMMARY_ENABLED=False):
+        return TravelAIAgent(llm=llm, vision_llm=vision_llm or llm, db_manager=db_manager)
+
+def build_tiny_tts(inference_mode: str = "fp32", deterministic: bool = False):
+    """TTSService backed by a small random-weight VITS and no audio cache, for offline tests and benchmarks"""
+    import torch
+    from transformers import VitsConfig, VitsModel, VitsTokenizer
+    from app.tts_service import TTSService
+
+    # Tokenizer đọc vocab vào bộ nhớ lúc khởi tạo, file tạm xóa ngay được
+    with tempfile.TemporaryDirectory(prefix="tts-vocab-") as tmp:
+        vocab_path = os.path.join(tmp, "vocab.json")
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            json.dump({c: i for i, c in enumerate(TINY_VOCAB)}, f, ensure_ascii=False)
+        tokenizer = VitsTokenizer(vocab_path, language=None, add_blank=True, normalize=True, phonemize=False)
+
+    torch.manual_seed(0)
+    config = VitsConfig(
+        vocab_size=len(tokenizer), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+        ffn_dim=128, flow_size=64, spectrogram_bins=65, upsample_initial_channel=64,
+        prior_encoder_num_flows=2, prior_encoder_num_wavenet_layers=2, posterior_encoder_num_wavenet_layers=2,
+        duration_predictor_num_flows=2, duration_predictor_filter_channels=64, sampling_rate=16000
+    )
+    if deterministic:
+        config.noise_scale = config.noise_scale_duration = 0.0
+    # Không dùng ./data/tts_cache; test nào cần cache tự gắn thư mục tạm
+    with config_overrides(TTS_CACHE_ENABLED=False):
+        return TTSService(model=VitsModel(config), tokenizer=tokenizer, inference_mode=inference_mode)
@@ -0,0 +1,237 @@
+"""Request traces: one JSONL line per chat request, and deterministic replay of them.
+
+While a trace is active (a context variable, so concurrent requests never mix),
+the agent records how long each LangGraph stage took and every upstream call it
+made: LLM prompts and answers, query embeddings, weather payloads. Images are
+stored only as a SHA-256 reference. ``replay_traces.py`` re-runs the recorded
+requests against the current code with a replaying trace, which answers those
+upstream calls from the recording instead of calling Azure or OpenWeather.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+import base64
+import functools
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from config import Config
+
+_current = ContextVar('request_trace', default=None)
+
+class ReplayMiss(Exception):
+    """A replayed request made an upstream call that is not in its recording"""
+
+class ReplayedError(Exception):
+    """An upstream call that failed while recording fails the same way on replay"""
+
+def sha256_hex(data) -> str:
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def encode_vector(vector) -> str:
+    """Embedding as base64 float32: exact on replay and ~4x smaller than a JSON list"""
+    import numpy as np
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode('ascii')
+
+def decode_vector(data: str) -> list:
+    import numpy as np
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).tolist()
+
+def message_payload(messages) -> list:
+    """LangChain messages as JSON, with inline images replaced by a hash reference"""
+    payload = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                if isinstance(part, dict) and part.get('type') == 'image_url':
+                    url = part['image_url']['url'] if isinstance(part.get('image_url'), dict) else str(part.get('image_url'))
+                    parts.append({'type': 'image_ref', 'sha256': sha256_hex(url)})
+                else:
+                    parts.append(part)
+            content = parts
+        payload.append({'type': getattr(message, 'type', type(message).__name__), 'content': content})
+    return payload
+
+class RequestTrace:
+    """Stage timings and upstream calls of one request; replays calls when ``recording`` is given"""
+
+    def __init__(self, recording: dict = None):
+        self.trace_id = recording['trace_id'] if recording else uuid.uuid4().hex
+        self.replaying = recording is not None
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.inputs = {}
+        self.outputs = {}
+        self.stages = []
+        self.calls = []
+        self.error = None
+        self._lock = threading.Lock()  # Retrieval theo text chạy song song trong thread khác
+        self._recorded = list(recording.get('calls', [])) if recording else []
+        self._used = set()
+        self.replay_stats = {'exact': 0, 'fallback': 0, 'missing': 0}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages.append({'name': name, 'ms': round((time.perf_counter() - start) * 1000, 2)})
+
+    def _replay(self, upstream: str, site: str, key: str) -> dict:
+        """Recorded call with the same request, else the next unused one from the same call site"""
+        with self._lock:
+            fallback = None
+            for index, call in enumerate(self._recorded):
+                if index in self._used or call['upstream'] != upstream or call.get('site') != site:
+                    continue
+                if call['key'] == key:
+                    self._used.add(index)
+                    self.replay_stats['exact'] += 1
+                    return call
+                if fallback is None:
+                    fallback = index
+            if fallback is None:
+                self.replay_stats['missing'] += 1
+                raise ReplayMiss(f"No recorded {upstream} call for site '{site}'")
+            # Prompt đã đổi (code mới), vẫn trả lời theo thứ tự đã ghi
+            self._used.add(fallback)
+            self.replay_stats['fallback'] += 1
+            return self._recorded[fallback]
+
+    def call(self, upstream: str, site: Optional[str], request, fn: Callable,
+             encode: Callable = None, decode: Callable = None):
+        """Run ``fn()`` and record its result, or return the recorded result when replaying"""
+        key = sha256_hex(json.dumps(request, ensure_ascii=False, sort_keys=True, default=str))
+        if self.replaying:
+            call = self._replay(upstream, site, key)
+            if 'error' in call:
+                raise ReplayedError(call['error'])
+            return decode(call['response']) if decode else call['response']
+
+        start = time.perf_counter()
+        entry = {'upstream': upstream, 'site': site, 'key': key, 'request': request}
+        try:
+            result = fn()
+        except Exception as e:
+            entry['error'] = f"{type(e).__name__}: {e}"
+            raise
+        else:
+            entry['response'] = encode(result) if encode else result
+            return result
+        finally:
+            entry['ms'] = round((time.perf_counter() - start) * 1000, 2)
+            with self._lock:
+                self.calls.append(entry)
+
+    def add_cached(self, upstream: str, site: Optional[str], request, response, encode: Callable = None):
+        """Record an answer served from a local cache, so a replay without that cache still has it"""
+        if self.replaying:
+            return
+        key = sha256_hex(json.dumps(request, ensure_ascii=False, sort_keys=True, default=str))
+        with self._lock:
+            self.calls.append({
+                'upstream': upstream, 'site': site, 'key': key, 'request': request,
+                'response': encode(response) if encode else response, 'ms': 0.0, 'cached': True
+            })
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'timestamp': round(self.started_at, 3),
+            'total_ms': round((time.perf_counter() - self._start) * 1000, 2),
+            'inputs': self.inputs,
+            'stages': self.stages,
+            'calls': self.calls,
+            'outputs': self.outputs,
+            'error': self.error
+        }
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+@contextmanager
+def activate(trace: RequestTrace):
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+def should_trace() -> bool:
+    return Config.TRACE_ENABLED and random.random() < Config.TRACE_SAMPLE_RATE
+
+def traced_stage(name: str, fn: Callable) -> Callable:
+    """Wrap a LangGraph node so its duration is recorded in the active trace"""
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        trace = _current.get()
+        if trace is None:
+            return fn(state)
+        with trace.stage(name):
+            return fn(state)
+
+    return wrapper
+
+class TraceWriter:
+    """Append traces to a JSONL file, rotating it to ``<path>.1`` past max_bytes"""
+
+    def __init__(self, path: str = None, max_bytes: int = None):
+        self.path = path or Config.TRACE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else Config.TRACE_MAX_MB * 1024 * 1024
+        self.written = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, trace: dict):
+        line = (json.dumps(trace, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        try:
+            with self._lock:
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+                # Một lệnh write với O_APPEND: các worker gunicorn ghi chung file không chen dòng
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+                self.written += 1
+        except OSError as e:
+            self.failed += 1
+            print(f"[TRACE] Failed to write trace: {e}")
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_trace_writer() -> TraceWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TraceWriter()
+        return _writer
+
+def read_traces(path: str):
+    """Yield traces from a JSONL file, skipping blank or truncated lines"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
@@ -0,0 +1,160 @@
+from collections import Counter, OrderedDict
+from typing import List, Optional
+import hashlib
+import os
+import threading
+from config import Config
+
+def audio_cache_key(model_id: str, clean_text: str) -> str:
+    """Hash of (model ID, cleaned text); the same text always maps to the same audio"""
+    return hashlib.sha256(f"{model_id}\n{clean_text}".encode('utf-8')).hexdigest()
+
+class TTSAudioCache:
+    """Two-tier cache of synthesized 16-bit PCM: memory LRU in front of a size-capped directory"""
+
+    def __init__(self, directory: str = None, max_memory_bytes: int = None, max_disk_bytes: int = None):
+        self.directory = directory if directory is not None else Config.TTS_CACHE_DIR
+        self.max_memory_bytes = max_memory_bytes or Config.TTS_CACHE_MEMORY_MB * 1024 * 1024
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else Config.TTS_CACHE_DISK_MB * 1024 * 1024
+        self._memory = OrderedDict()  # key -> pcm bytes
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._requests = Counter()  # clean_text -> số lần được yêu cầu, dùng để warm cache
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pcm'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((name, stat.st_size, stat.st_mtime))
+        return entries
+
+    def record_request(self, clean_text: str):
+        with self._lock:
+            self._requests[clean_text] += 1
+            # Chỉ giữ các câu trả lời phổ biến nhất
+            if len(self._requests) > 2000:
+                self._requests = Counter(dict(self._requests.most_common(1000)))
+
+    def popular_texts(self, limit: int) -> List[str]:
+        with self._lock:
+            return [text for text, _ in self._requests.most_common(limit)]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            pcm = self._memory.get(key)
+            if pcm is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return pcm
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    pcm = f.read()
+                os.utime(path)  # mtime làm thứ tự LRU cho tầng đĩa
+            except OSError:
+                pcm = None
+            if pcm is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put_memory(key, pcm)
+                return pcm
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(key))
+
+    def set(self, key: str, pcm: bytes):
+        with self._lock:
+            self._put_memory(key, pcm)
+
+        if not self.directory or len(pcm) > self.max_disk_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(tmp_path, 'wb') as f:
+                f.write(pcm)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[TTS CACHE] Failed to write {path}: {e}")
+            return
+
+        with self._lock:
+            if not existed:
+                self._disk_bytes += len(pcm)
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _put_memory(self, key: str, pcm: bytes):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(pcm) > self.max_memory_bytes:
+            return
+        self._memory[key] = pcm
+        self._memory_bytes += len(pcm)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        # Xóa file ít được dùng nhất cho tới khi còn dưới 90% giới hạn
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        removed = 0
+        for name, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._disk_bytes = total
+            self.evictions += removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'disk_evictions': self.evictions,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0
+            }
@@ -0,0 +1,191 @@
+"""CPU inference backends for the VITS TTS model.
+
+Every runner takes padded ``input_ids``/``attention_mask`` tensors and returns
+``(waveforms, lengths)`` as numpy arrays, so TTSService does not care whether
+the forward pass runs in eager fp32, int8 dynamic quantization, TorchScript or
+ONNX Runtime.
+"""
+
+from typing import Tuple
+import hashlib
+import os
+import re
+import numpy as np
+import torch
+from config import Config
+
+INFERENCE_MODES = ('fp32', 'int8', 'torchscript', 'onnx')
+
+_threads_configured = False
+
+def configure_torch_threads() -> int:
+    """Pin torch intra-op threads so TTS does not take every core from the web workers"""
+    global _threads_configured
+    threads = Config.TTS_NUM_THREADS or max(1, (os.cpu_count() or 2) // 2)
+    torch.set_num_threads(threads)
+    if not _threads_configured:
+        try:
+            # Chỉ gọi được một lần, trước khi torch chạy song song lần đầu
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        _threads_configured = True
+    return threads
+
+class _VitsExportWrapper(torch.nn.Module):
+    """Tuple-returning forward for tracing/ONNX export"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        return outputs.waveform, outputs.sequence_lengths
+
+class EagerRunner:
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, input_ids, attention_mask) -> Tuple[np.ndarray, np.ndarray]:
+        with torch.no_grad():
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+        lengths = outputs.sequence_lengths
+        waveforms = outputs.waveform.cpu().numpy()
+        if lengths is None:
+            return waveforms, np.full(len(waveforms), waveforms.shape[1])
+        return waveforms, lengths.cpu().numpy()
+
+class TorchScriptRunner:
+    def __init__(self, path: str):
+        self.path = path
+        self.module = torch.jit.load(path, map_location='cpu')
+        self.module.eval()
+
+    def __call__(self, input_ids, attention_mask) -> Tuple[np.ndarray, np.ndarray]:
+        with torch.no_grad():
+            waveforms, lengths = self.module(input_ids.cpu(), attention_mask.cpu())
+        return waveforms.numpy(), lengths.numpy()
+
+class OnnxRunner:
+    def __init__(self, path: str, threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or configure_torch_threads()
+        options.inter_op_num_threads = 1
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, input_ids, attention_mask) -> Tuple[np.ndarray, np.ndarray]:
+        waveforms, lengths = self.session.run(None, {
+            'input_ids': input_ids.cpu().numpy(),
+            'attention_mask': attention_mask.cpu().numpy()
+        })
+        return waveforms, lengths
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the Linear layers, in place so fp32 weights are not kept twice"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def _example_inputs(tokenizer):
+    inputs = tokenizer(["Xin chào.", "Phở bò là món ăn truyền thống của Việt Nam."], padding=True, return_tensors="pt")
+    return inputs['input_ids'], inputs['attention_mask']
+
+def export_torchscript(model, tokenizer, path: str):
+    """Trace the model to TorchScript; sequence length and batch stay dynamic"""
+    wrapper = _VitsExportWrapper(model).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, _example_inputs(tokenizer), check_trace=False)
+    traced.save(path)
+
+def export_onnx(model, tokenizer, path: str):
+    """Export the model to ONNX with dynamic batch and sequence axes"""
+    wrapper = _VitsExportWrapper(model).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, _example_inputs(tokenizer), path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['waveform', 'lengths'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'tokens'},
+                'attention_mask': {0: 'batch', 1: 'tokens'},
+                'waveform': {0: 'batch', 1: 'samples'},
+                'lengths': {0: 'batch'}
+            },
+            opset_version=17,
+            dynamo=False
+        )
+
+def model_fingerprint(model) -> str:
+    """Short hash of what an export depends on: model revision (or weights), config and library versions"""
+    import transformers
+
+    revision = getattr(model.config, '_commit_hash', None)
+    if not revision:
+        # Model nạp từ thư mục local hoặc tạo trong code: không có revision, băm trọng số
+        digest = hashlib.sha256()
+        for name, tensor in model.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+        revision = digest.hexdigest()
+    parts = [revision, model.config.to_json_string(), torch.__version__, transformers.__version__]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:12]
+
+def _export_name(model_id: str, mode: str) -> Tuple[str, str]:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id), '.onnx' if mode == 'onnx' else '.pt'
+
+def export_path(model_id: str, mode: str, fingerprint: str, export_dir: str = None) -> str:
+    name, extension = _export_name(model_id, mode)
+    return os.path.join(export_dir or Config.TTS_EXPORT_DIR, f"{name}-{fingerprint}{extension}")
+
+def _remove_stale_exports(path: str, model_id: str, mode: str):
+    """Delete exports of the same model made from older weights or library versions"""
+    name, extension = _export_name(model_id, mode)
+    pattern = re.compile(re.escape(name) + r'-[0-9a-f]{12}' + re.escape(extension))
+    directory = os.path.dirname(path) or '.'
+    for other in os.listdir(directory):
+        if pattern.fullmatch(other) and other != os.path.basename(path):
+            os.remove(os.path.join(directory, other))
+
+def load_runner(model, tokenizer, mode: str, model_id: str, export_dir: str = None):
+    """Build the inference runner for a mode, exporting the model on first use or when it changed"""
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown TTS inference mode '{mode}', expected one of {INFERENCE_MODES}")
+
+    if mode == 'fp32':
+        return EagerRunner(model)
+    if mode == 'int8':
+        return EagerRunner(quantize_int8(model))
+
+    path = export_path(model_id, mode, model_fingerprint(model), export_dir)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        print(f"[TTS] Exporting {model_id} to {mode}: {path}")
+        tmp_path = f"{path}.tmp"
+        (export_onnx if mode == 'onnx' else export_torchscript)(model, tokenizer, tmp_path)
+        os.replace(tmp_path, path)
+        _remove_stale_exports(path, model_id, mode)
+
+    print(f"[TTS] Loading {mode} model from {path}")
+    return OnnxRunner(path) if mode == 'onnx' else TorchScriptRunner(path)
+
+def _log_spectrogram(waveform: np.ndarray, n_fft: int = 1024, hop: int = 256) -> np.ndarray:
+    if len(waveform) < n_fft:
+        waveform = np.pad(waveform, (0, n_fft - len(waveform)))
+    frames = np.lib.stride_tricks.sliding_window_view(waveform, n_fft)[::hop]
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(n_fft), axis=1))
+    return 20 * np.log10(np.maximum(magnitude, 1e-5))
+
+def compare_to_reference(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Quality of an optimized output vs fp32: duration ratio and log-spectral distance (dB)"""
+    ref_spec = _log_spectrogram(reference)
+    cand_spec = _log_spectrogram(candidate)
+    frames = min(len(ref_spec), len(cand_spec))
+    # Bỏ qua các bin quá nhỏ (im lặng) để khoảng cách phản ánh phần có tiếng
+    mask = ref_spec[:frames] > ref_spec[:frames].max() - 60
+    distance = np.abs(ref_spec[:frames] - cand_spec[:frames])[mask].mean() if mask.any() else 0.0
+    return {
+        'duration_ratio': round(len(candidate) / len(reference), 3) if len(reference) else None,
+        'log_spectral_distance_db': round(float(distance), 2)
+    }
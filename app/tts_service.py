@@ -1,37 +1,283 @@
 import torch
 import soundfile as sf
 from transformers import VitsModel, VitsTokenizer
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import io
+import itertools
 import numpy as np
+import os
+import struct
+import threading
+import time
+from typing import Iterator, List
 from config import Config
+from app.tts_cache import TTSAudioCache, audio_cache_key
+from app.tts_runtime import EagerRunner, OnnxRunner, configure_torch_threads, load_runner
+from app.tts_workers import TTSBusyError
+from app.upstream import UpstreamOverloaded, get_limiter
 import re
 
+TTS_MODEL_ID = "facebook/mms-tts-vie"
+
+# Warm cache chạy nền, một luồng để không chiếm hết CPU của request thật
+_warm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-warm")
+
+def _lower_thread_priority():
+    # Trên Linux nice áp dụng cho từng thread: luồng tổng hợp trước nhường CPU cho request thật
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+_speculation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-speculate",
+                                           initializer=_lower_thread_priority)
+
+class TTSStats:
+    """Time-to-first-audio and real-time factor for full-clip vs streamed synthesis"""
+    
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._samples = {'full': deque(maxlen=window), 'stream': deque(maxlen=window)}
+        self.requests = {'full': 0, 'stream': 0}
+        self.payloads = {}  # audio format -> {'responses': n, 'bytes': n}
+    
+    def record(self, mode: str, first_audio_seconds: float, total_seconds: float, audio_seconds: float):
+        with self._lock:
+            self.requests[mode] += 1
+            self._samples[mode].append((first_audio_seconds, total_seconds, audio_seconds))
+    
+    def record_payload(self, audio_format: str, size: int):
+        with self._lock:
+            payload = self.payloads.setdefault(audio_format, {'responses': 0, 'bytes': 0})
+            payload['responses'] += 1
+            payload['bytes'] += size
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for mode, samples in self._samples.items():
+                ttfa = sorted(s[0] for s in samples)
+                audio_seconds = sum(s[2] for s in samples)
+                result[mode] = {
+                    'requests': self.requests[mode],
+                    'avg_time_to_first_audio_ms': round(sum(ttfa) / len(ttfa) * 1000, 1) if ttfa else None,
+                    'p95_time_to_first_audio_ms': round(ttfa[min(int(len(ttfa) * 0.95), len(ttfa) - 1)] * 1000, 1) if ttfa else None,
+                    'real_time_factor': round(sum(s[1] for s in samples) / audio_seconds, 3) if audio_seconds else None
+                }
+            result['payload'] = {
+                fmt: {'responses': p['responses'], 'avg_bytes': p['bytes'] // p['responses']}
+                for fmt, p in self.payloads.items()
+            }
+            return result
+
+tts_stats = TTSStats()
+
+class SpeculationStats:
+    """How often speculative pre-synthesis runs, is skipped by the CPU guards and is later played"""
+    
+    def __init__(self, max_tracked: int = 1000):
+        self._lock = threading.Lock()
+        self.max_tracked = max_tracked
+        self.scheduled = 0
+        self.synthesized = 0
+        self.hits = 0
+        self.seconds = 0.0
+        self.pending = 0
+        self.skipped = Counter()  # reason -> n
+        self._unused = OrderedDict()  # cache key đã tổng hợp trước nhưng chưa được nghe
+    
+    def try_schedule(self, max_pending: int) -> bool:
+        with self._lock:
+            if self.pending >= max_pending:
+                self.skipped['queue_full'] += 1
+                return False
+            self.pending += 1
+            self.scheduled += 1
+            return True
+    
+    def started(self):
+        with self._lock:
+            self.pending -= 1
+    
+    def record_skipped(self, reason: str):
+        with self._lock:
+            self.skipped[reason] += 1
+    
+    def record_synthesized(self, key: str, seconds: float):
+        with self._lock:
+            self.synthesized += 1
+            self.seconds += seconds
+            self._unused[key] = None
+            while len(self._unused) > self.max_tracked:
+                self._unused.popitem(last=False)
+    
+    def record_use(self, key: str):
+        """Count a hit the first time a speculated entry is served to /api/tts"""
+        with self._lock:
+            if key in self._unused:
+                del self._unused[key]
+                self.hits += 1
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'scheduled': self.scheduled,
+                'pending': self.pending,
+                'synthesized': self.synthesized,
+                'skipped': dict(self.skipped),
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.synthesized, 3) if self.synthesized else 0,
+                'avg_synthesis_ms': round(self.seconds / self.synthesized * 1000, 1) if self.synthesized else None
+            }
+
+speculation_stats = SpeculationStats()
+
+# format -> (mime type, soundfile format, subtype)
+AUDIO_FORMATS = {
+    'wav': ('audio/wav', 'WAV', 'PCM_16'),
+    'ogg': ('audio/ogg', 'OGG', 'OPUS'),
+    'mp3': ('audio/mpeg', 'MP3', 'MPEG_LAYER_III')
+}
+
+def encode_audio(pcm: bytes, sampling_rate: int, audio_format: str = 'wav') -> bytes:
+    """Encode 16-bit mono PCM as WAV, OGG/Opus or MP3"""
+    _, container, subtype = AUDIO_FORMATS[audio_format]
+    buffer = io.BytesIO()
+    sf.write(buffer, np.frombuffer(pcm, dtype='<i2'), samplerate=sampling_rate, format=container, subtype=subtype)
+    return buffer.getvalue()
+
+def pcm16(waveform: np.ndarray) -> bytes:
+    """Float waveform in [-1, 1] -> little-endian 16-bit PCM"""
+    return (np.clip(waveform, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+def wav_stream_header(sampling_rate: int) -> bytes:
+    """44-byte mono 16-bit WAV header with unknown (max) length, for streamed responses"""
+    return b''.join([
+        b'RIFF', struct.pack('<I', 0xFFFFFFFF), b'WAVE',
+        b'fmt ', struct.pack('<IHHIIHH', 16, 1, 1, sampling_rate, sampling_rate * 2, 2, 16),
+        b'data', struct.pack('<I', 0xFFFFFFFF)
+    ])
+
+class _ReleasingStream:
+    """Iterator that releases an admission slot once, when exhausted or closed (even if never started)"""
+    
+    def __init__(self, iterator: Iterator[bytes], release):
+        self._iterator = iterator
+        self._release = release
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+    
+    def close(self):
+        if self._release is not None:
+            self._release()
+            self._release = None
+        self._iterator.close()
+
 class TTSService:
-    def __init__(self):
+    def __init__(self, model=None, tokenizer=None, audio_cache: TTSAudioCache = None, inference_mode: str = None,
+                 pool=None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"[TTS] Using device: {self.device}")
         
+        self.audio_cache = audio_cache or (TTSAudioCache() if Config.TTS_CACHE_ENABLED else None)
+        self.runner = None
+        self.inference_mode = None
+        self.sampling_rate = None
+        self.pool = pool
+        self._live_requests = 0
+        self._live_lock = threading.Lock()
+        
+        # Model chạy trong các worker process riêng (app/tts_workers.py)
+        if pool is not None:
+            self.model = None
+            self.tokenizer = None
+            self.model_id = pool.model_id
+            self.sampling_rate = pool.sampling_rate
+            self.inference_mode = "pool"
+            return
+        
+        # Có thể truyền model/tokenizer có sẵn (test, benchmark)
+        if model is not None and tokenizer is not None:
+            self.model = model.to(self.device)
+            self.model.eval()
+            self.tokenizer = tokenizer
+            self.model_id = model.config.name_or_path or "custom"
+            self.sampling_rate = self.model.config.sampling_rate
+            self._init_runner(inference_mode)
+            return
+        
         # Load Vietnamese MMS TTS model and tokenizer
+        self.model_id = TTS_MODEL_ID
         try:
-            print("[TTS] Loading facebook/mms-tts-vie model...")
-            self.model = VitsModel.from_pretrained("facebook/mms-tts-vie")
-            self.tokenizer = VitsTokenizer.from_pretrained("facebook/mms-tts-vie")
+            print(f"[TTS] Loading {TTS_MODEL_ID} model...")
+            self.model = VitsModel.from_pretrained(TTS_MODEL_ID)
+            self.tokenizer = VitsTokenizer.from_pretrained(TTS_MODEL_ID)
             
             # Move model to device
             self.model = self.model.to(self.device)
             self.model.eval()  # Set to evaluation mode
+            self.sampling_rate = self.model.config.sampling_rate
             
             print("[TTS] Model loaded successfully!")
             
+            self._init_runner(inference_mode)
+            
         except Exception as e:
             print(f"[TTS ERROR] Failed to load model: {e}")
             self.model = None
             self.tokenizer = None
     
-    def text_to_speech(self, text: str) -> bytes:
-        """Convert text to speech using local MMS TTS model"""
+    @property
+    def ready(self) -> bool:
+        """True when synthesis can run, locally or in the worker pool"""
+        if self.pool is not None:
+            if self.pool.available and self.sampling_rate is None:
+                # Worker khởi động nền, lấy thông tin model khi worker đầu tiên sẵn sàng
+                self.model_id, self.sampling_rate = self.pool.model_id, self.pool.sampling_rate
+            return self.pool.available
+        return self.runner is not None
+    
+    def _init_runner(self, inference_mode: str = None):
+        """Set torch threads and load the fp32/int8/TorchScript/ONNX runner, falling back to fp32"""
+        threads = configure_torch_threads()
+        mode = inference_mode or Config.TTS_INFERENCE_MODE
+        if self.device != "cpu" and mode != "fp32":
+            print(f"[TTS] Inference mode '{mode}' is CPU only, using fp32 on {self.device}")
+            mode = "fp32"
+        
+        try:
+            self.runner = load_runner(self.model, self.tokenizer, mode, self.model_id)
+        except Exception as e:
+            print(f"[TTS ERROR] Failed to initialize {mode} inference, falling back to fp32: {e}")
+            mode = "fp32"
+            self.runner = EagerRunner(self.model)
+        
+        self.inference_mode = mode
+        print(f"[TTS] Inference mode: {mode}, {threads} threads")
+    
+    def after_fork(self, num_threads: int):
+        """Re-apply per-worker thread counts after a pre-fork server forked the loaded model"""
+        if self.runner is None:
+            return
+        torch.set_num_threads(num_threads)
+        if self.inference_mode == 'onnx':
+            # Thread pool của ONNX Runtime được tạo cùng session và không còn sau fork
+            self.runner = OnnxRunner(self.runner.path, threads=num_threads)
+    
+    def text_to_speech(self, text: str, audio_format: str = 'wav') -> bytes:
+        """Convert text to speech using local MMS TTS model, encoded as wav, ogg (Opus) or mp3"""
         try:
-            if self.model is None or self.tokenizer is None:
+            if not self.ready:
                 print("[TTS ERROR] Model not loaded properly")
                 return None
                 
@@ -39,22 +285,23 @@ class TTSService:
             clean_text = self._clean_text_for_tts(text)
             print(f"[TTS] Processing text: {clean_text[:100]}...")
             
-            # Tokenize input text
-            inputs = self.tokenizer(clean_text, return_tensors="pt").to(self.device)
-            
-            with torch.no_grad():
-                # Generate audio
-                outputs = self.model(**inputs)
-                audio_array = outputs.waveform.squeeze().cpu().numpy()
+            start = time.perf_counter()
+            with self._live_request():
+                pcm = self.synthesize_pcm(clean_text)
+            if pcm is None:
+                return None
+            elapsed = time.perf_counter() - start
+            tts_stats.record('full', elapsed, elapsed, len(pcm) / 2 / self.sampling_rate)
             
-            # Convert to bytes using soundfile
-            audio_buffer = io.BytesIO()
-            sf.write(audio_buffer, audio_array, samplerate=22050, format='WAV')
-            audio_bytes = audio_buffer.getvalue()
+            # Encode với đúng sampling rate của model (MMS: 16 kHz)
+            audio_bytes = encode_audio(pcm, self.sampling_rate, audio_format)
+            tts_stats.record_payload(audio_format, len(audio_bytes))
             
-            print(f"[TTS] Generated audio: {len(audio_bytes)} bytes")
+            print(f"[TTS] Generated {audio_format} audio: {len(audio_bytes)} bytes")
             return audio_bytes
                 
+        except TTSBusyError:
+            raise
         except Exception as e:
             print(f"[TTS ERROR] Text-to-speech failed: {e}")
             import traceback
@@ -78,18 +325,11 @@ class TTSService:
         # Remove extra spaces
         text = re.sub(r'\s+', ' ', text)
         
-        # Limit length for MMS model (typically works better with shorter texts)
-        if len(text) > 300:
-            # Try to break at sentence boundaries
-            sentences = re.split(r'[.!?]', text)
-            text = ""
-            for sentence in sentences:
-                if len(text + sentence) > 300:
-                    break
-                text += sentence + ". "
-            
-            if not text:  # Fallback if no sentence breaks
-                text = text[:300] + "..."
+        # Giới hạn độ dài tối đa, cắt tại ranh giới câu
+        max_chars = Config.TTS_MAX_CHARS
+        if max_chars and len(text) > max_chars:
+            cut = max(text.rfind(p, 0, max_chars) for p in '.!?')
+            text = text[:cut + 1] if cut > 0 else text[:max_chars]
         
         # Ensure text ends with punctuation for better prosody
         text = text.strip()
@@ -97,3 +337,324 @@ class TTSService:
             text += "."
             
         return text
+    
+    def _split_sentences(self, text: str) -> List[str]:
+        """Split cleaned text into sentences short enough for one VITS pass"""
+        max_chars = Config.TTS_SENTENCE_MAX_CHARS
+        sentences = []
+        
+        for sentence in re.split(r'(?<=[.!?])\s+', text):
+            sentence = sentence.strip()
+            # Câu quá dài: tách tại dấu phẩy, rồi tới khoảng trắng
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(',', 0, max_chars)
+                if cut <= 0:
+                    cut = sentence.rfind(' ', 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                sentences.append(sentence[:cut + 1].strip())
+                sentence = sentence[cut + 1:].strip()
+            sentences.append(sentence)
+        
+        # Bỏ các đoạn chỉ có dấu câu (tokenizer trả về chuỗi rỗng)
+        return [s for s in sentences if re.search(r'\w', s)]
+    
+    def _synthesize_batch(self, sentences: List[str]) -> List[np.ndarray]:
+        """Run one padded forward pass and trim each waveform to its real length"""
+        inputs = self.tokenizer(sentences, padding=True, return_tensors="pt").to(self.device)
+        waveforms, lengths = self.runner(inputs["input_ids"], inputs["attention_mask"])
+        return [waveforms[i, :int(lengths[i])] for i in range(len(sentences))]
+    
+    def synthesize(self, clean_text: str) -> np.ndarray:
+        """Synthesize cleaned text sentence by sentence in padded batches"""
+        sentences = self._split_sentences(clean_text)
+        if not sentences:
+            return None
+        
+        # Sắp xếp theo độ dài để giảm padding trong mỗi batch
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        waveforms = [None] * len(sentences)
+        batch_size = max(Config.TTS_BATCH_SIZE, 1)
+        
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for index, waveform in zip(batch, self._synthesize_batch([sentences[i] for i in batch])):
+                waveforms[index] = waveform
+        
+        print(f"[TTS] Synthesized {len(sentences)} sentences in {(len(order) + batch_size - 1) // batch_size} batches")
+        
+        pause = self._pause()
+        pieces = []
+        for i, waveform in enumerate(waveforms):
+            if i:
+                pieces.append(pause)
+            pieces.append(waveform.astype(np.float32))
+        return np.concatenate(pieces)
+    
+    def _synthesize_pcm_local(self, clean_text: str) -> bytes:
+        # Tổng hợp theo từng câu, gom nhiều câu vào một lần forward
+        audio_array = self.synthesize(clean_text)
+        return pcm16(audio_array) if audio_array is not None else None
+    
+    def _acquire_local_slot(self, wait: bool = True):
+        """Admit one in-process synthesis; returns a release callback or raises TTSBusyError.
+        
+        Background work (``wait=False``) only takes a free slot and never queues behind real requests.
+        """
+        limiter = get_limiter('tts')
+        if not limiter.enabled:
+            return lambda: None
+        if not wait:
+            admitted_at = limiter.try_acquire()
+            if admitted_at is None:
+                raise TTSBusyError(retry_after=1)
+            return lambda: limiter.release(admitted_at)
+        try:
+            admitted_at = limiter.acquire()
+        except UpstreamOverloaded as e:
+            raise TTSBusyError(retry_after=e.retry_after)
+        return lambda: limiter.release(admitted_at)
+    
+    def _synthesize_pcm_uncached(self, clean_text: str, wait: bool = True) -> bytes:
+        if self.pool is not None:
+            return self.pool.synthesize(clean_text)
+        release = self._acquire_local_slot(wait)
+        try:
+            return self._synthesize_pcm_local(clean_text)
+        finally:
+            release()
+    
+    def synthesize_pcm(self, clean_text: str) -> bytes:
+        """16-bit PCM for cleaned text, served from the audio cache when possible"""
+        if self.audio_cache is None:
+            return self._synthesize_pcm_uncached(clean_text)
+        
+        key = audio_cache_key(self.model_id, clean_text)
+        self.audio_cache.record_request(clean_text)
+        pcm = self.audio_cache.get(key)
+        if pcm is not None:
+            print("[TTS CACHE] Hit")
+            speculation_stats.record_use(key)
+            return pcm
+        
+        prefix, rest = self._speculated_prefix(clean_text)
+        if prefix is not None:
+            # Các câu đầu đã được tổng hợp trước, chỉ còn phần còn lại
+            rest_pcm = self._synthesize_pcm_uncached(rest)
+            pcm = prefix + pcm16(self._pause()) + rest_pcm if rest_pcm is not None else None
+        else:
+            pcm = self._synthesize_pcm_uncached(clean_text)
+        if pcm is not None:
+            self.audio_cache.set(key, pcm)
+        return pcm
+    
+    def warm_cache(self, texts: List[str] = None) -> dict:
+        """Pre-synthesize the given texts (default: most requested) that are not cached yet"""
+        if self.audio_cache is None or not self.ready:
+            return {'warmed': 0, 'skipped': 0}
+        
+        if texts:
+            clean_texts = [self._clean_text_for_tts(t) for t in texts if t and t.strip()]
+        else:
+            clean_texts = self.audio_cache.popular_texts(Config.TTS_CACHE_WARM_TOP)
+        
+        warmed = skipped = 0
+        for clean_text in clean_texts:
+            key = audio_cache_key(self.model_id, clean_text)
+            if self.audio_cache.contains(key):
+                skipped += 1
+                continue
+            try:
+                pcm = self._synthesize_pcm_uncached(clean_text, wait=False)
+            except TTSBusyError:
+                # Nhường worker cho request thật
+                print("[TTS CACHE] Workers busy, stopping warm-up")
+                break
+            if pcm is not None:
+                self.audio_cache.set(key, pcm)
+                warmed += 1
+        
+        print(f"[TTS CACHE] Warmed {warmed} responses ({skipped} already cached)")
+        return {'warmed': warmed, 'skipped': skipped}
+    
+    def warm_cache_async(self, texts: List[str] = None):
+        return _warm_executor.submit(self.warm_cache, texts)
+    
+    @contextmanager
+    def _live_request(self):
+        """Mark a user-facing synthesis as running so speculation stays out of its way"""
+        with self._live_lock:
+            self._live_requests += 1
+        try:
+            yield
+        finally:
+            with self._live_lock:
+                self._live_requests -= 1
+    
+    def _prefix_key(self, clean_text: str) -> str:
+        return audio_cache_key(self.model_id, f"prefix:{Config.TTS_SPECULATIVE_SENTENCES}\n{clean_text}")
+    
+    def _speculated_prefix(self, clean_text: str):
+        """(prefix PCM, remaining text) when the first sentences were synthesized speculatively"""
+        if not Config.TTS_SPECULATIVE_ENABLED or self.audio_cache is None:
+            return None, None
+        sentences = self._split_sentences(clean_text)
+        count = max(Config.TTS_SPECULATIVE_SENTENCES, 1)
+        key = self._prefix_key(clean_text)
+        if len(sentences) <= count or not self.audio_cache.contains(key):
+            return None, None
+        pcm = self.audio_cache.get(key)
+        if pcm is None:
+            return None, None
+        print("[TTS CACHE] Speculative prefix hit")
+        speculation_stats.record_use(key)
+        return pcm, ' '.join(sentences[count:])
+    
+    def _speculation_blocked(self) -> str:
+        """Why speculation should not run right now, or None"""
+        if self.pool is not None:
+            # Chỉ dùng worker đang rảnh, không chiếm chỗ trong hàng đợi
+            pool_stats = self.pool.stats()
+            if pool_stats['in_flight'] + pool_stats['queue_depth'] >= pool_stats['workers']:
+                return 'busy'
+        elif self._live_requests:
+            return 'busy'
+        
+        max_load = Config.TTS_SPECULATIVE_MAX_LOAD
+        if max_load and hasattr(os, 'getloadavg'):
+            if os.getloadavg()[0] / (os.cpu_count() or 1) > max_load:
+                return 'load'
+        return None
+    
+    def speculate(self, text: str) -> str:
+        """Pre-synthesize the first sentences of an answer into the audio cache.
+        
+        Short answers are synthesized whole under the normal cache key, longer ones
+        only up to TTS_SPECULATIVE_SENTENCES under a prefix key that /api/tts and
+        /api/tts/stream pick up. Returns 'synthesized' or the reason it was skipped.
+        """
+        clean_text = self._clean_text_for_tts(text)
+        sentences = self._split_sentences(clean_text)
+        if not sentences:
+            return 'empty'
+        
+        count = max(Config.TTS_SPECULATIVE_SENTENCES, 1)
+        if len(sentences) <= count:
+            key, speculative_text = audio_cache_key(self.model_id, clean_text), clean_text
+        else:
+            key, speculative_text = self._prefix_key(clean_text), ' '.join(sentences[:count])
+        
+        reason = 'cached' if self.audio_cache.contains(key) else self._speculation_blocked()
+        if reason is None:
+            start = time.perf_counter()
+            try:
+                # Không chờ trong hàng đợi tts: request thật luôn được ưu tiên
+                pcm = self._synthesize_pcm_uncached(speculative_text, wait=False)
+            except TTSBusyError:
+                pcm, reason = None, 'busy'
+            if pcm is not None:
+                self.audio_cache.set(key, pcm)
+                speculation_stats.record_synthesized(key, time.perf_counter() - start)
+                return 'synthesized'
+            reason = reason or 'failed'
+        
+        speculation_stats.record_skipped(reason)
+        return reason
+    
+    def _run_speculation(self, text: str) -> str:
+        speculation_stats.started()
+        try:
+            return self.speculate(text)
+        except Exception as e:
+            print(f"[TTS] Speculative synthesis failed: {e}")
+            speculation_stats.record_skipped('failed')
+            return 'failed'
+    
+    def speculate_async(self, text: str):
+        """Queue speculative synthesis on the low-priority thread; None if not queued"""
+        if self.audio_cache is None or not self.ready or not text or not text.strip():
+            return None
+        if not speculation_stats.try_schedule(Config.TTS_SPECULATIVE_MAX_PENDING):
+            return None
+        return _speculation_executor.submit(self._run_speculation, text)
+    
+    def _pause(self) -> np.ndarray:
+        return np.zeros(int(self.sampling_rate * Config.TTS_SENTENCE_PAUSE), dtype=np.float32)
+    
+    def _stream_pcm_chunks(self, clean_text: str) -> Iterator[bytes]:
+        """16-bit PCM per sentence: the first one alone, the rest in padded batches"""
+        sentences = self._split_sentences(clean_text)
+        batch_size = max(Config.TTS_BATCH_SIZE, 1)
+        batches = [sentences[:1]] + [sentences[i:i + batch_size] for i in range(1, len(sentences), batch_size)]
+        for batch in batches:
+            if not batch:
+                continue
+            for waveform in self._synthesize_batch(batch):
+                yield pcm16(waveform)
+    
+    def stream_wav(self, text: str) -> Iterator[bytes]:
+        """Streaming WAV: a header, then 16-bit PCM sentence by sentence.
+        
+        The text is cleaned here, as in text_to_speech. The first sentence is synthesized on its own so playback can start right
+        away. The job is admitted here (worker pool or local TTS limiter), before
+        the response starts, so saturation raises TTSBusyError instead of a
+        broken stream.
+        """
+        start = time.perf_counter()
+        clean_text = self._clean_text_for_tts(text)
+        
+        key = None
+        if self.audio_cache is not None:
+            key = audio_cache_key(self.model_id, clean_text)
+            self.audio_cache.record_request(clean_text)
+            pcm = self.audio_cache.get(key)
+            if pcm is not None:
+                print("[TTS CACHE] Hit")
+                speculation_stats.record_use(key)
+                return self._stream_cached(pcm, start)
+        
+        prefix, rest = self._speculated_prefix(clean_text)
+        text = rest if prefix is not None else clean_text
+        if self.pool is not None:
+            chunks = self.pool.stream(text)
+        else:
+            # Nhận (hoặc từ chối) trước khi bắt đầu response, slot được trả khi stream kết thúc
+            release = self._acquire_local_slot()
+            chunks = self._stream_pcm_chunks(text)
+        if prefix is not None:
+            # Phát ngay phần đã tổng hợp trước trong khi tổng hợp phần còn lại
+            chunks = itertools.chain([prefix], chunks)
+        
+        stream = self._stream_synthesized(chunks, key, start)
+        return stream if self.pool is not None else _ReleasingStream(stream, release)
+    
+    def _stream_cached(self, pcm: bytes, start: float) -> Iterator[bytes]:
+        yield wav_stream_header(self.sampling_rate)
+        elapsed = time.perf_counter() - start
+        tts_stats.record('stream', elapsed, elapsed, len(pcm) / 2 / self.sampling_rate)
+        yield pcm
+    
+    def _stream_synthesized(self, pcm_chunks: Iterator[bytes], key: str, start: float) -> Iterator[bytes]:
+        pause = pcm16(self._pause())
+        first_audio = None
+        samples = 0
+        chunks = []
+        
+        yield wav_stream_header(self.sampling_rate)
+        
+        with self._live_request():
+            for chunk in pcm_chunks:
+                if first_audio is None:
+                    first_audio = time.perf_counter() - start
+                    print(f"[TTS] Time to first audio: {first_audio * 1000:.0f}ms")
+                else:
+                    chunk = pause + chunk
+                samples += len(chunk) // 2
+                chunks.append(chunk)
+                yield chunk
+        
+        if first_audio is not None:
+            tts_stats.record('stream', first_audio, time.perf_counter() - start, samples / self.sampling_rate)
+            # Chỉ lưu cache khi đã stream xong toàn bộ (client có thể ngắt giữa chừng)
+            if key is not None:
+                self.audio_cache.set(key, b''.join(chunks))
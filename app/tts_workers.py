@@ -0,0 +1,379 @@
+"""Out-of-process TTS workers.
+
+Each worker is a separate ``python -m app.tts_workers`` process that loads the
+model once and serves synthesis jobs over a local socket, so inference never
+runs on a web request thread and web workers do not each hold a copy of the
+model. The pool admits at most ``workers + queue`` jobs; beyond that callers get
+TTSBusyError, which the routes turn into 429.
+"""
+
+from multiprocessing.connection import Client, Listener
+from typing import Iterator
+import argparse
+import importlib
+import os
+import queue
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from config import Config
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TTSBusyError(Exception):
+    """All TTS workers are busy and the queue is full"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("TTS workers are saturated")
+        self.retry_after = retry_after
+
+class TTSWorkerError(Exception):
+    """A worker failed or died while running a job"""
+
+class _Job:
+    def __init__(self, op: str, clean_text: str):
+        self.op = op
+        self.clean_text = clean_text
+        self.results = queue.Queue()
+        self.submitted_at = time.perf_counter()
+        self.attempts = 0  # Số worker đã nhận job (worker chết trước khi trả kết quả -> chạy lại 1 lần)
+
+class TTSWorkerPool:
+    """Fixed set of TTS worker processes fed from one bounded in-process queue.
+
+    Workers start in the background; ``available`` turns True once one has
+    loaded the model and back to False while none is alive. ``wait_ready``
+    blocks until the first worker is up (or failed).
+    """
+
+    def __init__(self, num_workers: int = None, max_queue: int = None,
+                 factory: str = 'app.tts_service:TTSService', start_timeout: float = 300,
+                 connect_timeout: float = 30, restart_delay: float = 30):
+        self.num_workers = num_workers or Config.TTS_WORKERS
+        self.max_queue = max_queue if max_queue is not None else Config.TTS_WORKER_QUEUE
+        self.factory = factory
+        self.start_timeout = start_timeout  # Thời gian tối đa để worker load model
+        self.connect_timeout = connect_timeout  # Thời gian tối đa để worker mở socket
+        self.restart_delay = restart_delay
+        self.model_id = None
+        self.sampling_rate = None
+        self.available = False
+
+        self._jobs = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.num_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = False
+        self._processes = {}
+        self._alive = set()  # worker_id đã sẵn sàng và process còn chạy
+        self._spawned = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.restarts = 0
+        self.retried = 0
+        self.in_flight = 0
+        self._wait_seconds = 0.0
+        self._service_seconds = 0.0
+
+        self._authkey = secrets.token_bytes(16)
+        self._socket_dir = tempfile.mkdtemp(prefix='tts-workers-')
+
+        for worker_id in range(self.num_workers):
+            threading.Thread(target=self._serve, args=(worker_id,), daemon=True,
+                             name=f"tts-worker-{worker_id}").start()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until a worker is ready or every first start failed; returns ``available``"""
+        self._ready.wait(timeout if timeout is not None else self.start_timeout)
+        return self.available
+
+    # Worker processes ---------------------------------------------------------
+
+    def _spawn(self, worker_id: int):
+        env = dict(os.environ)
+        env['TTS_WORKER_AUTHKEY'] = self._authkey.hex()
+        env['TTS_CACHE_ENABLED'] = 'false'  # Cache nằm ở process web
+        if not Config.TTS_NUM_THREADS:
+            # Chia đều các core dành cho TTS giữa các worker
+            env['TTS_NUM_THREADS'] = str(max(1, (os.cpu_count() or 2) // 2 // self.num_workers))
+        with self._lock:
+            self._spawned += 1
+            # Mỗi process một socket riêng: không nhận nhầm kết nối của worker khác
+            address = os.path.join(self._socket_dir, f'worker-{worker_id}-{self._spawned}.sock')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'app.tts_workers', '--address', address,
+             '--worker-id', str(worker_id), '--factory', self.factory],
+            cwd=PROJECT_ROOT, env=env
+        )
+        with self._lock:
+            self._processes[process.pid] = process
+        return process, address
+
+    def _open(self, worker_id: int, process: subprocess.Popen, address: str):
+        """Connect to the worker's socket, giving up if it exits or never listens"""
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            if process.poll() is not None:
+                raise TTSWorkerError(f"Worker {worker_id} exited with code {process.returncode} before connecting")
+            try:
+                return Client(address, family='AF_UNIX', authkey=self._authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise TTSWorkerError(f"Worker {worker_id} did not listen within {self.connect_timeout}s")
+                time.sleep(0.05)
+
+    def _connect(self, worker_id: int):
+        """Start a worker process and wait for its ready message"""
+        process, address = self._spawn(worker_id)
+        try:
+            conn = self._open(worker_id, process, address)
+            deadline = time.monotonic() + self.start_timeout
+            # Chờ model load xong nhưng vẫn theo dõi process: worker chết -> báo lỗi ngay
+            while not conn.poll(0.5):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise TTSWorkerError(f"Worker {worker_id} did not become ready")
+            kind, info = conn.recv()
+            if kind != 'ready' or not info.get('ok'):
+                conn.close()
+                raise TTSWorkerError(f"Worker {worker_id} failed to load the TTS model")
+        except (EOFError, OSError) as e:
+            self._discard(process)
+            raise TTSWorkerError(f"Worker {worker_id} died while starting: {e}")
+        except Exception:
+            self._discard(process)
+            raise
+
+        with self._lock:
+            self.model_id = info['model_id']
+            self.sampling_rate = info['sampling_rate']
+            self._alive.add(worker_id)
+            self.available = True
+        self._ready.set()
+        print(f"[TTS POOL] Worker ready (pid {info['pid']}, {info['inference_mode']})")
+        return conn, process
+
+    def _discard(self, process: subprocess.Popen):
+        process.kill()
+        process.wait()
+        with self._lock:
+            self._processes.pop(process.pid, None)
+
+    def _worker_died(self, worker_id: int, process: subprocess.Popen, conn):
+        conn.close()
+        self._discard(process)
+        with self._lock:
+            self.restarts += 1
+            self._alive.discard(worker_id)
+            self.available = bool(self._alive)
+        print(f"[TTS POOL] Worker {worker_id} (pid {process.pid}) died, restarting")
+
+    def _fail_queued(self, reason: str):
+        """No worker is alive: fail waiting jobs now instead of after TTS_JOB_TIMEOUT"""
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                # Tín hiệu shutdown dành cho thread khác
+                self._jobs.put(None)
+                return
+            job.results.put(('error', reason))
+            with self._lock:
+                self.errors += 1
+            self._slots.release()
+
+    def _serve(self, worker_id: int):
+        """Feed jobs to one worker; restart it if it dies"""
+        conn = process = None
+        while not self._closed:
+            if conn is None:
+                try:
+                    conn, process = self._connect(worker_id)
+                except Exception as e:
+                    print(f"[TTS POOL] {e}")
+                    with self._lock:
+                        no_worker = not self._alive
+                    if no_worker:
+                        self._fail_queued(str(e))
+                    self._ready.set()
+                    time.sleep(self.restart_delay)
+                    continue
+
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            if process.poll() is not None:
+                # Worker chết lúc đang rảnh: job chưa được gửi, trả lại hàng đợi cho worker khác/worker mới
+                self._worker_died(worker_id, process, conn)
+                conn = None
+                self._jobs.put(job)
+                continue
+
+            started = time.perf_counter()
+            with self._lock:
+                self.in_flight += 1
+                self._wait_seconds += started - job.submitted_at
+
+            delivered = False
+            release = True
+            try:
+                job.attempts += 1
+                conn.send((job.op, job.clean_text))
+                while True:
+                    kind, payload = conn.recv()
+                    job.results.put((kind, payload))
+                    delivered = True
+                    if kind in ('result', 'done', 'error'):
+                        break
+                with self._lock:
+                    self.completed += 1
+                    if kind == 'error':
+                        self.errors += 1
+            except (EOFError, OSError) as e:
+                self._worker_died(worker_id, process, conn)
+                conn = None
+                if not delivered and job.attempts < 2:
+                    # Chưa trả gì cho client: chạy lại job trên worker khác
+                    with self._lock:
+                        self.retried += 1
+                    release = False
+                    self._jobs.put(job)
+                else:
+                    job.results.put(('error', f"worker {worker_id} died: {e}"))
+                    with self._lock:
+                        self.errors += 1
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self._service_seconds += time.perf_counter() - started
+                if release:
+                    self._slots.release()
+
+        if conn is not None:
+            conn.close()
+
+    # Client API ---------------------------------------------------------------
+
+    def _submit(self, op: str, clean_text: str) -> _Job:
+        if not self.available:
+            raise TTSWorkerError("No TTS worker is running")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise TTSBusyError(retry_after=max(1, int(self._avg_service_seconds() + 0.5)))
+        job = _Job(op, clean_text)
+        self._jobs.put(job)
+        return job
+
+    def _next(self, job: _Job):
+        try:
+            kind, payload = job.results.get(timeout=Config.TTS_JOB_TIMEOUT)
+        except queue.Empty:
+            raise TTSWorkerError(f"TTS job timed out after {Config.TTS_JOB_TIMEOUT}s")
+        if kind == 'error':
+            raise TTSWorkerError(payload)
+        return kind, payload
+
+    def synthesize(self, clean_text: str) -> bytes:
+        """16-bit PCM for the whole text; raises TTSBusyError when saturated"""
+        job = self._submit('synthesize', clean_text)
+        _, pcm = self._next(job)
+        return pcm
+
+    def stream(self, clean_text: str) -> Iterator[bytes]:
+        """Admit the job now (may raise TTSBusyError), then yield PCM per sentence"""
+        job = self._submit('stream', clean_text)
+
+        def chunks():
+            while True:
+                kind, payload = self._next(job)
+                if kind == 'done':
+                    return
+                yield payload
+
+        return chunks()
+
+    def _avg_service_seconds(self) -> float:
+        return self._service_seconds / self.completed if self.completed else 1.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.num_workers,
+                'alive': len(self._alive),
+                'capacity': self.num_workers + self.max_queue,
+                'queue_depth': self._jobs.qsize(),
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'restarts': self.restarts,
+                'retried': self.retried,
+                'avg_queue_wait_ms': round(self._wait_seconds / self.completed * 1000, 1) if self.completed else None,
+                'avg_service_ms': round(self._service_seconds / self.completed * 1000, 1) if self.completed else None
+            }
+
+    def shutdown(self):
+        self._closed = True
+        for _ in range(self.num_workers):
+            self._jobs.put(None)
+        with self._lock:
+            processes = list(self._processes.values())
+            self._alive.clear()
+            self.available = False
+        for process in processes:
+            process.terminate()
+        shutil.rmtree(self._socket_dir, ignore_errors=True)
+
+# Worker process entry point ---------------------------------------------------
+
+def _load_factory(spec: str):
+    module_name, _, attr = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+def worker_main():
+    parser = argparse.ArgumentParser(description="TTS worker process")
+    parser.add_argument('--address', required=True)
+    parser.add_argument('--worker-id', type=int, default=0)
+    parser.add_argument('--factory', default='app.tts_service:TTSService')
+    args = parser.parse_args()
+
+    # Nhận kết nối của pool trước khi load model: pool theo dõi process trong lúc chờ
+    with Listener(args.address, family='AF_UNIX', authkey=bytes.fromhex(os.environ['TTS_WORKER_AUTHKEY'])) as listener:
+        conn = listener.accept()
+    tts = _load_factory(args.factory)()
+    conn.send(('ready', {
+        'ok': tts.runner is not None,
+        'pid': os.getpid(),
+        'model_id': tts.model_id,
+        'sampling_rate': tts.sampling_rate,
+        'inference_mode': tts.inference_mode
+    }))
+
+    while True:
+        try:
+            op, clean_text = conn.recv()
+        except EOFError:
+            break
+        try:
+            if op == 'synthesize':
+                conn.send(('result', tts._synthesize_pcm_local(clean_text)))
+            elif op == 'stream':
+                for chunk in tts._stream_pcm_chunks(clean_text):
+                    conn.send(('chunk', chunk))
+                conn.send(('done', None))
+            else:
+                conn.send(('error', f"unknown op {op}"))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+if __name__ == '__main__':
+    worker_main()
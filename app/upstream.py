@@ -0,0 +1,436 @@
+"""Shared clients for all upstream services (Azure OpenAI, embeddings, OpenWeather).
+
+Every upstream gets pooled keep-alive connections, its own timeout, retries with
+jittered exponential backoff and a circuit breaker, so a failing dependency is
+skipped quickly instead of tying up request threads. Admission limiters bound
+how many calls run against each upstream (and local TTS) at once; callers beyond
+a short queue are rejected immediately instead of piling up.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+from urllib.parse import urlparse
+import random
+import threading
+import time
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from app.tracing import current_trace
+
+UPSTREAMS = ('llm', 'vision', 'embeddings', 'weather')
+# Admission còn giới hạn cả request /api/chat và TTS chạy trong process
+ADMISSION_NAMES = ('chat',) + UPSTREAMS + ('tts',)
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream's circuit breaker is open"""
+
+    def __init__(self, upstream: str, retry_after: float = 0):
+        super().__init__(f"Upstream '{upstream}' is temporarily unavailable")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+class UpstreamHTTPError(Exception):
+    """Retryable HTTP status (429/5xx) returned by an upstream"""
+
+    def __init__(self, upstream: str, status_code: int):
+        super().__init__(f"Upstream '{upstream}' returned HTTP {status_code}")
+        self.upstream = upstream
+        self.status_code = status_code
+
+class UpstreamOverloaded(Exception):
+    """Raised when an upstream's concurrency limit and queue are full"""
+
+    def __init__(self, upstream: str, retry_after: float = 1):
+        super().__init__(f"Upstream '{upstream}' is at capacity")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+class AdmissionLimiter:
+    """At most max_concurrent calls in flight and max_queue callers waiting up to queue_timeout.
+
+    Everyone else is rejected with UpstreamOverloaded straight away, so under a
+    spike admitted calls keep their normal latency instead of all timing out.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = None, max_queue: int = None, queue_timeout: float = None):
+        self.name = name
+        self.max_concurrent = max_concurrent if max_concurrent is not None else Config.ADMISSION_CONCURRENCY.get(name, 0)
+        self.max_queue = max_queue if max_queue is not None else Config.ADMISSION_QUEUE.get(name, 0)
+        self.queue_timeout = queue_timeout if queue_timeout is not None else Config.ADMISSION_QUEUE_TIMEOUT
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=500)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._completed = 0
+        self._service_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return Config.ADMISSION_ENABLED and self.max_concurrent > 0
+
+    def _retry_after(self) -> int:
+        # Ước lượng thời gian để hàng đợi hiện tại được xử lý hết
+        avg_service = self._service_seconds / self._completed if self._completed else 1.0
+        return max(1, int(avg_service * (self.waiting + 1) / self.max_concurrent + 0.5))
+
+    def acquire(self) -> float:
+        """Take a slot, waiting in the queue if there is room; returns the admission time"""
+        start = time.perf_counter()
+        with self._cond:
+            if self.in_flight >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise UpstreamOverloaded(self.name, self._retry_after())
+                self.waiting += 1
+                deadline = start + self.queue_timeout
+                try:
+                    while self.in_flight >= self.max_concurrent:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            raise UpstreamOverloaded(self.name, self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            admitted_at = time.perf_counter()
+            self._waits.append(admitted_at - start)
+        return admitted_at
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a free slot without queueing, for optional background work; None when busy.
+
+        Callers already waiting in the queue keep priority over a slot that just freed up.
+        """
+        with self._cond:
+            if self.in_flight >= self.max_concurrent or self.waiting:
+                return None
+            self.in_flight += 1
+            self.admitted += 1
+            return time.perf_counter()
+
+    def release(self, admitted_at: float):
+        with self._cond:
+            self.in_flight -= 1
+            self._completed += 1
+            self._service_seconds += time.perf_counter() - admitted_at
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        if not self.enabled:
+            yield
+            return
+        admitted_at = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_queue_wait_ms': round(sum(waits) / len(waits) * 1000, 1) if waits else None,
+                'p95_queue_wait_ms': round(waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000, 1) if waits else None,
+                'avg_service_ms': round(self._service_seconds / self._completed * 1000, 1) if self._completed else None
+            }
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures; half-open probe after reset timeout"""
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.CIRCUIT_BREAKER_RESET_TIMEOUT
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open':
+                if time.time() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'half_open':
+                # Chỉ cho một request thử trong trạng thái half-open
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self._probe_in_flight = True
+            self.calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                    print(f"[UPSTREAM] Circuit breaker for '{self.name}' opened")
+                self.state = 'open'
+                self.opened_at = time.time()
+
+    def retry_after(self) -> float:
+        if self.state != 'open':
+            return 0
+        return max(self.reset_timeout - (time.time() - self.opened_at), 0)
+
+    def is_open(self) -> bool:
+        return self.state == 'open' and time.time() - self.opened_at < self.reset_timeout
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+                'retry_after': round(self.retry_after(), 1)
+            }
+
+_breakers = {name: CircuitBreaker(name) for name in UPSTREAMS}
+_limiters = {name: AdmissionLimiter(name) for name in ADMISSION_NAMES}
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    return _breakers[upstream]
+
+def get_limiter(name: str) -> AdmissionLimiter:
+    return _limiters[name]
+
+def admission_slot(name: str):
+    """Context manager holding one of the named limiter's slots; raises UpstreamOverloaded when full"""
+    return _limiters[name].slot()
+
+def is_available(upstream: str) -> bool:
+    """Cheap check used to skip optional stages while a breaker is open"""
+    return not _breakers[upstream].is_open()
+
+def _is_retryable(exc: Exception) -> bool:
+    import openai
+    if isinstance(exc, UpstreamHTTPError):
+        return True
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError,
+                        openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    return False
+
+def call_with_retry(upstream: str, fn: Callable, *args, **kwargs):
+    """Call fn through the upstream's circuit breaker, retrying transient errors with jitter"""
+    breaker = _breakers[upstream]
+    attempts = Config.UPSTREAM_MAX_RETRIES + 1
+
+    for attempt in range(attempts):
+        try:
+            # Giữ slot chỉ trong lúc gọi, không giữ trong lúc chờ retry
+            with admission_slot(upstream):
+                if not breaker.allow():
+                    raise UpstreamUnavailable(upstream, breaker.retry_after())
+                result = fn(*args, **kwargs)
+        except (UpstreamOverloaded, UpstreamUnavailable):
+            raise
+        except Exception as e:
+            retryable = _is_retryable(e)
+            if retryable:
+                breaker.record_failure()
+            else:
+                # Lỗi do request (400, 401...) không phản ánh tình trạng upstream
+                breaker.record_success()
+            if not retryable or attempt == attempts - 1:
+                raise
+            # Full jitter backoff
+            delay = random.uniform(0, Config.UPSTREAM_RETRY_BASE_DELAY * (2 ** attempt))
+            with breaker._lock:
+                breaker.retries += 1
+            print(f"[UPSTREAM] {upstream} call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+# Connection pools -----------------------------------------------------------
+
+_lock = threading.RLock()
+_http_session = None
+_openai_http_client = None
+_openai_pool_stats = {'requests': 0}
+_chat_models = {}
+_embedding_client = None
+
+def get_http_session() -> requests.Session:
+    """Shared keep-alive requests session for plain HTTP upstreams (OpenWeather)"""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.UPSTREAM_POOL_SIZE, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+        return _http_session
+
+def get_openai_http_client() -> httpx.Client:
+    """Shared httpx client used by every Azure OpenAI client in the process"""
+    global _openai_http_client
+    with _lock:
+        if _openai_http_client is None:
+            def count_request(request):
+                _openai_pool_stats['requests'] += 1
+
+            _openai_http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=Config.UPSTREAM_POOL_SIZE,
+                    max_keepalive_connections=Config.UPSTREAM_POOL_SIZE,
+                    keepalive_expiry=60
+                ),
+                timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=5.0),
+                event_hooks={'request': [count_request]}
+            )
+        return _openai_http_client
+
+def get_chat_model(upstream: str = 'llm'):
+    """Shared AzureChatOpenAI for 'llm' or 'vision', both on the same connection pool"""
+    from langchain_openai import AzureChatOpenAI
+
+    with _lock:
+        if upstream not in _chat_models:
+            llm_params = {
+                'azure_endpoint': Config.AZURE_OPENAI_ENDPOINT,
+                'api_key': Config.AZURE_OPENAI_API_KEY,
+                'api_version': Config.AZURE_OPENAI_API_VERSION,
+                'azure_deployment': Config.AZURE_OPENAI_DEPLOYMENT_NAME,
+                'http_client': get_openai_http_client(),
+                'timeout': Config.VISION_TIMEOUT if upstream == 'vision' else Config.LLM_TIMEOUT,
+                'max_retries': 0  # Retry do call_with_retry đảm nhận
+            }
+
+            # Only add temperature if it's not 0.7 (unsupported by GPT-5)
+            if Config.AZURE_OPENAI_TEMPERATURE != 0.7:
+                llm_params['temperature'] = Config.AZURE_OPENAI_TEMPERATURE
+
+            _chat_models[upstream] = AzureChatOpenAI(**llm_params)
+        return _chat_models[upstream]
+
+def get_embedding_client():
+    """Shared AzureOpenAI client for the embedding deployment"""
+    from openai import AzureOpenAI
+
+    global _embedding_client
+    with _lock:
+        if _embedding_client is None:
+            _embedding_client = AzureOpenAI(
+                azure_endpoint=Config.AZURE_OPENAI_EMBEDDING_ENDPOINT,
+                api_key=Config.AZURE_OPENAI_EMBEDDING_API_KEY,
+                api_version=Config.AZURE_OPENAI_EMBEDDING_API_VERSION,
+                http_client=get_openai_http_client(),
+                timeout=Config.EMBEDDING_TIMEOUT,
+                max_retries=0
+            )
+        return _embedding_client
+
+def http_get(upstream: str, url: str, params: dict = None) -> requests.Response:
+    """GET through the shared session with the upstream's timeout, retries and breaker"""
+    timeout = Config.WEATHER_TIMEOUT if upstream == 'weather' else Config.LLM_TIMEOUT
+
+    def _get():
+        response = get_http_session().get(url, params=params, timeout=timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise UpstreamHTTPError(upstream, response.status_code)
+        return response
+
+    trace = current_trace()
+    if trace is None:
+        return call_with_retry(upstream, _get)
+    # Không ghi API key (appid) vào trace; host bỏ đi để trace dùng được với endpoint khác
+    path = urlparse(url).path
+    request = {'path': path, 'params': {k: v for k, v in (params or {}).items() if k not in _SECRET_PARAMS}}
+    return trace.call(upstream, path.rsplit('/', 1)[-1], request, lambda: call_with_retry(upstream, _get),
+                      encode=_response_payload, decode=_response_from_payload)
+
+_SECRET_PARAMS = ('appid', 'api_key', 'key')
+
+def _response_payload(response: requests.Response) -> dict:
+    return {'status_code': response.status_code, 'body': response.text}
+
+def _response_from_payload(payload: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = payload['status_code']
+    response._content = payload['body'].encode('utf-8')
+    response.encoding = 'utf-8'
+    return response
+
+def _pool_stats() -> dict:
+    stats = {}
+
+    if _http_session is not None:
+        adapter = _http_session.get_adapter('https://')
+        opened = 0
+        requests_sent = 0
+        for pool_key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(pool_key)
+            if pool is not None:
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+        stats['http'] = {
+            'requests': requests_sent,
+            'connections_opened': opened,
+            'reuse_ratio': round(1 - opened / requests_sent, 3) if requests_sent else 0
+        }
+
+    if _openai_http_client is not None:
+        try:
+            open_connections = len(_openai_http_client._transport._pool.connections)
+        except AttributeError:
+            open_connections = None
+        stats['openai'] = {
+            'requests': _openai_pool_stats['requests'],
+            'open_connections': open_connections
+        }
+
+    return stats
+
+def upstream_stats() -> dict:
+    """Breaker state, admission queues and connection reuse for every upstream"""
+    return {
+        'breakers': {name: breaker.stats() for name, breaker in _breakers.items()},
+        'admission': {name: limiter.stats() for name, limiter in _limiters.items()},
+        'pools': _pool_stats()
+    }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark retrieval recall against vector memory and search latency for
+shorter (EMBEDDING_DIMENSIONS) and half-precision (float16) embeddings
+
+Ground truth is exact cosine top-k on the full float32 vectors. For every size
+the vectors are cut and renormalized (what the API returns for that many
+dimensions), optionally rounded to float16, and searched exactly with numpy and
+through a ChromaDB HNSW index (float32 only, ChromaDB does not store float16).
+
+Without --collection the vectors are synthetic: clustered, with variance falling
+off along the dimensions the way text-embedding-3 orders them. Only a real
+collection gives recall numbers to base a decision on; documents held out of the
+index act as queries so no embedding calls are needed.
+
+Usage:
+    python benchmark_embeddings.py                                  # synthetic, offline
+    python benchmark_embeddings.py --collection --dimensions 1536 1024 512 256
+    python benchmark_embeddings.py --documents 20000 --k 5 --json results.json
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from config import Config
+from app.models import ChromaDBManager, reduce_dimensions
+
+def synthetic_embeddings(count: int, dimensions: int = 1536, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Các chiều đầu mang nhiều thông tin hơn, giống thứ tự của text-embedding-3
+    scale = (np.arange(dimensions) + 1.0) ** -0.5
+    centers = rng.standard_normal((clusters, dimensions)) * scale
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimensions)) * scale
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def collection_embeddings() -> np.ndarray:
+    db = ChromaDBManager()
+    count = db.collection.count()
+    vectors = [np.asarray(db.collection.get(include=['embeddings'], limit=1000, offset=offset)['embeddings'],
+                          dtype=np.float32) for offset in range(0, count, 1000)]
+    return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+def _top_k(queries: np.ndarray, documents: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ documents.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def _recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+def _percentiles(samples: list) -> tuple:
+    return round(float(np.percentile(samples, 50)), 3), round(float(np.percentile(samples, 95)), 3)
+
+def _chroma(documents: np.ndarray, queries: np.ndarray, k: int) -> dict:
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    collection = client.create_collection(name=name, metadata=ChromaDBManager.collection_metadata())
+    start = time.perf_counter()
+    batch = min(5000, client.get_max_batch_size())
+    for offset in range(0, len(documents), batch):
+        collection.add(ids=[str(i) for i in range(offset, min(offset + batch, len(documents)))],
+                       embeddings=documents[offset:offset + batch])
+    build_s = time.perf_counter() - start
+
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append([int(i) for i in result['ids'][0]])
+    client.delete_collection(name)
+    return {'found': found, 'latency': latencies, 'build_s': round(build_s, 2)}
+
+def run_benchmark(documents: np.ndarray, queries: np.ndarray, dimensions: list, dtypes: list,
+                  k: int = 3, chroma: bool = True) -> list:
+    """One row per (dimensions, dtype): memory, recall against full-size float32, latency"""
+    truth = _top_k(queries, documents, k)
+    rows = []
+    for size in dimensions:
+        reduced_docs = reduce_dimensions(documents, size)
+        reduced_queries = reduce_dimensions(queries, size)
+        for dtype in dtypes:
+            stored = reduced_docs.astype(dtype)
+            # numpy không có GEMM float16 nhanh: so sánh độ chính xác trên giá trị đã làm tròn
+            searchable = stored.astype(np.float32)
+            latencies = []
+            for query in reduced_queries:
+                start = time.perf_counter()
+                _top_k(query[None, :], searchable, k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            row = {
+                'dimensions': int(reduced_docs.shape[1]),
+                'dtype': dtype,
+                'vectors_mb': round(stored.nbytes / 1e6, 2),
+                'recall_exact': round(_recall(_top_k(reduced_queries, searchable, k), truth), 4),
+                'exact_p50_ms': _percentiles(latencies)[0]
+            }
+            if chroma and dtype == 'float32':
+                result = _chroma(reduced_docs, reduced_queries, k)
+                row['recall_chroma'] = round(_recall(result['found'], truth), 4)
+                row['chroma_p50_ms'], row['chroma_p95_ms'] = _percentiles(result['latency'])
+                row['build_s'] = result['build_s']
+            rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="store_true", help="use the vectors stored in CHROMADB_PATH")
+    parser.add_argument("--documents", type=int, default=10000, help="synthetic collection size")
+    parser.add_argument("--queries", type=int, default=200, help="vectors held out as queries")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 1024, 768, 512, 256])
+    parser.add_argument("--dtypes", nargs="+", choices=("float32", "float16"), default=["float32", "float16"])
+    parser.add_argument("--k", type=int, default=Config.RETRIEVAL_TOP_K, help="top-k (default RETRIEVAL_TOP_K)")
+    parser.add_argument("--no-chroma", action="store_true", help="exact numpy search only")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results here")
+    args = parser.parse_args()
+
+    vectors = collection_embeddings() if args.collection else \
+        synthetic_embeddings(args.documents + args.queries, seed=args.seed)
+    if len(vectors) <= args.queries:
+        print(f"❌ Need more than {args.queries} vectors, found {len(vectors)}")
+        return 1
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    queries, documents = vectors[order[:args.queries]], vectors[order[args.queries:]]
+
+    print(f"📐 Embedding size benchmark: {len(documents)} documents x {documents.shape[1]}d, "
+          f"{len(queries)} queries, top-{args.k} ({'collection' if args.collection else 'synthetic'})")
+    print("=" * 70)
+    rows = run_benchmark(documents, queries, args.dimensions, args.dtypes, args.k, chroma=not args.no_chroma)
+
+    print(f"\n{'dims':>6}{'dtype':>9}{'vectors MB':>12}{'recall':>9}{'exact p50':>11}"
+          f"{'hnsw recall':>13}{'hnsw p50':>10}{'hnsw p95':>10}{'build s':>9}")
+    for r in rows:
+        print(f"{r['dimensions']:>6}{r['dtype']:>9}{r['vectors_mb']:>12}{r['recall_exact']:>9}{r['exact_p50_ms']:>11}"
+              f"{str(r.get('recall_chroma', '-')):>13}{str(r.get('chroma_p50_ms', '-')):>10}"
+              f"{str(r.get('chroma_p95_ms', '-')):>10}{str(r.get('build_s', '-')):>9}")
+    print(f"\nrecall = share of the full-size float32 top-{args.k} that is still found; times in ms per query")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'documents': len(documents), 'queries': len(queries), 'k': args.k,
+                       'source': 'collection' if args.collection else 'synthetic', 'results': rows}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Sweep ChromaDB HNSW settings (M, construction_ef, search_ef): recall and latency
+
+One index is built per setting: ChromaDB only picks up a new search_ef when the
+index is loaded, which the app does at startup (ChromaDBManager applies
+HNSW_SEARCH_EF before the first search). Recall is measured against exact
+cosine top-k. --cold-start also times
+the first search after a restart, with and without ChromaDBManager.warm_up_index,
+each in a fresh process.
+
+Usage:
+    python benchmark_hnsw.py                                        # synthetic, offline
+    python benchmark_hnsw.py --collection --search-ef 10 50 100 200
+    python benchmark_hnsw.py --m 16 32 --construction-ef 100 200 --cold-start --json hnsw.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from config import Config
+from benchmark_embeddings import _percentiles, _recall, _top_k, collection_embeddings, synthetic_embeddings
+
+def _metadata(m: int, construction_ef: int, search_ef: int) -> dict:
+    return {"hnsw:space": "cosine", "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+
+def _add(client, collection, documents: np.ndarray):
+    batch = min(5000, client.get_max_batch_size())
+    for offset in range(0, len(documents), batch):
+        collection.add(ids=[str(i) for i in range(offset, min(offset + batch, len(documents)))],
+                       embeddings=documents[offset:offset + batch])
+
+def sweep(documents: np.ndarray, queries: np.ndarray, m_values: list, construction_efs: list,
+          search_efs: list, k: int = 3) -> list:
+    """One row per (M, construction_ef, search_ef): recall against exact top-k, latency, build time"""
+    import chromadb
+
+    truth = _top_k(queries, documents, k)
+    client = chromadb.EphemeralClient()
+    rows = []
+    for m in m_values:
+        for construction_ef in construction_efs:
+            for search_ef in search_efs:
+                name = f"hnsw_{uuid.uuid4().hex[:12]}"
+                collection = client.create_collection(name=name, metadata=_metadata(m, construction_ef, search_ef))
+                start = time.perf_counter()
+                _add(client, collection, documents)
+                build_s = time.perf_counter() - start
+                collection.query(query_embeddings=[queries[0]], n_results=k, include=[])
+                found, latencies = [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    result = collection.query(query_embeddings=[query], n_results=k, include=[])
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found.append([int(i) for i in result['ids'][0]])
+                client.delete_collection(name)
+                p50, p95 = _percentiles(latencies)
+                rows.append({'M': m, 'construction_ef': construction_ef, 'search_ef': search_ef,
+                             'recall': round(_recall(found, truth), 4), 'p50_ms': p50, 'p95_ms': p95,
+                             'build_s': round(build_s, 2)})
+    return rows
+
+def _first_search(path: str, warm_up: bool) -> dict:
+    """Run in a fresh process: open the collection like the app does and time the first search"""
+    # Chỉ tìm bằng vector có sẵn; client embeddings được khởi tạo nhưng không được gọi
+    Config.AZURE_OPENAI_EMBEDDING_ENDPOINT = Config.AZURE_OPENAI_EMBEDDING_ENDPOINT or 'http://127.0.0.1:9'
+    Config.AZURE_OPENAI_EMBEDDING_API_KEY = Config.AZURE_OPENAI_EMBEDDING_API_KEY or 'benchmark'
+    Config.AZURE_OPENAI_EMBEDDING_API_VERSION = Config.AZURE_OPENAI_EMBEDDING_API_VERSION or '2024-06-01'
+    Config.CHROMADB_PATH = path
+    from app.models import ChromaDBManager
+
+    db = ChromaDBManager()
+    warm_up_s = db.warm_up_index() if warm_up else 0.0
+    query = np.load(os.path.join(path, 'query.npy'))
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        db.collection.query(query_embeddings=[query], n_results=Config.RETRIEVAL_TOP_K, include=[])
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'warm_up_ms': round(warm_up_s * 1000, 1), 'first_ms': round(timings[0], 1), 'second_ms': round(timings[1], 1)}
+
+def cold_start(documents: np.ndarray, query: np.ndarray) -> dict:
+    import chromadb
+    from app.models import ChromaDBManager
+
+    path = tempfile.mkdtemp(prefix="hnsw-cold-")
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_or_create_collection(name="travel_knowledge", metadata=ChromaDBManager.collection_metadata())
+    _add(client, collection, documents)
+    np.save(os.path.join(path, 'query.npy'), query)
+    del collection, client
+
+    results = {}
+    for label, flag in (('no_warm_up', []), ('warm_up', ['--warm-up'])):
+        output = subprocess.run([sys.executable, __file__, '--first-search', path] + flag, capture_output=True, text=True)
+        lines = [l for l in output.stdout.splitlines() if l.startswith("RESULT ")]
+        if not lines:
+            print(f"❌ cold start ({label}) failed:\n{output.stderr[-2000:]}")
+            continue
+        results[label] = json.loads(lines[-1][len("RESULT "):])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="store_true", help="use the vectors stored in CHROMADB_PATH")
+    parser.add_argument("--documents", type=int, default=10000, help="synthetic collection size")
+    parser.add_argument("--dimensions", type=int, default=Config.EMBEDDING_DIMENSIONS or 1536, help="synthetic vector size")
+    parser.add_argument("--queries", type=int, default=200, help="vectors held out as queries")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--k", type=int, default=Config.RETRIEVAL_TOP_K, help="top-k (default RETRIEVAL_TOP_K)")
+    parser.add_argument("--cold-start", action="store_true", help="also time the first search after a restart")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--first-search", help=argparse.SUPPRESS)
+    parser.add_argument("--warm-up", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.first_search:
+        print("RESULT " + json.dumps(_first_search(args.first_search, args.warm_up)))
+        return 0
+
+    vectors = collection_embeddings() if args.collection else \
+        synthetic_embeddings(args.documents + args.queries, args.dimensions, seed=args.seed)
+    if len(vectors) <= args.queries:
+        print(f"❌ Need more than {args.queries} vectors, found {len(vectors)}")
+        return 1
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    queries, documents = vectors[order[:args.queries]], vectors[order[args.queries:]]
+
+    print(f"🧭 HNSW sweep: {len(documents)} documents x {documents.shape[1]}d, {len(queries)} queries, "
+          f"top-{args.k} ({'collection' if args.collection else 'synthetic'})")
+    print(f"   current config: M={Config.HNSW_M} construction_ef={Config.HNSW_CONSTRUCTION_EF} "
+          f"search_ef={Config.HNSW_SEARCH_EF}")
+    print("=" * 70)
+    rows = sweep(documents, queries, args.m, args.construction_ef, args.search_ef, args.k)
+
+    print(f"\n{'M':>4}{'constr ef':>11}{'search ef':>11}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'build s':>9}")
+    for r in rows:
+        current = (r['M'], r['construction_ef'], r['search_ef']) == \
+            (Config.HNSW_M, Config.HNSW_CONSTRUCTION_EF, Config.HNSW_SEARCH_EF)
+        print(f"{r['M']:>4}{r['construction_ef']:>11}{r['search_ef']:>11}{r['recall']:>9}{r['p50_ms']:>9}"
+              f"{r['p95_ms']:>9}{r['build_s']:>9}{'  <- current' if current else ''}")
+
+    cold = None
+    if args.cold_start:
+        cold = cold_start(documents, queries[0])
+        print("\nFirst search after a restart (current config):")
+        for label, r in cold.items():
+            print(f"  {label:<12} warm-up {r['warm_up_ms']:>7} ms   first {r['first_ms']:>7} ms   second {r['second_ms']:>7} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'documents': len(documents), 'queries': len(queries), 'k': args.k,
+                       'results': rows, 'cold_start': cold}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Benchmark the production server (gunicorn, preloaded model) against the Flask dev server
+
+Starts each server, drives concurrent requests at /healthz and /api/tts, then
+reports requests/sec, latency and per-process memory. RSS counts shared pages in
+every process; PSS splits them between the processes sharing them, so it shows
+what copy-on-write preloading saves. Linux only (reads /proc).
+
+Usage:
+    python benchmark_serving.py --tiny                  # small random-weight VITS, offline
+    python benchmark_serving.py --workers 4 --concurrency 8 --duration 20
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+TTS_TEXT = "Xin chào! Hôm nay trời Hà Nội rất đẹp."
+
+def create_tiny_app():
+    """App whose TTS is the small random-weight VITS (gunicorn 'benchmark_serving:create_tiny_app()')"""
+    import gc
+    from app import create_app, services
+    from app.testing import build_tiny_tts
+
+    app = create_app(warm_up=False)
+    services.set_service('tts', build_tiny_tts())
+    gc.freeze()
+    return app
+
+def serve_dev(port: int, tiny: bool):
+    """Same as app.py: Flask dev server with debug=True (reloader, threaded)"""
+    if tiny:
+        app = create_tiny_app()
+    else:
+        from app import create_app
+        app = create_app()
+    app.run(debug=True, host='127.0.0.1', port=port)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _children(pid: int):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+def _memory_mb(pid: int) -> dict:
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    values[key.lower()] = round(int(rest.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+def process_tree_memory(root_pid: int) -> list:
+    """[(pid, role, rss_mb, pss_mb)] for the server and every descendant"""
+    processes, pending = [], [(root_pid, 'master')]
+    while pending:
+        pid, role = pending.pop()
+        memory = _memory_mb(pid)
+        if memory:
+            processes.append((pid, role, memory.get('rss'), memory.get('pss')))
+        pending.extend((child, 'worker') for child in _children(pid))
+    return processes
+
+def wait_until_up(url: str, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/healthz", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+def drive(url: str, path: str, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if path == '/api/tts':
+                    response = session.post(f"{url}{path}", json={'text': TTS_TEXT},
+                                            headers={'Accept': 'audio/wav'}, timeout=120)
+                else:
+                    response = session.get(f"{url}{path}", timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000, 1) if latencies else None
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': pick(0.5),
+        'p95_ms': pick(0.95),
+        'errors': errors[0]
+    }
+
+def run_server(name: str, command, url: str, env, args) -> dict:
+    process = subprocess.Popen(command, cwd=project_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_up(url, args.startup_timeout):
+            print(f"❌ {name} did not start")
+            return None
+        # Một request TTS để mọi worker đã load xong trước khi đo
+        drive(url, '/api/tts', args.concurrency, 2)
+        result = {path: drive(url, path, args.concurrency, args.duration) for path in ('/healthz', '/api/tts')}
+        result['memory'] = process_tree_memory(process.pid)
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiny", action="store_true", help="use a small random-weight TTS model (offline)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (WEB_WORKERS)")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker (WEB_THREADS)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--serve-dev", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_dev:
+        serve_dev(args.serve_dev, args.tiny)
+        return 0
+
+    print("🌐 Serving benchmark: gunicorn (preload) vs Flask dev server")
+    print("=" * 70)
+
+    env = dict(os.environ)
+    env['TTS_CACHE_ENABLED'] = 'false'  # Đo tổng hợp thật, không phải cache hit
+    env['SERVICES_WARMUP'] = '' if args.tiny else env.get('SERVICES_WARMUP', 'db,agent,tts')
+    dev_port, gunicorn_port = _free_port(), _free_port()
+    env['WEB_BIND'] = f"127.0.0.1:{gunicorn_port}"
+    env['WEB_WORKERS'] = str(args.workers)
+    env['WEB_THREADS'] = str(args.threads)
+
+    dev_command = [sys.executable, __file__, "--serve-dev", str(dev_port)] + (["--tiny"] if args.tiny else [])
+    gunicorn_app = 'benchmark_serving:create_tiny_app()' if args.tiny else 'wsgi:app'
+    servers = [
+        ('dev', dev_command, dev_port),
+        (f'gunicorn x{args.workers}', [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', gunicorn_app],
+         gunicorn_port)
+    ]
+
+    for name, command, port in servers:
+        result = run_server(name, command, f"http://127.0.0.1:{port}", env, args)
+        if result is None:
+            continue
+        print(f"\n{name}")
+        for path in ('/healthz', '/api/tts'):
+            r = result[path]
+            print(f"  {path:<10} {r['rps']:>8} req/s   p50 {r['p50_ms']} ms   p95 {r['p95_ms']} ms   errors {r['errors']}")
+        total_rss = sum(m[2] or 0 for m in result['memory'])
+        total_pss = sum(m[3] or 0 for m in result['memory'])
+        for pid, role, rss, pss in result['memory']:
+            print(f"  {role:<8} pid {pid:<8} RSS {rss:>8} MB   PSS {pss:>8} MB")
+        print(f"  total    RSS {round(total_rss, 1)} MB   PSS {round(total_pss, 1)} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark app startup: lazy services vs building everything before serving
+
+Each scenario runs in a fresh process:
+    lazy     create_app() without warm-up, then the first /healthz
+    warm-up  create_app() with background warm-up, then poll /readyz until 200
+    eager    create_app() and load every service before the first request (old behaviour)
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --repeat 3 --services db agent tts
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+SCENARIOS = ("lazy", "warm-up", "eager")
+HEAVY_MODULES = ("torch", "transformers", "chromadb", "langgraph")
+
+def run_scenario(scenario: str, service_names, timeout: float) -> dict:
+    start = time.perf_counter()
+    from app import create_app, services
+
+    app = create_app(warm_up=False)
+    create_s = time.perf_counter() - start
+    client = app.test_client()
+
+    if scenario == "eager":
+        services.warm_up(service_names)
+    elif scenario == "warm-up":
+        services.warm_up_async(service_names)
+
+    status = client.get("/healthz").status_code
+    first_response_s = time.perf_counter() - start
+
+    ready_s = None
+    if scenario != "lazy":
+        while time.perf_counter() - start < timeout:
+            if client.get("/readyz").status_code == 200:
+                ready_s = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+
+    return {
+        "scenario": scenario,
+        "healthz_status": status,
+        "create_app_s": round(create_s, 3),
+        "first_response_s": round(first_response_s, 3),
+        "ready_s": round(ready_s, 3) if ready_s is not None else None,
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--services", nargs="+", default=None, help="services to load (default: SERVICES_WARMUP)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print("RESULT " + json.dumps(run_scenario(args.single, args.services, args.timeout)))
+        return 0
+
+    print("🚀 Startup benchmark")
+    print("=" * 70)
+
+    print(f"\n{'scenario':<10}{'create_app s':>14}{'first resp s':>14}{'ready s':>9}{'RSS MB':>9}  heavy modules")
+    for scenario in args.scenarios:
+        for _ in range(args.repeat):
+            command = [sys.executable, __file__, "--single", scenario, "--timeout", str(args.timeout)]
+            if args.services:
+                command += ["--services"] + args.services
+            output = subprocess.run(command, capture_output=True, text=True, cwd=project_root)
+            lines = [l for l in output.stdout.splitlines() if l.startswith("RESULT ")]
+            if not lines:
+                print(f"❌ {scenario} failed:\n{output.stderr[-2000:]}")
+                continue
+            r = json.loads(lines[-1][len("RESULT "):])
+            ready = r["ready_s"] if r["ready_s"] is not None else "-"
+            print(f"{scenario:<10}{r['create_app_s']:>14}{r['first_response_s']:>14}{ready:>9}{r['rss_mb']:>9}"
+                  f"  {', '.join(r['heavy_modules']) or '-'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
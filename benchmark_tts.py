@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark TTS real-time factor: single-pass (old) vs sentence-batched synthesis
+
+RTF = synthesis time / audio duration (lower is better, < 1 is faster than real time).
+
+Usage:
+    python benchmark_tts.py                 # facebook/mms-tts-vie
+    python benchmark_tts.py --tiny          # small random-weight VITS, no download needed
+    python benchmark_tts.py --batch-sizes 1 4 8 --repeat 3
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import torch
+from config import Config
+from app.tts_service import TTSService
+from app.testing import SAMPLE_TEXT, build_tiny_tts
+
+def single_pass(tts: TTSService, clean_text: str) -> np.ndarray:
+    """Old path: the whole text in one forward pass"""
+    inputs = tts.tokenizer(clean_text, return_tensors="pt").to(tts.device)
+    with torch.no_grad():
+        return tts.model(**inputs).waveform.squeeze().cpu().numpy()
+
+def measure(fn, repeat: int):
+    times = []
+    audio = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        audio = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), audio
+
+def run(args) -> int:
+    tts = build_tiny_tts() if args.tiny else TTSService()
+    if tts.model is None:
+        print("❌ Model failed to load!")
+        return 1
+
+    text = Path(args.text_file).read_text(encoding="utf-8") if args.text_file else SAMPLE_TEXT
+    clean_text = tts._clean_text_for_tts(text)
+    sampling_rate = tts.model.config.sampling_rate
+    print(f"📝 {len(clean_text)} chars, {len(tts._split_sentences(clean_text))} sentences, device={tts.device}")
+
+    # Warm-up
+    tts.synthesize("Xin chào.")
+
+    results = []
+    seconds, audio = measure(lambda: single_pass(tts, clean_text), args.repeat)
+    results.append(("single pass (full text)", seconds, len(audio) / sampling_rate))
+
+    for batch_size in args.batch_sizes:
+        Config.TTS_BATCH_SIZE = batch_size
+        seconds, audio = measure(lambda: tts.synthesize(clean_text), args.repeat)
+        results.append((f"sentence batches (size {batch_size})", seconds, len(audio) / sampling_rate))
+
+    print(f"\n{'mode':<32}{'synth s':>10}{'audio s':>10}{'RTF':>8}")
+    for name, seconds, duration in results:
+        print(f"{name:<32}{seconds:>10.2f}{duration:>10.2f}{seconds / duration:>8.3f}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiny", action="store_true", help="use a small random-weight model (offline)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--text-file", help="benchmark text (default: built-in travel answer)")
+    args = parser.parse_args()
+
+    print("🎤 TTS real-time factor benchmark")
+    print("=" * 60)
+
+    # Đo thời gian tổng hợp thật, không đo cache; Config được trả lại khi xong
+    saved = Config.TTS_CACHE_ENABLED, Config.TTS_MAX_CHARS, Config.TTS_BATCH_SIZE
+    Config.TTS_CACHE_ENABLED, Config.TTS_MAX_CHARS = False, 0
+    try:
+        return run(args)
+    finally:
+        Config.TTS_CACHE_ENABLED, Config.TTS_MAX_CHARS, Config.TTS_BATCH_SIZE = saved
+
+if __name__ == "__main__":
+    sys.exit(main())
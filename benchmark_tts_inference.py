@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark TTS inference modes on CPU: fp32, int8, TorchScript and ONNX Runtime
+
+Each mode runs in its own process so memory numbers are not shared. Noise is
+disabled (noise_scale = 0) so every mode can be compared to the fp32 output.
+
+Usage:
+    python benchmark_tts_inference.py                      # facebook/mms-tts-vie
+    python benchmark_tts_inference.py --tiny               # small random-weight VITS, offline
+    python benchmark_tts_inference.py --modes fp32 int8 --threads 2
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from config import Config
+from app.tts_runtime import INFERENCE_MODES, compare_to_reference
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+def run_mode(args) -> dict:
+    """Measure one mode in this process and save its waveform for the quality check"""
+    from app.testing import SAMPLE_TEXT, build_tiny_tts
+    from app.tts_service import TTSService
+
+    Config.TTS_CACHE_ENABLED = False
+    Config.TTS_EXPORT_DIR = args.export_dir
+    if args.threads:
+        Config.TTS_NUM_THREADS = args.threads
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if args.tiny:
+        tts = build_tiny_tts("fp32", deterministic=True)
+    else:
+        tts = TTSService(inference_mode="fp32")
+        tts.model.noise_scale = tts.model.noise_scale_duration = 0.0
+    tts._init_runner(args.single)
+    setup_seconds = time.perf_counter() - start
+
+    clean_text = tts._clean_text_for_tts(SAMPLE_TEXT)
+    tts.synthesize("Xin chào.")  # Warm-up
+
+    times = []
+    for _ in range(args.repeat):
+        begin = time.perf_counter()
+        audio = tts.synthesize(clean_text)
+        times.append(time.perf_counter() - begin)
+
+    np.save(os.path.join(args.export_dir, f"{args.single}.npy"), audio)
+    duration = len(audio) / tts.model.config.sampling_rate
+    return {
+        "mode": tts.inference_mode,
+        "setup_s": round(setup_seconds, 2),
+        "latency_s": round(min(times), 3),
+        "rtf": round(min(times) / duration, 3),
+        "rss_mb": round(_rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiny", action="store_true", help="use a small random-weight model (offline)")
+    parser.add_argument("--modes", nargs="+", default=list(INFERENCE_MODES), choices=INFERENCE_MODES)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (default: TTS_NUM_THREADS)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--export-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print("RESULT " + json.dumps(run_mode(args)))
+        return 0
+
+    print("🎤 TTS inference mode benchmark")
+    print("=" * 70)
+
+    export_dir = tempfile.mkdtemp(prefix="tts-bench-")
+    modes = ["fp32"] + [m for m in args.modes if m != "fp32"]
+    results = []
+    for mode in modes:
+        command = [sys.executable, __file__, "--single", mode, "--export-dir", export_dir,
+                   "--repeat", str(args.repeat), "--threads", str(args.threads)]
+        if args.tiny:
+            command.append("--tiny")
+        output = subprocess.run(command, capture_output=True, text=True)
+        lines = [l for l in output.stdout.splitlines() if l.startswith("RESULT ")]
+        if not lines:
+            print(f"❌ {mode} failed:\n{output.stderr[-2000:]}")
+            continue
+        result = json.loads(lines[-1][len("RESULT "):])
+        if result["mode"] != mode:
+            print(f"⚠️ {mode} fell back to {result['mode']}")
+        results.append((mode, result))
+
+    reference = np.load(os.path.join(export_dir, "fp32.npy"))
+    print(f"\n{'mode':<13}{'setup s':>9}{'latency s':>11}{'RTF':>8}{'RSS MB':>9}{'peak MB':>9}{'dur ratio':>11}{'LSD dB':>8}")
+    for mode, r in results:
+        quality = compare_to_reference(reference, np.load(os.path.join(export_dir, f"{mode}.npy")))
+        print(f"{mode:<13}{r['setup_s']:>9}{r['latency_s']:>11}{r['rtf']:>8}{r['rss_mb']:>9}{r['peak_rss_mb']:>9}"
+              f"{quality['duration_ratio']:>11}{quality['log_spectral_distance_db']:>8}")
+    print("\nLSD = log-spectral distance to the fp32 output (lower is closer)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,129 @@ class Config:
     # Model parameters
     AZURE_OPENAI_TEMPERATURE = float(os.environ.get('AZURE_OPENAI_TEMPERATURE', '1.0'))  # Default to 1.0 for GPT-5
     
+    # Services are built lazily; these are loaded in a background thread when the app starts
+    SERVICES_WARMUP = [name.strip() for name in os.environ.get('SERVICES_WARMUP', 'db,agent,tts').split(',') if name.strip()]
+    READINESS_SERVICES = [name.strip() for name in os.environ.get('READINESS_SERVICES', 'agent').split(',') if name.strip()]  # /readyz returns 503 until these are loaded
+    
+    # Production server: gunicorn -c gunicorn.conf.py wsgi:app
+    WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', '2'))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', '4'))  # Request threads per worker
+    WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', '120'))
+    # Loaded once in the master and shared copy-on-write by the workers. ChromaDB and the agent
+    # hold SQLite connections and threads that do not survive fork, so each worker builds its own.
+    WEB_PRELOAD_SERVICES = [name.strip() for name in os.environ.get('WEB_PRELOAD_SERVICES', 'tts').split(',') if name.strip()]
+    
+    # Retrieval
+    RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', '3'))
+    RETRIEVAL_WORKERS = int(os.environ.get('RETRIEVAL_WORKERS', '4'))
+    # Text+image questions also search on the image description when the best text hit is farther than this (cosine distance)
+    IMAGE_RETRIEVAL_MAX_DISTANCE = float(os.environ.get('IMAGE_RETRIEVAL_MAX_DISTANCE', '0.35'))
+    # Follow-up questions ("còn quán nào khác không?") reuse the previous turn's documents
+    FOLLOWUP_REUSE_ENABLED = os.environ.get('FOLLOWUP_REUSE_ENABLED', 'true').lower() == 'true'
+    FOLLOWUP_MAX_WORDS = int(os.environ.get('FOLLOWUP_MAX_WORDS', '8'))  # Longer questions are not checked for pronoun/ellipsis cues
+    FOLLOWUP_SIMILARITY = float(os.environ.get('FOLLOWUP_SIMILARITY', '0.8'))  # Cosine to the previous query above which its documents are kept
+    FOLLOWUP_EXTRA_DOCS = int(os.environ.get('FOLLOWUP_EXTRA_DOCS', '2'))  # Unseen documents added per follow-up
+    FOLLOWUP_MAX_TURNS = int(os.environ.get('FOLLOWUP_MAX_TURNS', '3'))  # Follow-ups in a row before a full retrieval
+    
+    # Request deadline (seconds from arrival, 0 = none): optional stages are dropped when time is short
+    REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', '30'))
+    # Seconds that must remain to start each optional stage
+    STAGE_MIN_BUDGET = {name: float(limit) for name, _, limit in (item.strip().partition('=') for item in os.environ.get(
+        'STAGE_MIN_BUDGET', 'image_retrieval=2,weather=8,weather_advice=5').split(',') if item.strip())}
+    
+    # Upstream clients: timeouts (seconds), retries and circuit breakers
+    LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '60'))
+    VISION_TIMEOUT = float(os.environ.get('VISION_TIMEOUT', '30'))
+    EMBEDDING_TIMEOUT = float(os.environ.get('EMBEDDING_TIMEOUT', '10'))
+    WEATHER_TIMEOUT = float(os.environ.get('WEATHER_TIMEOUT', '5'))
+    UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', '20'))
+    UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', '2'))
+    UPSTREAM_RETRY_BASE_DELAY = float(os.environ.get('UPSTREAM_RETRY_BASE_DELAY', '0.5'))
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_BREAKER_RESET_TIMEOUT', '30'))
+    
+    # Admission control: concurrent calls and waiting callers per upstream ('chat' = whole /api/chat requests)
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_CONCURRENCY = {name: int(limit) for name, _, limit in (item.strip().partition('=') for item in os.environ.get(
+        'ADMISSION_CONCURRENCY', 'chat=32,llm=16,vision=4,embeddings=16,weather=8,tts=2').split(',') if item.strip())}
+    ADMISSION_QUEUE = {name: int(limit) for name, _, limit in (item.strip().partition('=') for item in os.environ.get(
+        'ADMISSION_QUEUE', 'chat=16,llm=16,vision=4,embeddings=16,weather=4,tts=4').split(',') if item.strip())}
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2'))  # Seconds a caller may wait for a slot before 429
+    
+    # LLM completion cache (exact match on deployment + messages + temperature)
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH') or './data/llm_cache.db'
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '5000'))
+    LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', '86400'))
+    # Call sites that opt in: extract_location, weather_advice, generate_response
+    LLM_CACHE_SITES = [site.strip() for site in os.environ.get('LLM_CACHE_SITES', 'extract_location,weather_advice').split(',') if site.strip()]
+    
+    # Server-side image normalization before vision calls
+    IMAGE_NORMALIZE_ENABLED = os.environ.get('IMAGE_NORMALIZE_ENABLED', 'true').lower() == 'true'
+    IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', '512'))
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '85'))
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+    
+    # Uploaded images held server-side and referenced by ID from /api/chat
+    IMAGE_STORE_TTL = int(os.environ.get('IMAGE_STORE_TTL', '600'))
+    IMAGE_STORE_MAX_ENTRIES = int(os.environ.get('IMAGE_STORE_MAX_ENTRIES', '500'))
+    IMAGE_STORE_MAX_BYTES = int(os.environ.get('IMAGE_STORE_MAX_BYTES', str(100 * 1024 * 1024)))
+    IMAGE_STORE_DIR = os.environ.get('IMAGE_STORE_DIR', '')  # Set to a shared directory for multi-worker deployments
+    
+    # Image analysis cache (perceptual hash)
+    IMAGE_CACHE_ENABLED = os.environ.get('IMAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    IMAGE_CACHE_PATH = os.environ.get('IMAGE_CACHE_PATH') or './data/image_cache.db'
+    IMAGE_CACHE_MAX_ENTRIES = int(os.environ.get('IMAGE_CACHE_MAX_ENTRIES', '2000'))
+    IMAGE_CACHE_HAMMING_THRESHOLD = int(os.environ.get('IMAGE_CACHE_HAMMING_THRESHOLD', '6'))  # Bits out of 64
+    
+    # Chat history compaction
+    CHAT_HISTORY_MAX_TURNS = int(os.environ.get('CHAT_HISTORY_MAX_TURNS', '10'))
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', '1500'))  # Tokens of history sent to the LLM
+    CHAT_HISTORY_KEEP_TURNS = int(os.environ.get('CHAT_HISTORY_KEEP_TURNS', '3'))  # Recent turns always sent verbatim
+    CHAT_HISTORY_SUMMARY_ENABLED = os.environ.get('CHAT_HISTORY_SUMMARY_ENABLED', 'true').lower() == 'true'
+    
+    # Server-side chat session store
+    SESSION_STORE_BACKEND = os.environ.get('SESSION_STORE_BACKEND', 'memory')  # 'memory' or 'sqlite' (multi-worker)
+    SESSION_STORE_MAX_ENTRIES = int(os.environ.get('SESSION_STORE_MAX_ENTRIES', '10000'))
+    SESSION_STORE_TTL = int(os.environ.get('SESSION_STORE_TTL', '7200'))  # Seconds of inactivity before a session expires
+    SESSION_STORE_SQLITE_PATH = os.environ.get('SESSION_STORE_SQLITE_PATH') or './data/sessions.db'
+    
+    # Request traces: one JSONL line per chat request (stage timings, upstream calls); replay with replay_traces.py
+    TRACE_ENABLED = os.environ.get('TRACE_ENABLED', 'false').lower() == 'true'
+    TRACE_PATH = os.environ.get('TRACE_PATH') or './data/request_traces.jsonl'
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '1.0'))  # Fraction of chat requests recorded
+    TRACE_MAX_MB = int(os.environ.get('TRACE_MAX_MB', '100'))  # Rotated to <path>.1 beyond this
+    
+    # Text-to-speech (MMS VITS)
+    TTS_MAX_CHARS = int(os.environ.get('TTS_MAX_CHARS', '3000'))  # 0 = read the whole response
+    TTS_SENTENCE_MAX_CHARS = int(os.environ.get('TTS_SENTENCE_MAX_CHARS', '200'))  # Longer sentences are split at commas/spaces
+    TTS_BATCH_SIZE = int(os.environ.get('TTS_BATCH_SIZE', '8'))  # Sentences per padded forward pass
+    TTS_SENTENCE_PAUSE = float(os.environ.get('TTS_SENTENCE_PAUSE', '0.15'))  # Seconds of silence between sentences
+    
+    # TTS inference on CPU
+    TTS_INFERENCE_MODE = os.environ.get('TTS_INFERENCE_MODE', 'fp32')  # fp32, int8, torchscript or onnx
+    TTS_NUM_THREADS = int(os.environ.get('TTS_NUM_THREADS', '0'))  # torch/ONNX intra-op threads, 0 = half of the cores
+    TTS_EXPORT_DIR = os.environ.get('TTS_EXPORT_DIR', './data/tts_export')  # Exported TorchScript/ONNX models
+    
+    # Out-of-process TTS workers (0 = synthesize inside the web process)
+    TTS_WORKERS = int(os.environ.get('TTS_WORKERS', '0'))
+    TTS_WORKER_QUEUE = int(os.environ.get('TTS_WORKER_QUEUE', '8'))  # Jobs waiting beyond the running ones before 429
+    TTS_JOB_TIMEOUT = float(os.environ.get('TTS_JOB_TIMEOUT', '120'))
+    
+    # Synthesized audio cache (memory LRU + size-capped disk tier)
+    TTS_CACHE_ENABLED = os.environ.get('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+    TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', './data/tts_cache')  # Empty = memory only
+    TTS_CACHE_MEMORY_MB = int(os.environ.get('TTS_CACHE_MEMORY_MB', '64'))
+    TTS_CACHE_DISK_MB = int(os.environ.get('TTS_CACHE_DISK_MB', '512'))
+    TTS_CACHE_WARM_TOP = int(os.environ.get('TTS_CACHE_WARM_TOP', '20'))  # Most requested texts re-synthesized by the warm action
+    
+    # Speculative TTS: pre-synthesize the first sentences of each chat answer into the audio cache
+    TTS_SPECULATIVE_ENABLED = os.environ.get('TTS_SPECULATIVE_ENABLED', 'false').lower() == 'true'
+    TTS_SPECULATIVE_SENTENCES = int(os.environ.get('TTS_SPECULATIVE_SENTENCES', '2'))
+    TTS_SPECULATIVE_MAX_PENDING = int(os.environ.get('TTS_SPECULATIVE_MAX_PENDING', '4'))  # Answers waiting; newer ones are dropped beyond this
+    TTS_SPECULATIVE_MAX_LOAD = float(os.environ.get('TTS_SPECULATIVE_MAX_LOAD', '0.7'))  # 1-min load average per core above which speculation is skipped, 0 = no check
+    
     # Hugging Face
     HUGGINGFACE_API_TOKEN = os.environ.get('HUGGINGFACE_API_TOKEN')
     
@@ -29,10 +152,23 @@ class Config:
     
     # ChromaDB
     CHROMADB_PATH = os.environ.get('CHROMADB_PATH') or './data/chroma_db'
+    # Stored vector size, 0 = model default (1536 for text-embedding-3-small). 'api' asks Azure for shorter
+    # vectors (text-embedding-3-*), 'truncate' keeps the first N values and renormalizes locally.
+    # Changing it on an existing collection: python migrate_embeddings.py
+    EMBEDDING_DIMENSIONS = int(os.environ.get('EMBEDDING_DIMENSIONS', '0'))
+    EMBEDDING_DIMENSIONS_MODE = os.environ.get('EMBEDDING_DIMENSIONS_MODE', 'api')
+    SNAPSHOT_DTYPE = os.environ.get('SNAPSHOT_DTYPE', 'float32')  # float32 | float16 (half the size; ChromaDB itself always stores float32)
+    # HNSW index (ChromaDB defaults: M=16, construction_ef=100, search_ef=100). M and construction_ef are fixed
+    # when the index is built (apply to an existing collection: python migrate_embeddings.py); search_ef is
+    # applied at startup. Compare settings: python benchmark_hnsw.py
+    HNSW_M = int(os.environ.get('HNSW_M', '16'))
+    HNSW_CONSTRUCTION_EF = int(os.environ.get('HNSW_CONSTRUCTION_EF', '100'))
+    HNSW_SEARCH_EF = int(os.environ.get('HNSW_SEARCH_EF', '100'))
+    HNSW_WARMUP_QUERIES = int(os.environ.get('HNSW_WARMUP_QUERIES', '3'))  # Searches run when the db service loads, 0 = no warm-up
     
     # OpenWeather API
     OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY')
-    OPENWEATHER_BASE_URL = 'http://api.openweathermap.org/data/2.5'
+    OPENWEATHER_BASE_URL = os.environ.get('OPENWEATHER_BASE_URL') or 'http://api.openweathermap.org/data/2.5'
     
     # Upload settings
     UPLOAD_FOLDER = 'uploads'
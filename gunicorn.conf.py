@@ -0,0 +1,26 @@
+"""Gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker count, request threads and timeouts come from WEB_* in config.py. The app
+is preloaded in the master (see wsgi.py); each forked worker then pins its torch
+threads and loads the remaining services in the background.
+"""
+
+import os
+from config import Config
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+# Thread thay vì process cho request: TTS stream và các lệnh gọi upstream chủ yếu chờ I/O
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = 30
+preload_app = True
+
+def post_fork(server, worker):
+    from app import services
+
+    # Chia các core dành cho TTS giữa các worker thay vì mỗi worker dùng một nửa số core
+    torch_threads = Config.TTS_NUM_THREADS or max(1, (os.cpu_count() or 2) // 2 // server.cfg.workers)
+    services.after_fork(torch_threads)
+    server.log.info(f"Worker {worker.pid}: {torch_threads} torch threads")
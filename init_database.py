@@ -14,8 +14,8 @@ sys.path.insert(0, str(project_root))
 from app.models import ChromaDBManager, DocumentProcessor
 from config import Config
 
-def initialize_database():
-    """Initialize ChromaDB with sample data"""
+def initialize_database(snapshot_dir=None):
+    """Initialize ChromaDB with sample data, or from a snapshot without embedding calls"""
     print("🚀 Initializing Travel AI Assistant Database...")
     
     try:
@@ -28,6 +28,12 @@ def initialize_database():
         
         print("✅ ChromaDB connection established")
         
+        if snapshot_dir:
+            from app.snapshot import describe, import_snapshot
+            manifest = import_snapshot(db_manager, snapshot_dir, replace=True)
+            print(f"✅ Loaded snapshot: {describe(manifest)} in {manifest['import_seconds']}s")
+            return True
+        
         # Process sample data file
         sample_file = project_root / "data" / "sample_travel_data.txt"
         
@@ -114,5 +120,9 @@ def initialize_database():
         return False
 
 if __name__ == "__main__":
-    success = initialize_database()
+    import argparse
+    parser = argparse.ArgumentParser(description="Initialize the ChromaDB knowledge base")
+    parser.add_argument("--snapshot", help="load this snapshot (snapshot_collection.py export) instead of re-embedding")
+    args = parser.parse_args()
+    success = initialize_database(args.snapshot)
     sys.exit(0 if success else 1)
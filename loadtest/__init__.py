@@ -0,0 +1,4 @@
+"""Offline load testing: local stand-ins for Azure OpenAI and OpenWeather plus a traffic driver.
+
+    python -m loadtest.run --duration 30 --concurrency 8 --tiny-tts
+"""
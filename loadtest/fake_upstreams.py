@@ -0,0 +1,348 @@
+"""Local fake Azure OpenAI (chat, vision, embeddings) and OpenWeather servers.
+
+One threaded HTTP server answers every upstream the app talks to, with the same
+URL layout and response shape as the real services, so the app runs unchanged
+with only its endpoints pointed here. Each upstream kind has its own latency
+distribution (log-normal around a median) and error rate, so load tests can
+reproduce slow or flaky dependencies without network access or API quota.
+
+Standalone:
+    python -m loadtest.fake_upstreams --port 9100 --latency llm=800:0.4 --errors weather=0.05:503
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+KINDS = ('llm', 'vision', 'embeddings', 'weather')
+
+# Median (ms) và sigma log-normal, gần với độ trễ thật của từng dịch vụ
+DEFAULT_LATENCY = {
+    'llm': (900, 0.4),
+    'vision': (1800, 0.4),
+    'embeddings': (60, 0.3),
+    'weather': (150, 0.3)
+}
+
+CITIES = {
+    'Hanoi': ('Hà Nội', 'VN', 24),
+    'Ho Chi Minh City': ('Thành phố Hồ Chí Minh', 'VN', 31),
+    'Da Nang': ('Đà Nẵng', 'VN', 28),
+    'Hoi An': ('Hội An', 'VN', 28),
+    'Sapa': ('Sa Pa', 'VN', 16),
+    'Phu Quoc': ('Phú Quốc', 'VN', 30)
+}
+
+TRAVEL_ANSWER = (
+    "Hà Nội là điểm đến tuyệt vời với phố cổ, hồ Hoàn Kiếm và ẩm thực đường phố phong phú. "
+    "Bạn nên thử phở bò, bún chả và cà phê trứng. "
+    "Buổi tối có thể dạo quanh phố đi bộ và xem múa rối nước. "
+    "Thời điểm đẹp nhất để ghé thăm là mùa thu, từ tháng 9 đến tháng 11."
+)
+VISION_ANSWER = "Đây là món phở bò Hà Nội, gồm bánh phở, thịt bò tái và nước dùng hầm xương. Địa điểm: Hà Nội."
+WEATHER_ADVICE = "Trời mát, nên mặc áo khoác mỏng và mang theo ô. Phù hợp đi bộ tham quan phố cổ."
+SUMMARY_ANSWER = "Người dùng đang lên kế hoạch du lịch Hà Nội và quan tâm đến ẩm thực đường phố."
+
+class UpstreamProfile:
+    """Latency and failure behaviour of one fake upstream"""
+
+    def __init__(self, median_ms: float, sigma: float = 0.0, error_rate: float = 0.0, error_status: int = 503):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def sample_delay(self, rng: random.Random) -> float:
+        return self.median_ms / 1000 * math.exp(self.sigma * rng.gauss(0, 1))
+
+    def should_fail(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+    def __repr__(self):
+        return (f"UpstreamProfile(median_ms={self.median_ms}, sigma={self.sigma}, "
+                f"error_rate={self.error_rate}, error_status={self.error_status})")
+
+def parse_profiles(latency: str = '', errors: str = '') -> dict:
+    """Build profiles from 'llm=800:0.4,weather=100' and 'llm=0.02:429,weather=0.1' specs"""
+    profiles = {kind: UpstreamProfile(*DEFAULT_LATENCY[kind]) for kind in KINDS}
+    for item in [x.strip() for x in (latency or '').split(',') if x.strip()]:
+        kind, _, value = item.partition('=')
+        median, _, sigma = value.partition(':')
+        profiles[kind.strip()].median_ms = float(median)
+        if sigma:
+            profiles[kind.strip()].sigma = float(sigma)
+    for item in [x.strip() for x in (errors or '').split(',') if x.strip()]:
+        kind, _, value = item.partition('=')
+        rate, _, status = value.partition(':')
+        profiles[kind.strip()].error_rate = float(rate)
+        if status:
+            profiles[kind.strip()].error_status = int(status)
+    return profiles
+
+def _fake_embedding(text: str, dimensions: int) -> np.ndarray:
+    """Deterministic unit vector per text, so identical queries retrieve identical documents"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def _message_text(message: dict) -> str:
+    content = message.get('content') or ''
+    if isinstance(content, list):
+        return ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content
+
+def _is_vision(messages: list) -> bool:
+    return any(isinstance(m.get('content'), list) and
+               any(isinstance(part, dict) and part.get('type') == 'image_url' for part in m['content'])
+               for m in messages)
+
+def chat_reply(messages: list) -> str:
+    """Pick a plausible answer from the system prompt of each agent call site"""
+    if _is_vision(messages):
+        return VISION_ANSWER
+    system = ' '.join(_message_text(m) for m in messages if m.get('role') == 'system')
+    if 'trích xuất tên thành phố' in system:
+        text = _message_text(messages[-1])
+        for city, (vietnamese_name, _, _) in CITIES.items():
+            if vietnamese_name in text or city in text:
+                return city
+        return 'Hanoi'
+    if 'thông tin thời tiết' in system:
+        return WEATHER_ADVICE
+    if 'Hãy tóm tắt cuộc trò chuyện' in system:
+        return SUMMARY_ANSWER
+    return TRAVEL_ANSWER
+
+def app_env(url: str) -> dict:
+    """Environment variables pointing the app at fake upstreams served from ``url``"""
+    return {
+        'AZURE_OPENAI_ENDPOINT': url,
+        'AZURE_OPENAI_API_KEY': 'fake-key',
+        'AZURE_OPENAI_API_VERSION': '2024-06-01',
+        'AZURE_OPENAI_DEPLOYMENT_NAME': 'fake-chat',
+        'AZURE_OPENAI_EMBEDDING_ENDPOINT': url,
+        'AZURE_OPENAI_EMBEDDING_API_KEY': 'fake-key',
+        'AZURE_OPENAI_EMBEDDING_API_VERSION': '2024-06-01',
+        'AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME': 'fake-embedding',
+        'OPENWEATHER_API_KEY': 'fake-key',
+        'OPENWEATHER_BASE_URL': f"{url}/data/2.5"
+    }
+
+class FakeUpstreams:
+    """Threaded HTTP server standing in for Azure OpenAI and OpenWeather"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, profiles: dict = None,
+                 embedding_dimensions: int = 1536, seed: int = None):
+        self.profiles = profiles or parse_profiles()
+        self.embedding_dimensions = embedding_dimensions
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {kind: {'requests': 0, 'errors': 0, 'delay_seconds': 0.0} for kind in KINDS}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def app_env(self) -> dict:
+        return app_env(self.url)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-upstreams")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                kind: {
+                    'requests': s['requests'],
+                    'errors': s['errors'],
+                    'avg_delay_ms': round(s['delay_seconds'] / s['requests'] * 1000, 1) if s['requests'] else 0.0
+                }
+                for kind, s in self._stats.items()
+            }
+
+    def _simulate(self, kind: str):
+        """Sleep for the profile's latency; return an error status or None"""
+        profile = self.profiles[kind]
+        with self._rng_lock:
+            delay = profile.sample_delay(self._rng)
+            failed = profile.should_fail(self._rng)
+        time.sleep(delay)
+        with self._stats_lock:
+            stats = self._stats[kind]
+            stats['requests'] += 1
+            stats['delay_seconds'] += delay
+            if failed:
+                stats['errors'] += 1
+        return profile.error_status if failed else None
+
+    def _chat_completion(self, body: dict):
+        messages = body.get('messages', [])
+        kind = 'vision' if _is_vision(messages) else 'llm'
+        error = self._simulate(kind)
+        if error:
+            return kind, error, {'error': {'code': str(error), 'message': f'Simulated {kind} failure'}}
+
+        reply = chat_reply(messages)
+        prompt_tokens = sum(len(_message_text(m)) for m in messages) // 4
+        return kind, 200, {
+            'id': f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'gpt-fake',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': reply},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(reply) // 4,
+                'total_tokens': prompt_tokens + len(reply) // 4
+            }
+        }
+
+    def _embeddings(self, body: dict):
+        error = self._simulate('embeddings')
+        if error:
+            return 'embeddings', error, {'error': {'code': str(error), 'message': 'Simulated embeddings failure'}}
+
+        inputs = body.get('input', [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = body.get('dimensions') or self.embedding_dimensions
+        data = []
+        for index, text in enumerate(inputs):
+            vector = _fake_embedding(str(text), dimensions)
+            # openai>=1 gửi encoding_format=base64 mặc định và tự giải mã
+            if body.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({'object': 'embedding', 'index': index, 'embedding': embedding})
+        tokens = sum(len(str(text)) for text in inputs) // 4
+        return 'embeddings', 200, {
+            'object': 'list',
+            'data': data,
+            'model': 'text-embedding-fake',
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+        }
+
+    def _weather(self, query: dict):
+        error = self._simulate('weather')
+        if error:
+            return 'weather', error, {'cod': error, 'message': 'Simulated weather failure'}
+
+        city = (query.get('q') or ['Hanoi'])[0]
+        name, country, temperature = CITIES.get(city, (city, 'VN', 26))
+        return 'weather', 200, {
+            'name': name,
+            'sys': {'country': country},
+            'main': {'temp': temperature, 'feels_like': temperature + 2, 'humidity': 70},
+            'weather': [{'description': 'mây rải rác'}],
+            'wind': {'speed': 3.1},
+            'cod': 200
+        }
+
+    def _make_handler(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive như dịch vụ thật
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status in (429, 503):
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._send(400, {'error': {'message': 'Invalid JSON'}})
+                    return
+
+                path = urlparse(self.path).path
+                if re.fullmatch(r'/openai/deployments/[^/]+/chat/completions', path):
+                    _, status, payload = upstreams._chat_completion(body)
+                elif re.fullmatch(r'/openai/deployments/[^/]+/embeddings', path):
+                    _, status, payload = upstreams._embeddings(body)
+                else:
+                    status, payload = 404, {'error': {'message': f'Unknown path {path}'}}
+                self._send(status, payload)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == '/data/2.5/weather':
+                    _, status, payload = upstreams._weather(parse_qs(parsed.query))
+                elif parsed.path == '/stats':
+                    status, payload = 200, upstreams.stats()
+                else:
+                    status, payload = 404, {'message': f'Unknown path {parsed.path}'}
+                self._send(status, payload)
+
+            def log_message(self, format, *args):
+                pass  # Không in mỗi request khi chạy tải
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="", help="per upstream median_ms[:sigma], e.g. llm=800:0.4,weather=100")
+    parser.add_argument("--errors", default="", help="per upstream rate[:status], e.g. llm=0.02:429,weather=0.1")
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    fake = FakeUpstreams(args.host, args.port, parse_profiles(args.latency, args.errors),
+                         args.embedding_dimensions, args.seed)
+    print(f"🧪 Fake upstreams on {fake.url}")
+    for kind, profile in fake.profiles.items():
+        print(f"  {kind:<10} {profile}")
+    print("\nPoint the app here with:")
+    for key, value in fake.app_env().items():
+        print(f"  export {key}={value}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
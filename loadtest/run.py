@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Drive mixed chat / image / TTS traffic at the app and report per-endpoint latency
+
+Starts the fake upstreams and the app (``loadtest.serve``) as a separate
+process, then runs N virtual users for a fixed duration. Each user keeps its own
+session (cookie), picks a request type by the --mix weights and sends it as soon
+as the previous one finishes (plus optional think time). Reports requests/sec,
+p50/p95/p99 latency, error rate and status codes per endpoint, and how often each
+fake upstream was called.
+
+Usage:
+    python -m loadtest.run --tiny-tts                                 # offline, defaults
+    python -m loadtest.run --concurrency 16 --duration 60 --mix text=60,image=20,tts=20
+    python -m loadtest.run --latency llm=2000:0.5 --errors llm=0.05:429,weather=0.2
+    python -m loadtest.run --target http://127.0.0.1:8000             # app already running
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+from loadtest.fake_upstreams import FakeUpstreams, parse_profiles
+
+ENDPOINTS = {
+    'text': 'POST /api/chat',
+    'image': 'POST /api/chat (image)',
+    'tts': 'POST /api/tts'
+}
+
+QUESTIONS = [
+    "Hà Nội có món ăn nào ngon?",
+    "Gợi ý lịch trình 3 ngày ở Đà Nẵng",
+    "Nên đi Sa Pa vào tháng mấy?",
+    "Quán phở nào ngon ở phố cổ?",
+    "Hội An buổi tối có gì chơi?",
+    "Ở Phú Quốc nên ở khu nào?",
+    "Chợ Bến Thành mở cửa đến mấy giờ?"
+]
+
+TTS_TEXTS = [
+    "Xin chào! Hôm nay trời Hà Nội rất đẹp.",
+    "Bạn nên thử phở bò, bún chả và cà phê trứng.",
+    "Phố cổ Hội An đẹp nhất vào đêm rằm với đèn lồng.",
+    "Thời điểm đẹp nhất để ghé thăm là mùa thu."
+]
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for item in [x.strip() for x in spec.split(',') if x.strip()]:
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown request type '{kind}' (expected one of {', '.join(ENDPOINTS)})")
+        mix[kind.strip()] = float(weight or 1)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+def make_jpeg(rng: random.Random, size=(640, 480)) -> bytes:
+    """Photo-sized JPEG with random colours, so every upload is a distinct image"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse([x, y, x + rng.randrange(40, 200), y + rng.randrange(40, 200)],
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+def send(session: requests.Session, url: str, kind: str, rng: random.Random, timeout: float):
+    if kind == 'text':
+        return session.post(f"{url}/api/chat", json={'message': rng.choice(QUESTIONS)}, timeout=timeout)
+    if kind == 'image':
+        files = {'image': ('photo.jpg', make_jpeg(rng), 'image/jpeg')}
+        return session.post(f"{url}/api/chat", data={'message': 'Đây là món gì, ăn ở đâu?'},
+                            files=files, timeout=timeout)
+    return session.post(f"{url}/api/tts", json={'text': rng.choice(TTS_TEXTS)},
+                        headers={'Accept': 'audio/wav'}, timeout=timeout)
+
+def drive(url: str, mix: dict, concurrency: int, duration: float, think_ms: float = 0,
+          timeout: float = 120, seed: int = None) -> dict:
+    """Run virtual users until the deadline; return {kind: [(status, seconds), ...]} and elapsed"""
+    samples = {kind: [] for kind in mix}
+    lock = threading.Lock()
+    kinds, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+
+    def user(index: int):
+        rng = random.Random(None if seed is None else seed + index)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = send(session, url, kind, rng, timeout).status_code
+            except requests.RequestException:
+                status = 0  # Timeout / kết nối lỗi
+            with lock:
+                samples[kind].append((status, time.perf_counter() - start))
+            if think_ms:
+                time.sleep(rng.expovariate(1000 / think_ms))
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {'samples': samples, 'elapsed': time.perf_counter() - start}
+
+def _percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)] * 1000, 1)
+
+def summarize(result: dict) -> dict:
+    report = {}
+    for kind, samples in result['samples'].items():
+        latencies = sorted(seconds for _, seconds in samples)
+        statuses = {}
+        for status, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for status, _ in samples if status != 200)
+        report[ENDPOINTS[kind]] = {
+            'requests': len(samples),
+            'rps': round(len(samples) / result['elapsed'], 2),
+            'p50_ms': _percentile(latencies, 0.5),
+            'p95_ms': _percentile(latencies, 0.95),
+            'p99_ms': _percentile(latencies, 0.99),
+            'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+            'statuses': statuses
+        }
+    return report
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(url: str, timeout: float, process=None) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            if requests.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+def print_report(report: dict, upstream_stats: dict = None):
+    print(f"\n{'endpoint':<24} {'requests':>8} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}  statuses")
+    for endpoint, r in report.items():
+        print(f"{endpoint:<24} {r['requests']:>8} {r['rps']:>7} {str(r['p50_ms']):>9} {str(r['p95_ms']):>9} "
+              f"{str(r['p99_ms']):>9} {r['error_rate']:>7.1%}  {r['statuses']}")
+    if upstream_stats:
+        print("\nFake upstreams")
+        for kind, s in upstream_stats.items():
+            print(f"  {kind:<10} {s['requests']:>6} calls   {s['errors']:>4} injected errors   avg delay {s['avg_delay_ms']} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of traffic")
+    parser.add_argument("--mix", default="text=70,image=15,tts=15", help="request type weights")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--latency", default="", help="fake upstream median_ms[:sigma], e.g. llm=800:0.4")
+    parser.add_argument("--errors", default="", help="fake upstream error rate[:status], e.g. llm=0.02:429")
+    parser.add_argument("--tiny-tts", action="store_true", help="use a small random-weight TTS model (offline)")
+    parser.add_argument("--target", help="load an already running app instead of starting one")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request client timeout")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    print("🚦 Load test: " + ", ".join(f"{ENDPOINTS[k]} x{w:g}" for k, w in mix.items()))
+    print("=" * 70)
+
+    fake, process, data_dir = None, None, None
+    try:
+        if args.target:
+            url = args.target.rstrip('/')
+        else:
+            fake = FakeUpstreams(profiles=parse_profiles(args.latency, args.errors), seed=args.seed).start()
+            data_dir = tempfile.mkdtemp(prefix="loadtest-")
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            command = [sys.executable, '-m', 'loadtest.serve', '--port', str(port),
+                       '--upstreams', fake.url, '--data-dir', data_dir] + (['--tiny-tts'] if args.tiny_tts else [])
+            log_path = os.path.join(data_dir, 'server.log')
+            with open(log_path, 'w') as log:
+                process = subprocess.Popen(command, cwd=project_root, stdout=log, stderr=subprocess.STDOUT)
+            print(f"Fake upstreams {fake.url}, app {url}, server log {log_path}")
+
+        if not wait_until_ready(url, args.startup_timeout, process):
+            print(f"❌ App at {url} did not become ready")
+            if process is not None:
+                with open(os.path.join(data_dir, 'server.log')) as f:
+                    print(f.read()[-3000:])
+            return 1
+
+        result = drive(url, mix, args.concurrency, args.duration, args.think_ms, args.timeout, args.seed)
+        report = {
+            'config': {'concurrency': args.concurrency, 'duration': args.duration, 'mix': mix,
+                       'latency': args.latency, 'errors': args.errors},
+            'endpoints': summarize(result)
+        }
+        if fake is not None:
+            report['upstreams'] = fake.stats()
+        print_report(report['endpoints'], report.get('upstreams'))
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        return 0
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if fake is not None:
+            fake.stop()
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Run the Flask app against fake upstreams, with throwaway data directories.
+
+Environment is set before the app (and Config) is imported. Used by
+``loadtest.run``; can also be started by hand next to ``loadtest.fake_upstreams``:
+
+    python -m loadtest.serve --port 5055 --upstreams http://127.0.0.1:9100 --tiny-tts
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from loadtest.fake_upstreams import app_env
+
+SEED_DOCUMENTS = [
+    "Phở bò Hà Nội: quán Phở Thìn, 13 Lò Đúc, Hai Bà Trưng, Hà Nội. Mở cửa 6h-21h.",
+    "Bún chả Hương Liên, 24 Lê Văn Hưu, Hà Nội, nổi tiếng từ khi Tổng thống Obama ghé thăm.",
+    "Phố cổ Hội An là di sản văn hóa thế giới, đẹp nhất vào đêm rằm với đèn lồng.",
+    "Bà Nà Hills ở Đà Nẵng có Cầu Vàng và khu làng Pháp, nên đi cáp treo buổi sáng.",
+    "Chợ Bến Thành, Quận 1, Thành phố Hồ Chí Minh, có khu ẩm thực mở cửa đến tối.",
+    "Sa Pa có ruộng bậc thang Mường Hoa và đỉnh Fansipan, mùa lúa chín vào tháng 9.",
+    "Phú Quốc nổi tiếng với Bãi Sao, chợ đêm Dương Đông và nước mắm truyền thống."
+]
+
+def configure_environment(upstreams_url: str, data_dir: str, tiny_tts: bool):
+    os.environ.update(app_env(upstreams_url))
+    # Không dùng cache: mỗi request phải đi tới upstream giả như khi cache miss
+    for key, value in {
+        'CHROMADB_PATH': os.path.join(data_dir, 'chroma_db'),
+        'LLM_CACHE_ENABLED': 'false',
+        'LLM_CACHE_PATH': os.path.join(data_dir, 'llm_cache.db'),
+        'IMAGE_CACHE_ENABLED': 'false',
+        'IMAGE_CACHE_PATH': os.path.join(data_dir, 'image_cache.db'),
+        'TTS_CACHE_ENABLED': 'false',
+        'SESSION_STORE_SQLITE_PATH': os.path.join(data_dir, 'sessions.db'),
+        'SERVICES_WARMUP': 'db,agent' if tiny_tts else 'db,agent,tts'
+    }.items():
+        os.environ.setdefault(key, value)
+
+def create_loadtest_app(tiny_tts: bool = False):
+    from app import create_app, services
+
+    app = create_app(warm_up=False)
+    if tiny_tts:
+        from app.testing import build_tiny_tts
+        services.set_service('tts', build_tiny_tts())
+
+    db_manager = services.get_db_manager()
+    if db_manager.collection.count() == 0:
+        db_manager.add_documents(SEED_DOCUMENTS, [{"source": "loadtest"} for _ in SEED_DOCUMENTS])
+    services.warm_up()
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--upstreams", default="http://127.0.0.1:9100", help="fake upstreams base URL")
+    parser.add_argument("--data-dir", help="ChromaDB/cache directory (default: new temp dir)")
+    parser.add_argument("--tiny-tts", action="store_true", help="use a small random-weight TTS model (offline)")
+    args = parser.parse_args()
+
+    # Thư mục tạm do serve tạo thì serve xóa khi dừng; --data-dir của người gọi thì giữ lại
+    own_dir = None if args.data_dir else tempfile.mkdtemp(prefix="loadtest-")
+    data_dir = args.data_dir or own_dir
+    # SIGTERM (loadtest.run dừng server) -> SystemExit để khối finally vẫn chạy
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        configure_environment(args.upstreams, data_dir, args.tiny_tts)
+        app = create_loadtest_app(args.tiny_tts)
+
+        from werkzeug.serving import make_server
+        server = make_server(args.host, args.port, app, threaded=True)
+        print(f"[LOADTEST] Serving on http://{args.host}:{args.port} (data in {data_dir})", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    finally:
+        if own_dir:
+            shutil.rmtree(own_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Rebuild the travel_knowledge collection in place, at a new embedding dimension
+or with new HNSW_M / HNSW_CONSTRUCTION_EF settings
+
+Shrinking (e.g. 1536 -> 512) makes no embedding calls: text-embedding-3 vectors
+are cut to the new size and renormalized, which is what the API returns when
+asked for that many dimensions. Growing them, or moving to another model, needs
+--reembed (one embedding call per document). The current collection is saved
+as a snapshot first and put back if the rebuild fails.
+
+Set EMBEDDING_DIMENSIONS to the same value afterwards so queries match.
+Without --dimensions the vectors keep their size and only the index is rebuilt.
+
+Usage:
+    python migrate_embeddings.py                    # rebuild the index with the current HNSW settings
+    python migrate_embeddings.py --dimensions 512
+    python migrate_embeddings.py --dimensions 1536 --reembed
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from app.snapshot import BATCH_SIZE, DOCUMENTS_FILE, SnapshotError, export_snapshot, import_snapshot
+
+def _reembed(db_manager, backup_dir: str, dimensions: int):
+    with open(os.path.join(backup_dir, DOCUMENTS_FILE), encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    # Embedding hết trước khi xóa collection, lỗi giữa chừng không làm mất dữ liệu
+    db_manager.embedding_dimensions = dimensions
+    embeddings = []
+    for i, record in enumerate(records, 1):
+        embeddings.append(db_manager._create_embedding(record['document']))
+        if i % 100 == 0:
+            print(f"  {i}/{len(records)} documents embedded")
+
+    collection = db_manager.reset_collection()
+    for offset in range(0, len(records), BATCH_SIZE):
+        batch = records[offset:offset + BATCH_SIZE]
+        collection.upsert(
+            ids=[r['id'] for r in batch],
+            documents=[r['document'] for r in batch],
+            metadatas=[r['metadata'] for r in batch],
+            embeddings=embeddings[offset:offset + BATCH_SIZE]
+        )
+
+def migrate(db_manager, dimensions: int, backup_dir: str, reembed: bool = False) -> int:
+    """Rebuild the collection with ``dimensions``-long vectors; returns the previous size"""
+    current = db_manager.stored_dimensions()
+    if current is None:
+        raise SnapshotError("Collection is empty, nothing to migrate")
+    if dimensions > current and not reembed:
+        raise SnapshotError(f"Vectors have {current} dimensions; growing to {dimensions} needs --reembed")
+
+    export_snapshot(db_manager, backup_dir, dtype='float32')
+    try:
+        if reembed:
+            _reembed(db_manager, backup_dir, dimensions)
+        else:
+            import_snapshot(db_manager, backup_dir, replace=True, dimensions=dimensions)
+    except Exception:
+        print(f"❌ Migration failed, restoring the collection from {backup_dir}")
+        import_snapshot(db_manager, backup_dir, replace=True, dimensions=current)
+        raise
+    db_manager.embedding_dimensions = dimensions
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimensions", type=int, default=Config.EMBEDDING_DIMENSIONS or None,
+                        help="new vector size (default EMBEDDING_DIMENSIONS, else the current size)")
+    parser.add_argument("--reembed", action="store_true", help="embed every document again through Azure")
+    parser.add_argument("--backup", default=None,
+                        help="snapshot of the current collection (default data/snapshots/pre_migration_<time>)")
+    args = parser.parse_args()
+
+    backup_dir = args.backup or str(project_root / "data" / "snapshots" / time.strftime("pre_migration_%Y%m%d_%H%M%S"))
+
+    from app.models import ChromaDBManager
+    db_manager = ChromaDBManager()
+    count = db_manager.collection.count()
+    args.dimensions = args.dimensions or db_manager.stored_dimensions()
+    if not args.dimensions:
+        print("❌ Collection is empty, nothing to migrate")
+        return 1
+
+    print(f"🔧 Migrating {count} documents to {args.dimensions} dimensions, HNSW M={Config.HNSW_M} "
+          f"construction_ef={Config.HNSW_CONSTRUCTION_EF} (backup: {backup_dir})")
+    start = time.perf_counter()
+    try:
+        previous = migrate(db_manager, args.dimensions, backup_dir, args.reembed)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {previous} -> {args.dimensions} dimensions in {elapsed:.1f}s, "
+          f"vectors {count * previous * 4 / 1e6:.1f} MB -> {count * args.dimensions * 4 / 1e6:.1f} MB")
+    if (Config.EMBEDDING_DIMENSIONS or previous) != args.dimensions:
+        print(f"⚠️ Set EMBEDDING_DIMENSIONS={args.dimensions} before starting the app, queries must use the same size")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -49,7 +49,7 @@ try:
     if len(audio.shape) == 1:
         audio = audio.reshape(-1, 1)
     
-    sf.write("quick_test.wav", audio, 22050)
+    sf.write("quick_test.wav", audio, model.config.sampling_rate)
     print("💾 Saved to: quick_test.wav")
     
     print("\n🎯 All tests passed!")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Replay recorded chat requests (TRACE_ENABLED=true) against the current code
+
+Every LLM, vision, embedding and OpenWeather call is answered from the trace, so
+nothing leaves the machine and the same traffic can be re-run before and after a
+change. ChromaDB retrieval and everything else local runs for real. A call whose
+prompt changed is answered by the next recorded call from the same site
+("fallback"); a call that was never recorded fails ("missing").
+
+Reports, per stage and in total, recorded vs replayed latency, plus how many
+answers and retrieved document IDs still match the recording. Replayed latency
+excludes upstream time unless --with-latency sleeps for each recorded call.
+
+Usage:
+    python replay_traces.py data/request_traces.jsonl
+    python replay_traces.py traces.jsonl --with-latency --concurrency 4 --output replayed.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+# Replay không bao giờ gọi dịch vụ thật; client vẫn cần cấu hình để khởi tạo
+for key, value in {
+    'AZURE_OPENAI_ENDPOINT': 'http://127.0.0.1:9',
+    'AZURE_OPENAI_API_KEY': 'replay',
+    'AZURE_OPENAI_API_VERSION': '2024-06-01',
+    'AZURE_OPENAI_EMBEDDING_ENDPOINT': 'http://127.0.0.1:9',
+    'AZURE_OPENAI_EMBEDDING_API_KEY': 'replay',
+    'AZURE_OPENAI_EMBEDDING_API_VERSION': '2024-06-01',
+    'OPENWEATHER_API_KEY': 'replay'
+}.items():
+    os.environ.setdefault(key, value)
+
+from config import Config
+
+# Cache cục bộ sẽ che mất các lệnh gọi đã ghi; tóm tắt nền không thuộc request nào
+Config.TRACE_ENABLED = False
+Config.LLM_CACHE_ENABLED = False
+Config.IMAGE_CACHE_ENABLED = False
+Config.CHAT_HISTORY_SUMMARY_ENABLED = False
+
+from app.tracing import RequestTrace, activate, read_traces
+
+class ReplayTrace(RequestTrace):
+    """Replaying trace that optionally waits as long as each recorded call took"""
+
+    def __init__(self, recording: dict, with_latency: bool = False):
+        super().__init__(recording)
+        self.with_latency = with_latency
+
+    def _replay(self, upstream, site, key):
+        call = super()._replay(upstream, site, key)
+        if self.with_latency and call.get('ms'):
+            time.sleep(call['ms'] / 1000)
+        return call
+
+def replay_one(agent, recording: dict, with_latency: bool = False) -> dict:
+    inputs = recording['inputs']
+    image = inputs.get('image')
+    trace = ReplayTrace(recording, with_latency)
+    try:
+        # process_query ghi inputs/outputs/lỗi vào trace đang active
+        with activate(trace):
+            # Trace chỉ giữ hash của ảnh: gửi ảnh giả cùng kích thước, vision trả lời từ bản ghi
+            agent.process_query(
+                inputs['query'],
+                b'\0' * image['bytes'] if image else None,
+                list(inputs.get('chat_history') or []),
+                history_summary=inputs.get('history_summary', ''),
+                image_type=image['type'] if image else None,
+                image_normalized=True,
+                last_retrieval=inputs.get('last_retrieval'),
+                # Bỏ qua đúng các bước đã bị bỏ qua lúc ghi, không áp hạn chót
+                deadline=float('inf'),
+                skip_stages=(recording.get('outputs') or {}).get('skipped_stages')
+            )
+    except Exception:
+        pass
+    trace.inputs = inputs
+    result = trace.to_dict()
+    result['replay'] = trace.replay_stats
+    return result
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(len(values) * q), len(values) - 1)], 1)
+
+def compare(recordings: list, replays: list) -> dict:
+    stage_names = []
+    for trace in recordings + replays:
+        for stage in trace['stages']:
+            if stage['name'] not in stage_names:
+                stage_names.append(stage['name'])
+
+    def stage_ms(traces, name):
+        return [s['ms'] for t in traces for s in t['stages'] if s['name'] == name]
+
+    latency = {}
+    for name in stage_names + ['total']:
+        recorded = [t['total_ms'] for t in recordings] if name == 'total' else stage_ms(recordings, name)
+        replayed = [t['total_ms'] for t in replays] if name == 'total' else stage_ms(replays, name)
+        latency[name] = {
+            'recorded_p50_ms': _percentile(recorded, 0.5),
+            'recorded_p95_ms': _percentile(recorded, 0.95),
+            'replayed_p50_ms': _percentile(replayed, 0.5),
+            'replayed_p95_ms': _percentile(replayed, 0.95)
+        }
+
+    pairs = [(r, p) for r, p in zip(recordings, replays) if not r.get('error')]
+    calls = {'exact': 0, 'fallback': 0, 'missing': 0}
+    for replay in replays:
+        for key in calls:
+            calls[key] += replay['replay'][key]
+    return {
+        'requests': len(replays),
+        'errors': sum(1 for p in replays if p.get('error')),
+        'same_response': sum(1 for r, p in pairs if r['outputs'].get('response') == p['outputs'].get('response')),
+        'same_retrieval': sum(1 for r, p in pairs if r['outputs'].get('retrieved_ids') == p['outputs'].get('retrieved_ids')),
+        'compared': len(pairs),
+        'calls': calls,
+        'latency': latency
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="?", default=None, help="trace file (default: TRACE_PATH)")
+    parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--with-latency", action="store_true", help="sleep for each recorded upstream call's duration")
+    parser.add_argument("--output", help="write replayed traces here (JSONL) for later comparison")
+    args = parser.parse_args()
+
+    path = args.traces or Config.TRACE_PATH
+    recordings = [t for t in read_traces(path) if t.get('inputs')]
+    if args.limit:
+        recordings = recordings[:args.limit]
+    if not recordings:
+        print(f"❌ No traces in {path}")
+        return 1
+
+    from app.ai_agent import TravelAIAgent
+
+    print(f"🔁 Replaying {len(recordings)} requests from {path}")
+    print("=" * 70)
+    agent = TravelAIAgent()
+
+    def run(recording):
+        result = replay_one(agent, recording, args.with_latency)
+        if result.get('error'):
+            print(f"  ⚠️ {recording['trace_id'][:12]}: {result['error']}")
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        replays = list(executor.map(run, recordings))
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for replay in replays:
+                f.write(json.dumps(replay, ensure_ascii=False, default=str) + '\n')
+
+    report = compare(recordings, replays)
+    print(f"\nReplayed {report['requests']} requests in {elapsed:.2f}s, {report['errors']} errors")
+    print(f"Same answer: {report['same_response']}/{report['compared']}   "
+          f"same retrieved docs: {report['same_retrieval']}/{report['compared']}")
+    calls = report['calls']
+    print(f"Upstream calls: {calls['exact']} exact, {calls['fallback']} fallback, {calls['missing']} missing")
+    print(f"\n{'stage':<20} {'recorded p50':>13} {'p95':>9} {'replayed p50':>13} {'p95':>9}")
+    for name, s in report['latency'].items():
+        print(f"{name:<20} {str(s['recorded_p50_ms']):>13} {str(s['recorded_p95_ms']):>9} "
+              f"{str(s['replayed_p50_ms']):>13} {str(s['replayed_p95_ms']):>9}")
+    if not args.with_latency:
+        print("\n(replayed times exclude upstream latency; use --with-latency to include it)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
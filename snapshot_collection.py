@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Export / import the travel_knowledge collection as a portable snapshot
+
+A snapshot holds the stored embeddings (.npy), documents and metadata (JSONL)
+and a manifest with checksums and the embedding model, so a new node can load
+the knowledge base in seconds without re-embedding anything through Azure.
+
+Usage:
+    python snapshot_collection.py export data/snapshots/travel_knowledge
+    python snapshot_collection.py export data/snapshots/travel_knowledge --dtype float16
+    python snapshot_collection.py import data/snapshots/travel_knowledge --replace
+    python snapshot_collection.py verify data/snapshots/travel_knowledge
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.snapshot import SnapshotError, describe, export_snapshot, import_snapshot, verify_snapshot
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("export", "import", "verify"))
+    parser.add_argument("directory", help="snapshot directory")
+    parser.add_argument("--dtype", choices=("float32", "float16"), help="export: vector precision (default SNAPSHOT_DTYPE)")
+    parser.add_argument("--replace", action="store_true", help="import: empty the collection first")
+    parser.add_argument("--allow-model-mismatch", action="store_true",
+                        help="import: accept vectors from a different embedding model")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "verify":
+            print(f"✅ Snapshot OK: {describe(verify_snapshot(args.directory))}")
+            return 0
+
+        from app.models import ChromaDBManager
+        db_manager = ChromaDBManager()
+
+        if args.command == "export":
+            manifest = export_snapshot(db_manager, args.directory, dtype=args.dtype)
+            print(f"✅ Exported {describe(manifest)} to {args.directory}")
+        else:
+            manifest = import_snapshot(db_manager, args.directory, replace=args.replace,
+                                       allow_model_mismatch=args.allow_model_mismatch)
+            print(f"✅ Imported {describe(manifest)} in {manifest['import_seconds']}s "
+                  f"(collection now has {db_manager.collection.count()} documents)")
+        return 0
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
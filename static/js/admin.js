@@ -9,8 +9,12 @@ class AdminInterface {
         this.uploadStatus = document.getElementById('uploadStatus');
         this.statusMessage = document.getElementById('statusMessage');
         this.uploadProgress = document.getElementById('uploadProgress');
+        this.ttsWarmTexts = document.getElementById('ttsWarmTexts');
+        this.ttsWarmButton = document.getElementById('ttsWarmButton');
+        this.ttsCacheStats = document.getElementById('ttsCacheStats');
         
         this.initializeEventListeners();
+        this.loadTTSCacheStats();
     }
     
     initializeEventListeners() {
@@ -20,6 +24,9 @@ class AdminInterface {
         // Form submission
         this.uploadForm.addEventListener('submit', (e) => this.handleUpload(e));
         
+        // TTS cache warm-up
+        this.ttsWarmButton.addEventListener('click', () => this.warmTTSCache());
+        
         // Drag and drop support
         const fileInputLabel = this.fileInput.nextElementSibling;
         
@@ -146,6 +153,58 @@ class AdminInterface {
         }
     }
     
+    async warmTTSCache() {
+        const texts = this.ttsWarmTexts.value
+            .split('\n')
+            .map(line => line.trim())
+            .filter(line => line.length > 0);
+        
+        this.ttsWarmButton.disabled = true;
+        
+        try {
+            const response = await fetch('/api/tts_cache/warm', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ texts: texts })
+            });
+            
+            const data = await response.json();
+            
+            if (response.ok) {
+                this.showStatus('success', `Đang tạo âm thanh cho ${data.texts} câu trả lời`);
+                this.ttsWarmTexts.value = '';
+                setTimeout(() => this.loadTTSCacheStats(), 5000);
+            } else {
+                this.showStatus('error', data.error || 'Không thể làm nóng cache TTS');
+            }
+        } catch (error) {
+            console.error('TTS warm error:', error);
+            this.showStatus('error', 'Không thể kết nối đến máy chủ. Vui lòng thử lại.');
+        } finally {
+            this.ttsWarmButton.disabled = false;
+        }
+    }
+    
+    async loadTTSCacheStats() {
+        try {
+            const response = await fetch('/api/cache_stats');
+            const data = await response.json();
+            const stats = data.tts;
+            
+            if (stats) {
+                const hitRate = Math.round(stats.hit_rate * 100);
+                this.ttsCacheStats.textContent =
+                    `Tỷ lệ hit: ${hitRate}% · Bộ nhớ: ${stats.memory_entries} mục (${this.formatFileSize(stats.memory_bytes)}) · Đĩa: ${this.formatFileSize(stats.disk_bytes)}`;
+            } else {
+                this.ttsCacheStats.textContent = 'Cache TTS đang tắt';
+            }
+        } catch (error) {
+            console.error('TTS cache stats error:', error);
+        }
+    }
+    
     showProgress() {
         this.uploadProgress.style.display = 'block';
         
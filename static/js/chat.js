@@ -36,7 +36,7 @@ class ChatInterface {
     
     updateSendButton() {
         const hasMessage = this.messageInput.value.trim().length > 0;
-        const hasImage = this.currentImageData !== null && this.currentImageData.data;
+        const hasImage = this.currentImageData !== null;
         this.sendButton.disabled = !hasMessage && !hasImage;
     }
     
@@ -63,10 +63,13 @@ class ChatInterface {
             // Resize image with max dimension 512px
             const resizedImageData = await this.resizeImage(file, 512);
             
+            // Xem trước bằng object URL, không cần base64
+            const previewUrl = URL.createObjectURL(resizedImageData.blob);
+            
             this.currentImageData = {
-                data: resizedImageData.base64,
+                previewUrl: previewUrl,
                 name: file.name,
-                type: file.type,
+                type: resizedImageData.blob.type || file.type,
                 originalSize: {
                     width: resizedImageData.originalWidth,
                     height: resizedImageData.originalHeight
@@ -77,8 +80,12 @@ class ChatInterface {
                 }
             };
             
+            // Upload ảnh nhị phân một lần ngay khi chọn, khi gửi tin nhắn chỉ cần image_id
+            this.currentImageData.upload = this.uploadImage(resizedImageData.blob, file.name);
+            this.currentImageData.upload.catch((error) => console.error('Image upload error:', error));
+            
             // Show preview with resized image
-            this.previewImage.src = `data:${file.type};base64,${resizedImageData.base64}`;
+            this.previewImage.src = previewUrl;
             this.imagePreview.style.display = 'flex';
             
             this.updateSendButton();
@@ -96,6 +103,22 @@ class ChatInterface {
         }
     }
     
+    async uploadImage(blob, filename) {
+        const formData = new FormData();
+        formData.append('image', blob, filename);
+        
+        const response = await fetch('/api/image_upload', {
+            method: 'POST',
+            body: formData
+        });
+        const data = await response.json();
+        
+        if (data.status !== 'success') {
+            throw new Error(data.error || 'Image upload failed');
+        }
+        return data.image_id;
+    }
+    
     convertFileToBase64(file) {
         return new Promise((resolve, reject) => {
             const reader = new FileReader();
@@ -137,21 +160,19 @@ class ChatInterface {
                 // Draw and resize image
                 ctx.drawImage(img, 0, 0, width, height);
                 
-                // Convert to base64
+                // Giữ ảnh dạng Blob nhị phân để upload multipart
                 canvas.toBlob((blob) => {
-                    const reader = new FileReader();
-                    reader.onload = () => {
-                        const base64 = reader.result.split(',')[1];
-                        resolve({
-                            base64: base64,
-                            width: width,
-                            height: height,
-                            originalWidth: img.width,
-                            originalHeight: img.height
-                        });
-                    };
-                    reader.onerror = reject;
-                    reader.readAsDataURL(blob);
+                    if (!blob) {
+                        reject(new Error('Canvas export failed'));
+                        return;
+                    }
+                    resolve({
+                        blob: blob,
+                        width: width,
+                        height: height,
+                        originalWidth: img.width,
+                        originalHeight: img.height
+                    });
                 }, file.type, 0.9); // 90% quality
             };
             
@@ -160,7 +181,10 @@ class ChatInterface {
         });
     }
     
-    clearImage() {
+    clearImage(revokePreview = true) {
+        if (revokePreview && this.currentImageData && this.currentImageData.previewUrl) {
+            URL.revokeObjectURL(this.currentImageData.previewUrl);
+        }
         this.currentImageData = null;
         this.imagePreview.style.display = 'none';
         this.imageInput.value = '';
@@ -169,7 +193,7 @@ class ChatInterface {
     
     async sendMessage() {
         const message = this.messageInput.value.trim();
-        const hasImage = this.currentImageData !== null && this.currentImageData.data;
+        const hasImage = this.currentImageData !== null;
         
         if (!message && !hasImage) return;
         
@@ -179,18 +203,20 @@ class ChatInterface {
         // Add user message to chat
         this.addMessage(message || '[Hình ảnh]', 'user', imageDataToSend);
         
-        // Clear input
+        // Clear input (giữ preview URL vì ảnh vẫn hiển thị trong khung chat)
         this.messageInput.value = '';
-        this.clearImage();
+        this.clearImage(false);
         this.updateSendButton();
         
         try {
             this.showLoading(true, 'Đang xử lý tin nhắn...');
             
+            // Ảnh đã được upload nhị phân khi chọn, chỉ gửi kèm image_id
+            const imageId = imageDataToSend ? await imageDataToSend.upload : null;
+            
             const requestData = {
                 message: message,
-                image_data: imageDataToSend ? imageDataToSend.data : null,
-                image_type: imageDataToSend ? imageDataToSend.type : null
+                image_id: imageId
             };
             
             const response = await fetch('/api/chat', {
@@ -206,7 +232,7 @@ class ChatInterface {
             if (data.status === 'success') {
                 this.addMessage(data.response, 'bot');
             } else {
-                this.showError(data.message || 'Có lỗi xảy ra khi xử lý tin nhắn.');
+                this.showError(data.error || data.message || 'Có lỗi xảy ra khi xử lý tin nhắn.');
             }
             
         } catch (error) {
@@ -229,7 +255,7 @@ class ChatInterface {
             const imageContainer = document.createElement('div');
             imageContainer.className = 'message-image';
             const img = document.createElement('img');
-            img.src = `data:${imageData.type};base64,${imageData.data}`;
+            img.src = imageData.previewUrl;
             img.alt = 'Uploaded image';
             imageContainer.appendChild(img);
             messageContent.appendChild(imageContainer);
@@ -327,6 +353,25 @@ class ChatInterface {
     }
     
     async playTTS(text) {
+        // Phát ngay khi câu đầu tiên được tổng hợp, nếu trình duyệt hỗ trợ
+        if ((window.AudioContext || window.webkitAudioContext) && window.ReadableStream) {
+            try {
+                await this.playTTSStream(text);
+                return;
+            } catch (error) {
+                if (error.status === 429) {
+                    this.showError('Hệ thống đang bận tạo âm thanh, vui lòng thử lại sau ít giây.');
+                    return;
+                }
+                if (error.audioStarted) {
+                    console.warn('Streaming TTS interrupted:', error);
+                    this.showError('Âm thanh bị gián đoạn, vui lòng thử lại.');
+                    return;
+                }
+                console.warn('Streaming TTS failed, falling back:', error);
+            }
+        }
+        
         try {
             this.showLoading(true, 'Đang tạo âm thanh...');
             
@@ -334,44 +379,128 @@ class ChatInterface {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Accept': this.getAudioAccept()
                 },
                 body: JSON.stringify({ text: text })
             });
             
-            const data = await response.json();
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                this.showError(data.error || 'Không thể tạo âm thanh cho tin nhắn này.');
+                return;
+            }
+            
+            // Server trả về audio nhị phân, không cần giải mã base64
+            const audioBlob = await response.blob();
+            const audioUrl = URL.createObjectURL(audioBlob);
+            
+            // Play audio
+            const audio = new Audio(audioUrl);
+            audio.play().catch(error => {
+                console.error('Audio play error:', error);
+                this.showError('Không thể phát âm thanh.');
+            });
+            
+            // Clean up URL after playing
+            audio.addEventListener('ended', () => {
+                URL.revokeObjectURL(audioUrl);
+            });
+            
+        } catch (error) {
+            console.error('TTS error:', error);
+            this.showError('Có lỗi khi tạo âm thanh.');
+        } finally {
+            this.showLoading(false);
+        }
+    }
+    
+    // Ưu tiên định dạng nén mà trình duyệt phát được, WAV là phương án cuối
+    getAudioAccept() {
+        if (!this.audioAccept) {
+            const probe = document.createElement('audio');
+            const accepted = [];
+            if (probe.canPlayType('audio/ogg; codecs="opus"')) accepted.push('audio/ogg');
+            if (probe.canPlayType('audio/mpeg')) accepted.push('audio/mpeg;q=0.9');
+            accepted.push('audio/wav;q=0.5');
+            this.audioAccept = accepted.join(', ');
+        }
+        return this.audioAccept;
+    }
+    
+    async playTTSStream(text) {
+        const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+        let context = null;
+        let playhead = 0;
+        this.showLoading(true, 'Đang tạo âm thanh...');
+        
+        try {
+            const response = await fetch('/api/tts/stream', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ text: text })
+            });
+            
+            if (!response.ok || !response.body) {
+                const error = new Error(`HTTP ${response.status}`);
+                error.status = response.status;
+                throw error;
+            }
+            
+            // WAV header 44 byte, sau đó là PCM 16-bit mono
+            const reader = response.body.getReader();
+            context = new AudioContextClass();
+            let pending = new Uint8Array(0);
+            let sampleRate = null;
             
-            if (data.success && data.audio) {
-                // Convert base64 to audio blob
-                const audioData = atob(data.audio);
-                const audioArray = new Uint8Array(audioData.length);
-                for (let i = 0; i < audioData.length; i++) {
-                    audioArray[i] = audioData.charCodeAt(i);
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                
+                const merged = new Uint8Array(pending.length + value.length);
+                merged.set(pending);
+                merged.set(value, pending.length);
+                pending = merged;
+                
+                if (sampleRate === null) {
+                    if (pending.length < 44) continue;
+                    sampleRate = new DataView(pending.buffer).getUint32(24, true);
+                    pending = pending.slice(44);
                 }
                 
-                const audioBlob = new Blob([audioArray], { type: 'audio/wav' });
-                const audioUrl = URL.createObjectURL(audioBlob);
+                const usable = pending.length - (pending.length % 2);
+                if (usable === 0) continue;
+                
+                const samples = new Int16Array(pending.slice(0, usable).buffer);
+                pending = pending.slice(usable);
                 
-                // Play audio
-                const audio = new Audio(audioUrl);
-                audio.play().catch(error => {
-                    console.error('Audio play error:', error);
-                    this.showError('Không thể phát âm thanh.');
-                });
+                const buffer = context.createBuffer(1, samples.length, sampleRate);
+                const channel = buffer.getChannelData(0);
+                for (let i = 0; i < samples.length; i++) {
+                    channel[i] = samples[i] / 32768;
+                }
                 
-                // Clean up URL after playing
-                audio.addEventListener('ended', () => {
-                    URL.revokeObjectURL(audioUrl);
-                });
+                const source = context.createBufferSource();
+                source.buffer = buffer;
+                source.connect(context.destination);
                 
-            } else {
-                const errorMsg = data.error || 'Không thể tạo âm thanh cho tin nhắn này.';
-                this.showError(errorMsg);
+                if (playhead === 0) {
+                    this.showLoading(false);
+                }
+                playhead = Math.max(playhead, context.currentTime);
+                source.start(playhead);
+                playhead += buffer.duration;
             }
-            
         } catch (error) {
-            console.error('TTS error:', error);
-            this.showError('Có lỗi khi tạo âm thanh.');
+            // Đã phát một phần: không phát lại từ đầu bằng /api/tts
+            error.audioStarted = playhead > 0;
+            throw error;
         } finally {
+            // Đóng AudioContext sau khi phát xong phần đã nhận
+            if (context) {
+                setTimeout(() => context.close(), Math.max(playhead - context.currentTime, 0) * 1000 + 500);
+            }
             this.showLoading(false);
         }
     }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test admission control: bounded concurrency and queues per upstream, fast 429/503 rejection
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import app.upstream as upstream
+from app.upstream import AdmissionLimiter, UpstreamOverloaded, get_breaker
+
+def _run_concurrently(limiter, count: int, work_seconds: float):
+    results = []
+    lock = threading.Lock()
+
+    def call():
+        start = time.perf_counter()
+        try:
+            with limiter.slot():
+                time.sleep(work_seconds)
+            outcome = "admitted"
+        except UpstreamOverloaded:
+            outcome = "rejected"
+        with lock:
+            results.append((outcome, time.perf_counter() - start))
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_limiter_sheds_load():
+    print("🧪 Testing admission limiter under overload...")
+    limiter = AdmissionLimiter("llm", max_concurrent=2, max_queue=2, queue_timeout=5)
+    results = _run_concurrently(limiter, 10, 0.2)
+
+    admitted = [t for outcome, t in results if outcome == "admitted"]
+    rejected = [t for outcome, t in results if outcome == "rejected"]
+    # 2 chạy ngay, 2 chờ một lượt, còn lại bị từ chối ngay lập tức
+    assert len(admitted) == 4 and len(rejected) == 6
+    assert max(admitted) < 0.6
+    assert max(rejected) < 0.1
+
+    stats = limiter.stats()
+    assert (stats["admitted"], stats["rejected"], stats["in_flight"], stats["waiting"]) == (4, 6, 0, 0)
+    assert stats["p95_queue_wait_ms"] >= 150
+    print(f"✅ Admitted p95 {max(admitted) * 1000:.0f}ms, rejected in {max(rejected) * 1000:.0f}ms: {stats}")
+
+def test_queue_timeout():
+    limiter = AdmissionLimiter("weather", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    results = _run_concurrently(limiter, 2, 0.3)
+    assert sorted(outcome for outcome, _ in results) == ["admitted", "rejected"]
+    assert limiter.stats()["timed_out"] == 1
+
+def test_chat_rejections():
+    print("🧪 Testing /api/chat 429 and 503...")
+    from app import create_app, services
+
+    class SlowAgent:
+        def process_query(self, message, *args, **kwargs):
+            time.sleep(0.3)
+            return {"response": "ok", "chat_history": []}
+
+    app = create_app(warm_up=False)
+    services.set_service("agent", SlowAgent())
+    saved = upstream._limiters["chat"]
+    upstream._limiters["chat"] = AdmissionLimiter("chat", max_concurrent=1, max_queue=0)
+    try:
+        statuses = []
+
+        def post():
+            response = app.test_client().post("/api/chat", json={"message": "Hà Nội có gì vui?"})
+            statuses.append((response.status_code, response.headers.get("Retry-After")))
+
+        threads = [threading.Thread(target=post) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(s for s, _ in statuses) == [200, 429, 429]
+        assert all(retry_after for s, retry_after in statuses if s == 429)
+
+        # Breaker của LLM đang mở: 503 ngay, không gọi agent
+        breaker = get_breaker("llm")
+        breaker.state, breaker.opened_at = "open", time.time()
+        start = time.perf_counter()
+        response = app.test_client().post("/api/chat", json={"message": "Hà Nội có gì vui?"})
+        assert response.status_code == 503 and int(response.headers["Retry-After"]) >= 1
+        assert time.perf_counter() - start < 0.1
+        breaker.record_success()
+    finally:
+        upstream._limiters["chat"] = saved
+        services.set_service("agent", None)
+    print("✅ Overloaded chat gets 429, unavailable LLM gets 503")
+
+def test_vision_and_embeddings_errors_reach_route():
+    print("🧪 Testing vision/embeddings overload on /api/chat...")
+    import io
+    import tempfile
+    from PIL import Image
+    from app import create_app, services
+    from app.testing import FakeEmbeddings, FakeResponse, build_fake_db_manager, build_offline_agent
+
+    class FailingLLM:
+        def __init__(self, error=None):
+            self.error = error
+
+        def invoke(self, messages, **kwargs):
+            if self.error:
+                raise self.error
+            return FakeResponse("ok")
+
+    def unavailable(text, dimensions):
+        raise upstream.UpstreamUnavailable("embeddings", 5)
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (200, 60, 60)).save(buffer, format="JPEG")
+    image = {"image": (io.BytesIO(buffer.getvalue()), "pho.jpg", "image/jpeg")}
+
+    app = create_app(warm_up=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build_fake_db_manager(tmp, FakeEmbeddings(vector=unavailable))
+        try:
+            # Embeddings không khả dụng: 503, không trả lời khi thiếu tài liệu
+            services.set_service("agent", build_offline_agent(FailingLLM(), db_manager=db))
+            response = app.test_client().post("/api/chat", json={"message": "Hà Nội có gì vui?"})
+            assert response.status_code == 503 and response.headers["Retry-After"] == "5"
+
+            # Vision quá tải: 429, không trả lời theo câu "Không thể phân tích hình ảnh"
+            vision = FailingLLM(UpstreamOverloaded("vision", 2))
+            services.set_service("agent", build_offline_agent(FailingLLM(), vision, db_manager=db))
+            response = app.test_client().post("/api/chat", data=dict(image, message=""),
+                                              content_type="multipart/form-data")
+            assert response.status_code == 429 and response.headers["Retry-After"] == "2"
+        finally:
+            services.set_service("agent", None)
+    print("✅ Vision/embeddings overload gets 429/503")
+
+def test_local_tts_admission():
+    print("🧪 Testing local TTS admission...")
+    from app.tts_workers import TTSBusyError
+    from app.testing import build_tiny_tts
+
+    tts = build_tiny_tts()
+    text = "Xin chào! Tôi là trợ lý du lịch AI."
+    saved = upstream._limiters["tts"]
+    limiter = upstream._limiters["tts"] = AdmissionLimiter("tts", max_concurrent=1, max_queue=0)
+    try:
+        # Stream giữ slot tới khi kết thúc
+        stream = tts.stream_wav(text)
+        try:
+            tts.text_to_speech("Hẹn gặp lại.")
+            assert False, "expected TTSBusyError"
+        except TTSBusyError as e:
+            assert e.retry_after >= 1
+        list(stream)
+        assert limiter.stats()["in_flight"] == 0
+
+        # Stream bị đóng trước khi bắt đầu (client ngắt) vẫn trả slot
+        tts.stream_wav(text).close()
+        assert limiter.stats()["in_flight"] == 0
+        assert tts.text_to_speech("Hẹn gặp lại.")[:4] == b"RIFF"
+    finally:
+        upstream._limiters["tts"] = saved
+    print("✅ Local TTS slots are released after streaming")
+
+if __name__ == "__main__":
+    test_limiter_sheds_load()
+    test_queue_timeout()
+    test_chat_rejections()
+    test_vision_and_embeddings_errors_reach_route()
+    test_local_tts_admission()
+    print("\n✅ All admission control tests passed!")
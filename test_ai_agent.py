@@ -15,9 +15,12 @@ def test_ai_agent():
     
     try:
         from app.ai_agent import TravelAIAgent
+        from app.testing import config_overrides
         
         print("🔧 Initializing AI Agent...")
-        agent = TravelAIAgent()
+        # Gọi LLM thật mỗi lần chạy, không ghi cache vào ./data
+        with config_overrides(LLM_CACHE_ENABLED=False, IMAGE_CACHE_ENABLED=False):
+            agent = TravelAIAgent()
         
         print("✅ AI Agent initialized successfully!")
         
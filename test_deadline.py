@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test the per-request deadline: optional stages (image re-retrieval, weather, advice) are dropped when time is short
+"""
+
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from PIL import Image
+from app.testing import FakeResponse, build_fake_db_manager, build_offline_agent, hashed_embedding
+from loadtest.fake_upstreams import FakeUpstreams, parse_profiles
+
+class SlowLLM:
+    """Answers every call site; generate_response takes ``delay`` seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    def invoke(self, messages):
+        prompt = messages[0].content
+        self.prompts.append(prompt)
+        if "trích xuất tên thành phố" in prompt:
+            return FakeResponse("Hanoi")
+        if "thông tin thời tiết" in prompt:
+            return FakeResponse("Mang theo áo mưa.")
+        if "Hình ảnh này" in str(messages[-1].content) or "phân tích hình ảnh" in prompt:
+            return FakeResponse("Phở bò Hà Nội")
+        time.sleep(self.delay)
+        return FakeResponse("Phở Thìn ở Hà Nội rất ngon.")
+
+def _agent(tmp, delay=0.0):
+    from loadtest.serve import SEED_DOCUMENTS
+
+    db = build_fake_db_manager(str(Path(tmp) / "chroma"))
+    db.collection.add(documents=SEED_DOCUMENTS, ids=[f"seed_{i}" for i in range(len(SEED_DOCUMENTS))],
+                      embeddings=[hashed_embedding(d) for d in SEED_DOCUMENTS])
+    llm = SlowLLM(delay)
+    return build_offline_agent(llm, db_manager=db), llm
+
+def _image_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 60, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def _weather(fake):
+    saved = Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL
+    Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = "test-key", fake.app_env()['OPENWEATHER_BASE_URL']
+    return saved
+
+def test_slow_llm_drops_weather_stages():
+    print("🧪 Testing deadline with a slow LLM...")
+    saved_budget = Config.STAGE_MIN_BUDGET
+    Config.STAGE_MIN_BUDGET = {"image_retrieval": 0.2, "weather": 0.5, "weather_advice": 0.3}
+    with FakeUpstreams(profiles=parse_profiles("weather=1:0")) as fake, tempfile.TemporaryDirectory() as tmp:
+        saved = _weather(fake)
+        try:
+            # Đủ thời gian: chạy đủ các bước
+            agent, llm = _agent(tmp)
+            result = agent.process_query("Hà Nội có món gì ngon?", deadline=time.monotonic() + 10)
+            assert result["skipped_stages"] == []
+            assert "Lời khuyên dựa trên thời tiết" in result["response"] and len(llm.prompts) == 3
+
+            # LLM chậm ăn gần hết thời gian: bỏ thời tiết + lời khuyên, trả lời ngay
+            llm.delay = 0.6
+            start = time.monotonic()
+            result = agent.process_query("Hà Nội có món gì ngon?", deadline=start + 0.8)
+            elapsed = time.monotonic() - start
+            assert result["skipped_stages"] == ["weather"]
+            assert result["response"] == "Phở Thìn ở Hà Nội rất ngon." and elapsed < 0.8
+
+            # Không có hạn chót: không bỏ bước nào dù LLM chậm
+            result = agent.process_query("Hà Nội có món gì ngon?", deadline=float("inf"))
+            assert result["skipped_stages"] == [] and result["weather_info"]
+
+            # Replay bỏ qua đúng các bước như lúc ghi
+            result = agent.process_query("Hà Nội có món gì ngon?", deadline=float("inf"), skip_stages=["weather_advice"])
+            assert result["weather_info"] and "Lời khuyên" not in result["response"]
+        finally:
+            Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = saved
+            Config.STAGE_MIN_BUDGET = saved_budget
+    print(f"✅ Slow LLM: answered in {elapsed:.2f}s without weather")
+
+def test_image_retrieval_and_advice_budgets():
+    print("🧪 Testing image re-retrieval and advice budgets...")
+    saved_budget = Config.STAGE_MIN_BUDGET
+    with FakeUpstreams(profiles=parse_profiles("weather=1:0")) as fake, tempfile.TemporaryDirectory() as tmp:
+        saved = _weather(fake)
+        try:
+            agent, _ = _agent(tmp)
+            # Ảnh + text: chỉ giữ kết quả truy vấn theo text
+            Config.STAGE_MIN_BUDGET = {"image_retrieval": 100, "weather": 0, "weather_advice": 100}
+            result = agent.process_query("Món này ăn ở đâu?", _image_bytes(), image_type="image/jpeg",
+                                         deadline=time.monotonic() + 10)
+            assert result["skipped_stages"] == ["image_retrieval", "weather_advice"]
+            assert result["retrieved_docs"] and result["weather_info"] in result["response"]
+            assert "Lời khuyên" not in result["response"]
+        finally:
+            Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = saved
+            Config.STAGE_MIN_BUDGET = saved_budget
+    print("✅ Image re-retrieval and weather advice dropped, weather kept")
+
+def test_chat_route_reports_skipped_stages():
+    from app import create_app, services
+
+    class RecordingAgent:
+        def process_query(self, message, *args, **kwargs):
+            self.deadline = kwargs.get("deadline")
+            return {"response": "ok", "chat_history": [], "skipped_stages": ["weather"]}
+
+    agent = RecordingAgent()
+    app = create_app(warm_up=False)
+    services.set_service("agent", agent)
+    try:
+        start = time.monotonic()
+        response = app.test_client().post("/api/chat", json={"message": "Hà Nội có gì?"})
+    finally:
+        services.set_service("agent", None)
+    assert response.get_json()["skipped_stages"] == ["weather"]
+    assert start < agent.deadline <= time.monotonic() + Config.REQUEST_DEADLINE
+
+if __name__ == "__main__":
+    test_slow_llm_drops_weather_stages()
+    test_image_retrieval_and_advice_budgets()
+    test_chat_route_reports_skipped_stages()
+    print("\n✅ All deadline tests passed!")
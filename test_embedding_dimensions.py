@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test reduced-dimension embeddings: API/truncate modes, in-place migration, float16 snapshots
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from app.models import reduce_dimensions
+from app.snapshot import SnapshotError, export_snapshot, import_snapshot
+from app.testing import FakeEmbeddings, build_fake_db_manager
+from benchmark_embeddings import run_benchmark, synthetic_embeddings
+
+def _full_vector(text, dimensions):
+    """1536-d vector unless the request asks for ``dimensions``"""
+    vector = synthetic_embeddings(1, seed=sum(text.encode()))[0]
+    return reduce_dimensions(vector, dimensions)
+
+def _manager(path, dimensions=0, mode="api"):
+    return build_fake_db_manager(path, FakeEmbeddings(_full_vector),
+                                 EMBEDDING_DIMENSIONS=dimensions, EMBEDDING_DIMENSIONS_MODE=mode)
+
+def test_reduced_dimensions():
+    print("🧪 Testing reduced-dimension embeddings...")
+    full = synthetic_embeddings(4)
+    reduced = reduce_dimensions(full, 256)
+    assert reduced.shape == (4, 256)
+    assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+    # Cùng hướng với 256 giá trị đầu của vector gốc
+    assert np.allclose(reduced * np.linalg.norm(full[:, :256], axis=1, keepdims=True), full[:, :256], atol=1e-6)
+    assert reduce_dimensions(full, 0).shape == (4, 1536)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 'api': Azure trả vector ngắn; 'truncate': cắt vector đầy đủ ở local, kết quả như nhau
+        api = _manager(str(Path(tmp) / "api"), 256, "api")
+        truncate = _manager(str(Path(tmp) / "truncate"), 256, "truncate")
+        texts = ["Hà Nội có phố cổ", "Đà Nẵng có biển Mỹ Khê", "Huế có Đại Nội"]
+        assert api.add_documents(texts) and truncate.add_documents(texts)
+        assert api.embedding_client.calls[0] == {"dimensions": 256}
+        assert truncate.embedding_client.calls[0] == {}
+        assert api.stored_dimensions() == truncate.stored_dimensions() == 256
+        assert np.allclose(api._embed_query("Huế"), truncate._embed_query("Huế"), atol=1e-6)
+        assert api.query_documents("Huế có Đại Nội", n_results=1)["documents"] == [["Huế có Đại Nội"]]
+    print("✅ API and local truncation give the same 256-d vectors")
+
+def test_migration_and_float16_snapshot():
+    print("🧪 Testing in-place migration...")
+    from migrate_embeddings import migrate
+
+    vectors = synthetic_embeddings(500, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _manager(str(Path(tmp) / "db"))
+        db.collection.add(ids=[f"doc_{i}" for i in range(500)], documents=[f"Tài liệu {i}" for i in range(500)],
+                          metadatas=[{"chunk_id": i} for i in range(500)], embeddings=vectors)
+
+        try:
+            migrate(db, 2048, str(Path(tmp) / "grow"))
+            assert False, "expected SnapshotError"
+        except SnapshotError as e:
+            assert "--reembed" in str(e)
+
+        assert migrate(db, 512, str(Path(tmp) / "backup")) == 1536
+        assert db.embedding_client.calls == []
+        assert db.collection.count() == 500 and db.stored_dimensions() == 512
+        assert db.collection.get(ids=["doc_42"])["metadatas"] == [{"chunk_id": 42}]
+        assert db.collection.metadata["hnsw:space"] == "cosine"
+        stored = db.collection.get(ids=["doc_7"], include=["embeddings"])["embeddings"][0]
+        assert np.allclose(stored, reduce_dimensions(vectors[7], 512), atol=1e-6)
+
+        # Snapshot float16 chiếm một nửa dung lượng; không thể nạp vào node dùng vector dài hơn
+        manifest = export_snapshot(db, str(Path(tmp) / "half"), dtype="float16")
+        assert manifest["dtype"] == "float16" and manifest["dimensions"] == 512
+        assert (Path(tmp) / "half" / "embeddings.npy").stat().st_size < 500 * 512 * 2 + 1024
+        target = _manager(str(Path(tmp) / "target"))
+        try:
+            import_snapshot(target, str(Path(tmp) / "half"), dimensions=1024)
+            assert False, "expected SnapshotError"
+        except SnapshotError as e:
+            assert "re-embed" in str(e)
+        imported = import_snapshot(target, str(Path(tmp) / "half"), dimensions=256)
+        assert imported["imported_dimensions"] == 256 and target.stored_dimensions() == 256
+        query = reduce_dimensions(vectors[:20], 256)
+        found = target.collection.query(query_embeddings=query, n_results=1)["ids"]
+        assert sum(ids == [f"doc_{i}"] for i, ids in enumerate(found)) >= 19
+    print("✅ 1536 -> 512 migration without embedding calls, float16 snapshot re-imported at 256d")
+
+def test_benchmark_reports_recall():
+    print("🧪 Testing embedding size benchmark...")
+    vectors = synthetic_embeddings(1100)
+    rows = run_benchmark(vectors[100:], vectors[:100], [1536, 256], ["float32", "float16"], k=3)
+    full, half, small = rows[0], rows[1], rows[2]
+    assert full["recall_exact"] == 1.0 and full["recall_chroma"] > 0.9
+    assert half["vectors_mb"] == full["vectors_mb"] / 2 and half["recall_exact"] > 0.95 and "recall_chroma" not in half
+    assert small["vectors_mb"] < full["vectors_mb"] / 5 and 0 < small["recall_exact"] <= 1.0
+    print(f"✅ 256d float32 keeps recall {small['recall_exact']} at 1/6 of the memory")
+
+if __name__ == "__main__":
+    test_reduced_dimensions()
+    test_migration_and_float16_snapshot()
+    test_benchmark_reports_recall()
+    print("\n✅ All embedding dimension tests passed!")
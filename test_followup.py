@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Test retrieval reuse for follow-up questions: cue detection, no embedding call, similarity merge, session round trip
+"""
+
+import json
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+
+import numpy as np
+from app.followup import decode_embedding, encode_embedding, has_followup_cues
+from app.testing import FakeEmbeddings, FakeResponse, build_fake_db_manager, build_offline_agent
+
+PHO = [f"Quán phở số {i} ở Hà Nội" for i in range(8)]
+BEACH = [f"Bãi biển số {i} ở Đà Nẵng" for i in range(4)]
+
+def _topic_vector(text):
+    """Cùng chủ đề -> gần nhau; nhiễu theo hash để thứ hạng cố định"""
+    rng = np.random.default_rng(zlib.crc32(text.encode()))
+    topic = np.zeros(32, dtype=np.float32)
+    topic[0 if "phở" in text.lower() else 1] = 1.0
+    vector = topic + 0.08 * rng.standard_normal(32).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+class FakeLLM:
+    def invoke(self, messages):
+        return FakeResponse("")
+
+def _agent(tmp):
+    db = build_fake_db_manager(str(Path(tmp) / "chroma"), FakeEmbeddings(lambda text, dimensions: _topic_vector(text)))
+    documents = PHO + BEACH
+    db.collection.add(ids=[f"doc_{i}" for i in range(len(documents))], documents=documents,
+                      embeddings=[_topic_vector(d) for d in documents])
+    return build_offline_agent(FakeLLM(), db_manager=db)
+
+def test_followup_cues():
+    anchor = {"query": "Quán phở nào ngon ở Hà Nội?"}
+    assert has_followup_cues("Còn quán nào khác không?", anchor)
+    assert has_followup_cues("chỗ đó mở cửa mấy giờ?", anchor)
+    assert has_followup_cues("Ở Hà Nội còn gì nữa?", anchor), "same place is not new"
+    assert not has_followup_cues("Còn Đà Nẵng thì sao?", anchor), "new place -> new retrieval"
+    assert not has_followup_cues("còn đà nẵng thì sao?", anchor), "new place without capitals"
+    assert not has_followup_cues("thế còn sapa?", anchor)
+    assert has_followup_cues("ở hà nội còn quán nào khác?", anchor)
+    assert has_followup_cues("Còn Sa Pa thì sao?", {"query": "Đi sapa mùa nào đẹp?"}), "same place, other spelling"
+    assert not has_followup_cues("Lịch trình 3 ngày đi Sapa nên chuẩn bị những gì?", anchor)
+    assert not has_followup_cues("Thời tiết hôm nay thế nào?", anchor)
+
+    vector = np.asarray(_topic_vector("phở"), dtype=np.float32)
+    assert np.allclose(decode_embedding(encode_embedding(vector)), vector, atol=1e-3)
+
+def test_followup_reuses_previous_retrieval():
+    print("🧪 Testing follow-up retrieval reuse...")
+    saved = Config.RETRIEVAL_TOP_K, Config.FOLLOWUP_EXTRA_DOCS, Config.FOLLOWUP_MAX_TURNS
+    Config.RETRIEVAL_TOP_K, Config.FOLLOWUP_EXTRA_DOCS, Config.FOLLOWUP_MAX_TURNS = 3, 2, 2
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = _agent(tmp)
+            embeddings = agent.db_manager.embedding_client
+
+            first = agent.process_query("Quán phở nào ngon ở Hà Nội?")
+            assert first["retrieval_mode"] == "full" and len(embeddings.calls) == 1
+            assert all(doc in PHO for doc in first["retrieved_docs"]) and len(first["retrieved_ids"]) == 3
+            # Lưu được vào session store (JSON, SQLite)
+            anchor = json.loads(json.dumps(first["last_retrieval"]))
+
+            second = agent.process_query("Còn quán nào khác không?", last_retrieval=anchor)
+            assert second["retrieval_mode"] == "followup" and len(embeddings.calls) == 1, "no embedding call"
+            assert second["retrieved_ids"][:3] == first["retrieved_ids"]
+            added = second["retrieved_ids"][3:]
+            assert len(added) == 2 and not set(added) & set(first["retrieved_ids"])
+            assert all(doc in PHO for doc in second["retrieved_docs"])
+
+            # Hỏi tiếp lần nữa: lấy thêm các quán chưa xuất hiện
+            third = agent.process_query("Còn quán nào nữa?", last_retrieval=second["last_retrieval"])
+            assert third["retrieval_mode"] == "followup" and len(embeddings.calls) == 1
+            assert not set(third["retrieved_ids"][3:]) & set(second["retrieved_ids"])
+
+            # Đã nối tiếp FOLLOWUP_MAX_TURNS lần: truy vấn đầy đủ
+            fourth = agent.process_query("Còn quán nào khác?", last_retrieval=third["last_retrieval"])
+            assert fourth["retrieval_mode"] != "followup" and len(embeddings.calls) == 2
+
+            # Địa điểm mới: truy vấn mới, không giữ tài liệu cũ
+            beach = agent.process_query("Còn Đà Nẵng thì sao?", last_retrieval=anchor)
+            assert beach["retrieval_mode"] == "full" and len(embeddings.calls) == 3
+            assert all(doc in BEACH for doc in beach["retrieved_docs"])
+    finally:
+        Config.RETRIEVAL_TOP_K, Config.FOLLOWUP_EXTRA_DOCS, Config.FOLLOWUP_MAX_TURNS = saved
+    print("✅ Follow-ups reuse 3 documents and add 2 new ones without embedding calls")
+
+def test_similar_question_keeps_previous_documents():
+    print("🧪 Testing similarity-based follow-up...")
+    saved = Config.FOLLOWUP_SIMILARITY, Config.FOLLOWUP_REUSE_ENABLED
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = _agent(tmp)
+            first = agent.process_query("Quán phở nào ngon ở Hà Nội?")
+            question = "Mình muốn ăn phở bò buổi sáng gần Hồ Gươm thì nên chọn quán phở nào?"
+
+            Config.FOLLOWUP_SIMILARITY = 0.5
+            similar = agent.process_query(question, last_retrieval=first["last_retrieval"])
+            assert similar["retrieval_mode"] == "followup_similar"
+            assert set(first["retrieved_ids"]) <= set(similar["retrieved_ids"])
+            assert len(similar["retrieved_ids"]) <= Config.RETRIEVAL_TOP_K + Config.FOLLOWUP_EXTRA_DOCS
+
+            Config.FOLLOWUP_REUSE_ENABLED = False
+            disabled = agent.process_query("Còn quán nào khác không?", last_retrieval=first["last_retrieval"])
+            assert disabled["retrieval_mode"] == "full"
+    finally:
+        Config.FOLLOWUP_SIMILARITY, Config.FOLLOWUP_REUSE_ENABLED = saved
+    print("✅ Similar questions keep the previous documents in context")
+
+def test_anchor_of_other_dimensions_is_ignored():
+    print("🧪 Testing anchors saved before an EMBEDDING_DIMENSIONS change...")
+    saved = Config.FOLLOWUP_SIMILARITY
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = _agent(tmp)
+            embeddings = agent.db_manager.embedding_client
+            first = agent.process_query("Quán phở nào ngon ở Hà Nội?")
+            old_anchor = dict(first["last_retrieval"],
+                              embedding=encode_embedding(decode_embedding(first["last_retrieval"]["embedding"])[:16]))
+
+            # Kích thước của collection đã biết: không dùng anchor cũ cho câu hỏi nối tiếp
+            agent.db_manager.embedding_dimensions = 32
+            followup = agent.process_query("Còn quán nào khác không?", last_retrieval=old_anchor)
+            assert followup["retrieval_mode"] == "full" and len(embeddings.calls) == 2
+            assert len(decode_embedding(followup["last_retrieval"]["embedding"])) == 32
+
+            # Kích thước gốc của model (không cấu hình): so sánh cosine coi như không giống
+            agent.db_manager.embedding_dimensions = None
+            Config.FOLLOWUP_SIMILARITY = 0.1
+            similar = agent.process_query("Quán phở nào mở cửa sớm?", last_retrieval=old_anchor)
+            assert similar["retrieval_mode"] == "full" and similar["retrieved_docs"]
+
+            # Truy vấn lỗi: không giữ anchor của lượt trước
+            agent.db_manager.query_documents = lambda *args, **kwargs: 1 / 0
+            failed = agent.process_query("Quán phở nào mở cửa khuya?", last_retrieval=first["last_retrieval"])
+            assert failed["retrieved_docs"] == [] and failed["last_retrieval"] is None
+    finally:
+        Config.FOLLOWUP_SIMILARITY = saved
+    print("✅ Anchors of another vector size are treated as absent")
+
+def test_chat_route_keeps_last_retrieval_in_session():
+    from app import create_app, services
+
+    class RecordingAgent:
+        def __init__(self):
+            self.received = []
+
+        def process_query(self, message, *args, **kwargs):
+            self.received.append(kwargs.get("last_retrieval"))
+            return {"response": "ok", "chat_history": [], "last_retrieval": {"query": message, "ids": ["doc_1"]}}
+
+    agent = RecordingAgent()
+    app = create_app(warm_up=False)
+    services.set_service("agent", agent)
+    try:
+        client = app.test_client()
+        assert client.post("/api/chat", json={"message": "Quán phở nào ngon?"}).status_code == 200
+        assert client.post("/api/chat", json={"message": "Còn quán nào khác?"}).status_code == 200
+    finally:
+        services.set_service("agent", None)
+    assert agent.received == [None, {"query": "Quán phở nào ngon?", "ids": ["doc_1"]}]
+
+if __name__ == "__main__":
+    test_followup_cues()
+    test_followup_reuses_previous_retrieval()
+    test_similar_question_keeps_previous_documents()
+    test_anchor_of_other_dimensions_is_ignored()
+    test_chat_route_keeps_last_retrieval_in_session()
+    print("\n✅ All follow-up retrieval tests passed!")
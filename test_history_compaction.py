@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test chat history compaction with a fake LLM (no Azure calls)
+"""
+
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.history import ChatHistoryCompactor, count_history_tokens
+from app.llm_cache import CachedChatModel
+from app.testing import FakeResponse
+
+class FakeLLM:
+    def __init__(self, reply="Người dùng hỏi về Hà Nội và phở."):
+        self.reply = reply
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(self.reply)
+
+def _make_history(turns, length=400):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Câu hỏi {i} " + "phở Hà Nội " * (length // 10)})
+        history.append({"role": "assistant", "content": f"Trả lời {i} " + "quán ngon " * (length // 10)})
+    return history
+
+def test_history_compaction():
+    print("🧪 Testing chat history compaction...")
+
+    llm = FakeLLM()
+    compactor = ChatHistoryCompactor(CachedChatModel(llm, None), token_budget=300, keep_turns=2, max_turns=10)
+    session_id = "test-session-0001"
+    history = _make_history(6)
+
+    # Vượt ngân sách: chỉ gửi các lượt gần nhất
+    selected, summary = compactor.select_for_prompt(session_id, history, "")
+    assert selected == history[-4:], "Should keep the last turns verbatim"
+    assert summary == ""
+    print(f"✅ Prompt trimmed to {len(selected)} messages")
+
+    # Job tóm tắt chạy nền
+    assert compactor.maybe_compact(session_id, history, "")
+    compactor._pending[session_id][1].result(timeout=5)
+
+    history, summary = compactor.apply_pending(session_id, history, "")
+    assert summary == llm.reply
+    assert len(history) == 4, "Folded turns should be removed from history"
+    assert llm.calls == 1
+    print(f"✅ Summary applied: {summary}")
+
+    selected, summary = compactor.select_for_prompt(session_id, history, summary)
+    stats = compactor.get_stats(session_id)
+    assert stats["tokens_saved"] > 0
+    assert stats["history_tokens_sent"] < stats["history_tokens_full"]
+    print(f"📊 Stats: {stats}")
+
+def test_history_under_budget_untouched():
+    llm = FakeLLM()
+    compactor = ChatHistoryCompactor(CachedChatModel(llm, None), token_budget=100000, keep_turns=2, max_turns=10)
+    history = _make_history(2, length=20)
+
+    selected, _ = compactor.select_for_prompt("s2", history, "")
+    assert selected == history
+    assert not compactor.maybe_compact("s2", history, "")
+    assert count_history_tokens(history) > 0
+    print("✅ Short history is sent verbatim")
+
+def test_pending_summaries_bounded():
+    compactor = ChatHistoryCompactor(CachedChatModel(FakeLLM(), None), token_budget=300, keep_turns=2, max_turns=10)
+    compactor.max_sessions = 3
+    history = _make_history(6)
+
+    # Phiên không gửi thêm câu hỏi nào: job tóm tắt cũ nhất bị bỏ
+    for i in range(5):
+        assert compactor.maybe_compact(f"abandoned-{i}", history, "")
+    assert list(compactor._pending) == ["abandoned-2", "abandoned-3", "abandoned-4"]
+    compactor._pending["abandoned-4"][1].result(timeout=5)
+    assert compactor.apply_pending("abandoned-0", history, "") == (history, "")
+    print("✅ Pending summaries are capped at max_sessions")
+
+if __name__ == "__main__":
+    test_history_compaction()
+    test_history_under_budget_untouched()
+    test_pending_summaries_bounded()
+    print("\n🎉 History compaction test completed!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test HNSW settings from Config, index warm-up at startup and the HNSW sweep benchmark
+"""
+
+import io
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app import services
+from app.models import ChromaDBManager
+from app.snapshot import export_snapshot, import_snapshot
+from app.testing import config_overrides, offline_embedding_settings
+from benchmark_embeddings import synthetic_embeddings
+from benchmark_hnsw import sweep
+
+def _config(path, m=16, construction_ef=100, search_ef=100):
+    # Client embeddings thật chỉ được khởi tạo, không được gọi
+    return config_overrides(CHROMADB_PATH=path, HNSW_M=m, HNSW_CONSTRUCTION_EF=construction_ef,
+                            HNSW_SEARCH_EF=search_ef, **offline_embedding_settings())
+
+def test_hnsw_settings_from_config():
+    print("🧪 Testing HNSW settings...")
+    vectors = synthetic_embeddings(300, 64)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "db")
+        with _config(path, m=24, construction_ef=150, search_ef=40):
+            db = ChromaDBManager()
+            db.collection.add(ids=[str(i) for i in range(300)], embeddings=vectors)
+            assert db.hnsw_settings() == {"M": 24, "construction_ef": 150, "search_ef": 40}
+
+        # Khởi động lại với cấu hình mới: search_ef được áp dụng, M/construction_ef chỉ được cảnh báo
+        output = io.StringIO()
+        with _config(path, m=8, construction_ef=150, search_ef=80), redirect_stdout(output):
+            reopened = ChromaDBManager()
+            assert reopened.hnsw_settings() == {"M": 24, "construction_ef": 150, "search_ef": 80}
+        assert "migrate_embeddings.py" in output.getvalue()
+
+        # Snapshot được nạp với cấu hình HNSW của node nhận, không phải của node nguồn
+        export_snapshot(reopened, str(Path(tmp) / "snapshot"))
+        with _config(str(Path(tmp) / "target"), m=8, construction_ef=50, search_ef=20):
+            target = ChromaDBManager()
+            import_snapshot(target, str(Path(tmp) / "snapshot"), replace=True)
+            assert target.hnsw_settings() == {"M": 8, "construction_ef": 50, "search_ef": 20}
+            assert target.collection.count() == 300
+    print("✅ M/construction_ef/search_ef follow Config")
+
+def test_index_warm_up():
+    print("🧪 Testing index warm-up...")
+    with tempfile.TemporaryDirectory() as tmp:
+        with _config(str(Path(tmp) / "db")):
+            db = services._build_db_manager()
+            assert db.warm_up_index() == 0.0
+
+            db.collection.add(ids=[str(i) for i in range(50)], embeddings=synthetic_embeddings(50, 64))
+            assert db.warm_up_index(queries=0) == 0.0
+            assert db.warm_up_index(queries=5) > 0
+    print("✅ Warm-up searches with stored vectors, skips empty collections")
+
+def test_sweep_reports_recall():
+    print("🧪 Testing HNSW sweep...")
+    vectors = synthetic_embeddings(2100, 64)
+    rows = sweep(vectors[100:], vectors[:100], [4], [20], [3, 200], k=3)
+    low, high = rows
+    assert (low["M"], low["construction_ef"], low["search_ef"]) == (4, 20, 3)
+    assert high["recall"] > 0.95 and high["recall"] > low["recall"]
+    assert all(r["p50_ms"] > 0 and r["build_s"] >= 0 for r in rows)
+    print(f"✅ search_ef 3 -> 200 raises recall {low['recall']} -> {high['recall']}")
+
+if __name__ == "__main__":
+    test_hnsw_settings_from_config()
+    test_index_warm_up()
+    test_sweep_reports_recall()
+    print("\n✅ All HNSW tests passed!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test perceptual-hash image analysis cache with the sample photos in data-test/
+"""
+
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+from app.image_cache import ImageAnalysisCache, hamming_distance, perceptual_hash
+
+SAMPLES = [
+    project_root / "data-test" / "cau-rong-da-nang (6)-min.jpg",
+    project_root / "data-test" / "mi-quang-quang-nam.jpg",
+]
+
+def _reencode(image_bytes, max_dimension, quality):
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((max_dimension, max_dimension))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue()
+
+def test_near_duplicate_images_hit_cache():
+    print("🧪 Testing perceptual-hash image cache...")
+
+    bridge, noodles = (path.read_bytes() for path in SAMPLES)
+    bridge_small = _reencode(bridge, 512, 70)  # Ảnh viral đã bị resize + nén lại
+
+    distance = hamming_distance(perceptual_hash(bridge), perceptual_hash(bridge_small))
+    assert distance <= 6, f"Re-encoded image too far: {distance}"
+    assert hamming_distance(perceptual_hash(bridge), perceptual_hash(noodles)) > 6
+
+    path = os.path.join(tempfile.mkdtemp(), "image_cache.db")
+    cache = ImageAnalysisCache(path=path, max_entries=10, threshold=6)
+    cache.set(perceptual_hash(bridge), "Cầu Rồng, Đà Nẵng")
+
+    assert cache.get(perceptual_hash(bridge_small)) == "Cầu Rồng, Đà Nẵng"
+    assert cache.get(perceptual_hash(noodles)) is None
+
+    # Dữ liệu được lưu xuống đĩa và nạp lại
+    reloaded = ImageAnalysisCache(path=path, max_entries=10, threshold=6)
+    assert reloaded.get(perceptual_hash(bridge)) == "Cầu Rồng, Đà Nẵng"
+
+    stats = cache.stats()
+    assert stats["exact_hits"] + stats["near_hits"] == 1 and stats["misses"] == 1
+    print(f"📊 Stats: {stats}")
+
+def test_lru_eviction():
+    cache = ImageAnalysisCache(path="", max_entries=2, threshold=0)
+    cache.set(0b0001, "a")
+    cache.set(0b0010, "b")
+    cache.get(0b0001)
+    cache.set(0b0100, "c")
+    assert cache.get(0b0010) is None
+    assert cache.get(0b0001) == "a"
+    assert cache.stats()["evictions"] == 1
+    print("✅ LRU eviction works")
+
+def test_eviction_and_order_persisted():
+    path = os.path.join(tempfile.mkdtemp(), "image_cache.db")
+    cache = ImageAnalysisCache(path=path, max_entries=2, threshold=0)
+    cache.set(0b0001, "a")
+    cache.set(0b0010, "b")
+    cache.get(0b0001)
+    cache.set(0b0100, "c")  # Loại "b", chỉ ghi/xóa đúng các dòng thay đổi
+
+    reloaded = ImageAnalysisCache(path=path, max_entries=2, threshold=0)
+    assert list(reloaded._entries.items()) == [(0b0001, "a"), (0b0100, "c")]
+    reloaded.set(0b1000, "d")
+    assert reloaded.get(0b0001) is None, "least recently used entry evicted after reload"
+
+if __name__ == "__main__":
+    test_near_duplicate_images_hit_cache()
+    test_lru_eviction()
+    test_eviction_and_order_persisted()
+    print("\n🎉 Image cache test completed!")
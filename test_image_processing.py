@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test server-side image normalization (orientation, downscale, re-encode)
+"""
+
+import io
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+from app.image_processing import InvalidImageError, normalize_image, normalize_image_async, pipeline_stats
+
+def _jpeg_with_orientation(width, height, orientation):
+    img = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=98, exif=exif)
+    return buffer.getvalue()
+
+def test_normalize_rotates_and_downscales():
+    print("🧪 Testing image normalization...")
+
+    # Ảnh chụp dọc từ điện thoại: lưu ngang + EXIF orientation = 6 (xoay 90°)
+    raw = _jpeg_with_orientation(2000, 1000, 6)
+    normalized, mime_type = normalize_image_async(raw).result()
+
+    assert mime_type == "image/jpeg"
+    with Image.open(io.BytesIO(normalized)) as img:
+        assert img.size == (256, 512), f"Unexpected size {img.size}"
+    assert len(normalized) < len(raw)
+    print(f"✅ {len(raw):,} → {len(normalized):,} bytes")
+
+def test_png_with_alpha_and_sample_photo():
+    img = Image.new("RGBA", (300, 200), (0, 0, 255, 128))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    normalized, _ = normalize_image(buffer.getvalue())
+    with Image.open(io.BytesIO(normalized)) as out:
+        assert out.mode == "RGB" and out.size == (300, 200)
+
+    photo = (project_root / "data-test" / "mi-quang-quang-nam.jpg").read_bytes()
+    normalized, _ = normalize_image(photo, max_dimension=512)
+    assert len(normalized) < len(photo)
+    assert pipeline_stats.snapshot()["bytes_saved"] > 0
+
+def test_invalid_image_rejected():
+    try:
+        normalize_image(b"not an image")
+        assert False, "Expected InvalidImageError"
+    except InvalidImageError:
+        print("✅ Invalid image rejected")
+
+def _png_claiming_size(width, height):
+    """Tiny PNG whose IHDR declares width x height"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(buffer, format="PNG")
+    data = bytearray(buffer.getvalue())
+    ihdr = struct.pack(">II", width, height) + bytes(data[24:29])
+    data[16:33] = ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return bytes(data)
+
+def test_decompression_bomb_rejected():
+    # 50000 x 50000 px: vượt Image.MAX_IMAGE_PIXELS, Pillow từ chối trước khi decode
+    try:
+        normalize_image(_png_claiming_size(50000, 50000))
+        assert False, "Expected InvalidImageError"
+    except InvalidImageError:
+        print("✅ Decompression bomb rejected")
+
+if __name__ == "__main__":
+    test_normalize_rotates_and_downscales()
+    test_png_with_alpha_and_sample_photo()
+    test_invalid_image_rejected()
+    test_decompression_bomb_rejected()
+    print("\n🎉 Image normalization test completed!")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test the short-lived uploaded image store used by /api/chat image_id references
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.image_store import ImageStore
+
+def test_image_store_bounds():
+    print("🧪 Testing image store...")
+
+    store = ImageStore(max_entries=2, max_bytes=10, ttl_seconds=60, directory="")
+    first = store.put(b"12345", "image/jpeg")
+    second = store.put(b"67890", "image/jpeg")
+    assert store.get(first) == (b"12345", "image/jpeg")
+
+    # Vượt giới hạn byte: ảnh ít được dùng nhất bị loại
+    third = store.put(b"abc", "image/png")
+    assert store.get(second) is None
+    assert store.get(third) == (b"abc", "image/png")
+    assert store.stats()["bytes"] <= 10
+
+    expired = ImageStore(max_entries=2, max_bytes=10, ttl_seconds=-1, directory="")
+    image_id = expired.put(b"x", "image/jpeg")
+    assert expired.get(image_id) is None
+    assert store.get("../etc/passwd") is None
+    print("✅ Entry, byte and TTL limits enforced")
+
+def test_shared_directory_between_workers():
+    directory = tempfile.mkdtemp()
+    worker_a = ImageStore(ttl_seconds=60, directory=directory)
+    worker_b = ImageStore(ttl_seconds=60, directory=directory)
+
+    image_id = worker_a.put(b"\xff\xd8jpeg", "image/jpeg")
+    assert worker_b.get(image_id) == (b"\xff\xd8jpeg", "image/jpeg")
+    print("✅ Image IDs resolve across workers")
+
+def test_directory_bounds():
+    print("🧪 Testing image store directory limits...")
+    directory = tempfile.mkdtemp()
+    worker_a = ImageStore(max_entries=2, max_bytes=10, ttl_seconds=60, directory=directory)
+    worker_b = ImageStore(max_entries=2, max_bytes=10, ttl_seconds=60, directory=directory)
+
+    # Ảnh bị loại khỏi bộ nhớ cũng bị xóa khỏi thư mục, get() không đọc lại từ đĩa
+    first = worker_a.put(b"12345", "image/jpeg")
+    second = worker_a.put(b"67890", "image/jpeg")
+    worker_a.put(b"abc", "image/png")
+    assert worker_a.get(first) is None and worker_b.get(first) is None
+    assert worker_b.get(second) == (b"67890", "image/jpeg")
+
+    # Các worker cùng ghi vào thư mục: giới hạn áp cho tổng số file
+    worker_b.put(b"xy", "image/png")
+    files = list(Path(directory).iterdir())
+    assert len(files) <= 2 and sum(f.stat().st_size for f in files) <= 10
+    print("✅ Directory holds at most max_entries / max_bytes")
+
+if __name__ == "__main__":
+    test_image_store_bounds()
+    test_shared_directory_between_workers()
+    test_directory_bounds()
+    print("\n🎉 Image store test completed!")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test the LLM completion cache with a fake LLM (no Azure calls)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from langchain.schema import HumanMessage, SystemMessage
+from app.llm_cache import CachedChatModel, LLMCompletionCache, prompt_fingerprint
+from app.testing import FakeResponse
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(f"Hanoi #{self.calls}")
+
+def _cache(**kwargs):
+    return LLMCompletionCache(path=os.path.join(tempfile.mkdtemp(), "llm_cache.db"), **kwargs)
+
+def test_cached_call_sites():
+    print("🧪 Testing LLM completion cache...")
+
+    fake = FakeLLM()
+    cache = _cache(max_entries=100, ttl_seconds=60)
+    llm = CachedChatModel(fake, cache, deployment="fake", temperature=1.0, sites={"extract_location"})
+    messages = [SystemMessage(content="Trích xuất địa điểm"), HumanMessage(content="Hà Nội là thủ đô...")]
+
+    first = llm.invoke(messages, site="extract_location")
+    second = llm.invoke(messages, site="extract_location")
+    assert first.content == second.content == "Hanoi #1"
+    assert fake.calls == 1
+
+    # Call site không opt-in luôn gọi model
+    llm.invoke(messages, site="generate_response")
+    llm.invoke(messages)
+    assert fake.calls == 3
+
+    stats = cache.stats()
+    assert stats["sites"]["extract_location"]["hits"] == 1
+    print(f"📊 Stats: {stats}")
+
+def test_fingerprint_and_limits():
+    messages = [HumanMessage(content="Phở")]
+    assert prompt_fingerprint("a", messages, 1.0) != prompt_fingerprint("b", messages, 1.0)
+    assert prompt_fingerprint("a", messages, 1.0) != prompt_fingerprint("a", messages, 0.5)
+
+    cache = _cache(max_entries=2, ttl_seconds=60)
+    for i in range(3):
+        cache.set(f"k{i}", f"v{i}", "test")
+    assert cache.stats()["entries"] == 2
+    assert cache.get("k0") is None
+
+    cache.set("old", "v", "test", ttl_seconds=-1)
+    assert cache.get("old") is None
+    print("✅ Size limit and TTL enforced")
+
+if __name__ == "__main__":
+    test_cached_call_sites()
+    test_fingerprint_and_limits()
+    print("\n🎉 LLM cache test completed!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test the offline load-testing harness: fake Azure OpenAI / OpenWeather servers and the traffic driver
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+from loadtest.fake_upstreams import FakeUpstreams, parse_profiles
+
+def test_fake_upstreams_speak_azure_protocol():
+    print("🧪 Testing fake upstreams with the real OpenAI client...")
+    from openai import AzureOpenAI
+
+    profiles = parse_profiles("llm=1:0,vision=1:0,embeddings=1:0,weather=1:0", "weather=1:503")
+    with FakeUpstreams(profiles=profiles, embedding_dimensions=64) as fake:
+        env = fake.app_env()
+        client = AzureOpenAI(azure_endpoint=env['AZURE_OPENAI_ENDPOINT'], api_key='fake-key',
+                             api_version=env['AZURE_OPENAI_API_VERSION'], max_retries=0)
+
+        # Client mặc định gửi encoding_format=base64
+        first = client.embeddings.create(input="Phở Hà Nội", model="fake-embedding").data[0].embedding
+        again = client.embeddings.create(input="Phở Hà Nội", model="fake-embedding", encoding_format="float")
+        assert len(first) == 64 and abs(sum(x * x for x in first) - 1) < 1e-4
+        assert max(abs(a - b) for a, b in zip(first, again.data[0].embedding)) < 1e-6
+
+        extract = client.chat.completions.create(model="fake-chat", messages=[
+            {"role": "system", "content": "Hãy trích xuất tên thành phố hoặc địa điểm du lịch chính"},
+            {"role": "user", "content": "Phố cổ Hội An rất đẹp."}
+        ])
+        assert extract.choices[0].message.content == "Hoi An"
+
+        client.chat.completions.create(model="fake-chat", messages=[{"role": "user", "content": [
+            {"type": "text", "text": "Đây là gì?"},
+            {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}}
+        ]}])
+
+        # Lỗi được tiêm theo profile
+        response = requests.get(f"{env['OPENWEATHER_BASE_URL']}/weather", params={'q': 'Hanoi'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+
+        stats = fake.stats()
+        assert (stats['llm']['requests'], stats['vision']['requests'], stats['embeddings']['requests']) == (1, 1, 2)
+        assert stats['weather'] == {'requests': 1, 'errors': 1, 'avg_delay_ms': stats['weather']['avg_delay_ms']}
+    print("✅ Embeddings, chat, vision and weather answered offline")
+
+def test_load_run_reports_every_endpoint():
+    print("🧪 Testing a short mixed load run...")
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp) / "report.json"
+        output = subprocess.run(
+            [sys.executable, "-m", "loadtest.run", "--tiny-tts", "--duration", "3", "--concurrency", "2",
+             "--mix", "text=2,image=1,tts=1", "--latency", "llm=20:0,vision=20:0,embeddings=2:0,weather=2:0",
+             "--seed", "1", "--json", str(report_path)],
+            capture_output=True, text=True, cwd=project_root, timeout=600
+        )
+        assert output.returncode == 0, output.stdout + output.stderr
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+
+    endpoints = report["endpoints"]
+    assert set(endpoints) == {"POST /api/chat", "POST /api/chat (image)", "POST /api/tts"}
+    for name, r in endpoints.items():
+        assert r["requests"] > 0 and r["error_rate"] == 0, (name, r)
+        assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+    assert report["upstreams"]["llm"]["requests"] > 0 and report["upstreams"]["embeddings"]["requests"] > 0
+    print(f"✅ Load run report: {endpoints}")
+
+if __name__ == "__main__":
+    test_fake_upstreams_speak_azure_protocol()
+    test_load_run_reports_every_endpoint()
+    print("\n✅ All load test harness tests passed!")
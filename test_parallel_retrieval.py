@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test that text retrieval runs in parallel with image analysis (fake LLM / vector DB)
+"""
+
+import io
+import sys
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+from app.testing import FakeResponse, build_offline_agent
+
+VISION_DELAY = 0.5
+RETRIEVAL_DELAY = 0.4
+
+class FakeLLM:
+    def __init__(self, reply, delay=0.0):
+        self.reply = reply
+        self.delay = delay
+
+    def invoke(self, messages):
+        time.sleep(self.delay)
+        return FakeResponse(self.reply)
+
+class FakeDBManager:
+    CORPUS = {
+        "phở": ("doc_pho", "Phở Thìn - 13 Lò Đúc, Hà Nội", 0.2),
+        "mì quảng": ("doc_mi_quang", "Mì Quảng Bà Mua - 19 Trần Bình Trọng, Đà Nẵng", 0.1),
+    }
+
+    def __init__(self):
+        self.queries = []
+
+    def query_documents(self, query_text, n_results=5):
+        time.sleep(RETRIEVAL_DELAY)
+        self.queries.append(query_text)
+        hits = [v for k, v in self.CORPUS.items() if k in query_text.lower()]
+        return {
+            "ids": [[h[0] for h in hits]],
+            "documents": [[h[1] for h in hits]],
+            "distances": [[h[2] for h in hits]],
+        }
+
+def _image_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (220, 180, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def _run_mixed_query(agent, query):
+    state = {"query": query, "image_data": _image_bytes(), "image_type": "image/jpeg",
+             "retrieved_docs": [], "retrieved_ids": [], "retrieved_distances": []}
+    start = time.perf_counter()
+    state = agent._retrieve_docs(agent._analyze_input(state))
+    return state, time.perf_counter() - start
+
+def test_mixed_query_retrieves_in_parallel():
+    print("🧪 Testing parallel retrieval for text + image...")
+
+    db = FakeDBManager()
+    agent = build_offline_agent(FakeLLM(""), FakeLLM("Đây là món mì Quảng", delay=VISION_DELAY), db)
+
+    # Kết quả text đủ gần và câu hỏi không chỉ vào ảnh: không truy vấn thêm theo mô tả ảnh.
+    # Truy vấn text chạy song song với vision, nếu nối tiếp thì tổng là vision + 1 lần truy vấn
+    state, elapsed = _run_mixed_query(agent, "Quán phở nào ngon?")
+    assert db.queries == ["Quán phở nào ngon?"]
+    assert state["retrieved_ids"] == ["doc_pho"]
+    assert "mì Quảng" in state["query"], "The image description still reaches the LLM"
+    assert VISION_DELAY <= elapsed < VISION_DELAY + RETRIEVAL_DELAY * 0.5
+    print(f"✅ Mixed query retrieval took {elapsed:.2f}s")
+
+def test_mixed_query_searches_image_when_needed():
+    db = FakeDBManager()
+    agent = build_offline_agent(FakeLLM(""), FakeLLM("Đây là món mì Quảng", delay=VISION_DELAY), db)
+
+    # Câu hỏi chỉ vào ảnh: truy vấn thêm theo mô tả ảnh, nối tiếp sau vision
+    state, elapsed = _run_mixed_query(agent, "Quán phở này hay món trong ảnh ngon hơn?")
+    assert db.queries[1:] == ["Đây là món mì Quảng"]
+    assert state["retrieved_ids"] == ["doc_mi_quang", "doc_pho"], "Merged by distance"
+    assert VISION_DELAY + RETRIEVAL_DELAY <= elapsed < VISION_DELAY + RETRIEVAL_DELAY * 1.5
+
+    # Không tìm được gì theo text
+    db.queries.clear()
+    state, _ = _run_mixed_query(agent, "Ăn ở quán nào ngon?")
+    assert db.queries == ["Ăn ở quán nào ngon?", "Đây là món mì Quảng"]
+    assert state["retrieved_ids"] == ["doc_mi_quang"]
+
+def test_text_only_query_single_retrieval():
+    db = FakeDBManager()
+    agent = build_offline_agent(FakeLLM(""), db_manager=db)
+
+    state = {"query": "Phở ở đâu ngon?", "image_data": None, "retrieved_docs": []}
+    state = agent._retrieve_docs(agent._analyze_input(state))
+    assert db.queries == ["Phở ở đâu ngon?"]
+    assert state["retrieved_docs"] == ["Phở Thìn - 13 Lò Đúc, Hà Nội"]
+
+if __name__ == "__main__":
+    test_mixed_query_retrieves_in_parallel()
+    test_mixed_query_searches_image_when_needed()
+    test_text_only_query_single_retrieval()
+    print("\n🎉 Parallel retrieval test completed!")
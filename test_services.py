@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test lazy service construction, deferred heavy imports and the /healthz, /readyz endpoints
+"""
+
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from app.services import LazyService
+
+def test_lazy_service_builds_once():
+    print("🧪 Testing lazy service construction...")
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.1)
+        return object()
+
+    service = LazyService("demo", factory)
+    assert service.status()["state"] == "not_loaded"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 8 thread cùng gọi nhưng chỉ khởi tạo một lần
+    assert len(calls) == 1 and len({id(r) for r in results}) == 1
+    assert service.status()["state"] == "loaded" and service.status()["load_ms"] >= 100
+
+    def broken():
+        raise RuntimeError("model missing")
+
+    failing = LazyService("broken", broken)
+    try:
+        failing.get()
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    assert failing.status() == {"state": "failed", "load_ms": None, "error": "model missing"}
+    print("✅ Service built once for concurrent callers")
+
+def test_routes_import_is_light():
+    print("🧪 Testing deferred heavy imports...")
+    code = (
+        "import sys; from app import create_app; create_app(warm_up=False); "
+        "print([m for m in ('torch', 'transformers', 'chromadb', 'langgraph') if m in sys.modules])"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=project_root)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip().splitlines()[-1] == "[]", output.stdout
+    print("✅ create_app() imports no torch/transformers/chromadb/langgraph")
+
+def test_health_and_readiness():
+    print("🧪 Testing /healthz and /readyz...")
+    from app import create_app, services
+
+    class FakeTTS:
+        ready = False
+
+    app = create_app(warm_up=False)
+    client = app.test_client()
+
+    response = client.get("/healthz")
+    assert response.status_code == 200 and response.json["status"] == "ok"
+    assert set(response.json["services"]) == {"db", "agent", "documents", "tts"}
+
+    services.set_service("agent", None)
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.json["waiting_for"] == ["agent"]
+
+    services.set_service("agent", object())
+    services.set_service("tts", FakeTTS())
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    # TTS đã khởi tạo nhưng model chưa sẵn sàng
+    assert response.json["services"]["tts"] == {"state": "loaded", "load_ms": None, "ready": False}
+
+    services.set_service("agent", None)
+    services.set_service("tts", None)
+    print("✅ Readiness follows READINESS_SERVICES")
+
+def test_after_fork_sets_worker_threads():
+    print("🧪 Testing per-worker setup after fork...")
+    import torch
+    from app import services
+    from app.testing import build_tiny_tts
+
+    saved = (Config.TTS_NUM_THREADS, Config.SERVICES_WARMUP, torch.get_num_threads())
+    Config.SERVICES_WARMUP = []
+    tts = build_tiny_tts()
+    services.set_service("tts", tts)
+    try:
+        services.after_fork(torch_threads=1)
+        assert Config.TTS_NUM_THREADS == 1 and torch.get_num_threads() == 1
+        # Model đã load trong master vẫn dùng được sau khi đổi số thread
+        assert tts.text_to_speech("Xin chào.")[:4] == b"RIFF"
+    finally:
+        Config.TTS_NUM_THREADS, Config.SERVICES_WARMUP = saved[0], saved[1]
+        torch.set_num_threads(saved[2])
+        services.set_service("tts", None)
+    print("✅ Worker torch threads pinned after fork")
+
+if __name__ == "__main__":
+    test_lazy_service_builds_once()
+    test_routes_import_is_light()
+    test_health_and_readiness()
+    test_after_fork_sets_worker_threads()
+    print("\n✅ All service tests passed!")
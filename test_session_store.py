@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test server-side chat session stores (memory LRU and SQLite tier)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import app.session_store as session_store
+from app.session_store import MemorySessionStore, SQLiteSessionStore
+
+def test_memory_store_lru_and_ttl():
+    print("🧪 Testing memory session store...")
+
+    store = MemorySessionStore(max_entries=2, ttl_seconds=60)
+    store.set("a", {"chat_history": []})
+    store.set("b", {"chat_history": []})
+    store.get("a")  # "a" vừa được dùng nên "b" bị loại trước
+    store.set("c", {"chat_history": []})
+
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert store.stats()["evictions"] == 1
+
+    expired = MemorySessionStore(max_entries=10, ttl_seconds=-1)
+    expired.set("x", {"chat_history": []})
+    assert expired.get("x") is None
+    print("✅ LRU eviction and TTL work")
+
+def test_sqlite_store_shared_between_workers():
+    print("🧪 Testing SQLite session store...")
+
+    path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    worker_a = SQLiteSessionStore(path=path)
+    worker_b = SQLiteSessionStore(path=path)
+
+    worker_a.set("s1", {"chat_history": [{"role": "user", "content": "Xin chào"}]})
+    assert worker_b.get("s1")["chat_history"][0]["content"] == "Xin chào"
+
+    # Worker B cập nhật, worker A không được trả về bản cũ trong bộ nhớ đệm
+    worker_b.set("s1", {"chat_history": [], "history_summary": "Hỏi về Hà Nội"})
+    assert worker_a.get("s1")["history_summary"] == "Hỏi về Hà Nội"
+
+    worker_a.delete("s1")
+    assert worker_b.get("s1") is None
+    print("✅ Sessions are shared and never served stale")
+
+def test_concurrent_writes_get_their_own_version():
+    print("🧪 Testing concurrent session writes...")
+    for returning in (True, False):  # RETURNING (SQLite >= 3.35) và BEGIN IMMEDIATE
+        saved, session_store._SUPPORTS_RETURNING = session_store._SUPPORTS_RETURNING, returning
+        try:
+            path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+            workers = [SQLiteSessionStore(path=path) for _ in range(12)]
+            barrier = threading.Barrier(len(workers))
+
+            def write(index):
+                barrier.wait()
+                workers[index].set("s1", {"writer": index})
+
+            threads = [threading.Thread(target=write, args=(i,)) for i in range(len(workers))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            # Mỗi worker nhớ đúng version của lần ghi của chính nó
+            versions = sorted(w.memory.get("s1")[0] for w in workers)
+            assert versions == list(range(1, len(workers) + 1)), versions
+            latest = max(workers, key=lambda w: w.memory.get("s1")[0])
+            assert all(w.get("s1") == latest.memory.get("s1")[1] for w in workers)
+        finally:
+            session_store._SUPPORTS_RETURNING = saved
+    print("✅ Every write caches the version it created")
+
+if __name__ == "__main__":
+    test_memory_store_lru_and_ttl()
+    test_sqlite_store_shared_between_workers()
+    test_concurrent_writes_get_their_own_version()
+    print("\n🎉 Session store test completed!")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test collection snapshot export/import: round trip, checksum and model checks, no embedding calls
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from app.snapshot import SnapshotError, export_snapshot, import_snapshot
+from app.testing import FakeEmbeddings, build_fake_db_manager
+
+DOCUMENTS = 2000
+DIMENSIONS = 1536
+
+def _manager(path):
+    # Import snapshot không được gọi embedding API
+    return build_fake_db_manager(path, FakeEmbeddings(live=False))
+
+def _fill(db, rng):
+    vectors = rng.standard_normal((DOCUMENTS, DIMENSIONS)).astype(np.float32)
+    for start in range(0, DOCUMENTS, 1000):
+        db.collection.add(
+            ids=[f"doc_{i}" for i in range(start, start + 1000)],
+            documents=[f"Địa điểm du lịch số {i}" for i in range(start, start + 1000)],
+            metadatas=[{"source": "test", "chunk_id": i} for i in range(start, start + 1000)],
+            embeddings=vectors[start:start + 1000]
+        )
+    return vectors
+
+def test_snapshot_round_trip():
+    print("🧪 Testing snapshot export/import...")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = _manager(str(Path(tmp) / "source"))
+        vectors = _fill(source, rng)
+        snapshot_dir = str(Path(tmp) / "snapshot")
+        manifest = export_snapshot(source, snapshot_dir, embedding_model="text-embedding-3-small")
+        assert (manifest["count"], manifest["dimensions"], manifest["dtype"]) == (DOCUMENTS, DIMENSIONS, "float32")
+        assert manifest["collection_metadata"]["hnsw:space"] == "cosine"
+
+        # Node mới: collection có sẵn dữ liệu cũ, --replace xóa trước khi nạp
+        target = _manager(str(Path(tmp) / "target"))
+        target.collection.add(ids=["stale"], documents=["cũ"], embeddings=[[0.0] * DIMENSIONS])
+        start = time.perf_counter()
+        imported = import_snapshot(target, snapshot_dir, embedding_model="text-embedding-3-small", replace=True)
+        elapsed = time.perf_counter() - start
+        assert target.collection.count() == DOCUMENTS
+
+        # Vector được nạp nguyên vẹn (HNSW xây lại nên chỉ so hàng xóm gần nhất)
+        stored = target.collection.get(ids=["doc_0", "doc_1999"], include=["embeddings"])
+        assert np.allclose(stored["embeddings"], vectors[[0, 1999]], rtol=1e-5, atol=1e-6)
+        queries = vectors[:5] + 0.01 * rng.standard_normal((5, DIMENSIONS)).astype(np.float32)
+        actual = target.collection.query(query_embeddings=queries, n_results=1)
+        assert actual["ids"] == [[f"doc_{i}"] for i in range(5)]
+        assert target.collection.get(ids=["doc_7"])["metadatas"] == [{"source": "test", "chunk_id": 7}]
+    print(f"✅ {DOCUMENTS} documents imported in {elapsed:.2f}s ({imported['import_seconds']}s), vectors intact")
+
+def test_snapshot_rejects_bad_input():
+    print("🧪 Testing snapshot validation...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _manager(str(Path(tmp) / "db"))
+        db.collection.add(ids=["a"], documents=["Hà Nội"], embeddings=[[1.0, 0.0, 0.0]])
+        snapshot_dir = Path(tmp) / "snapshot"
+        export_snapshot(db, str(snapshot_dir), embedding_model="text-embedding-3-small")
+
+        try:
+            import_snapshot(db, str(snapshot_dir), embedding_model="text-embedding-3-large")
+            assert False, "expected SnapshotError"
+        except SnapshotError as e:
+            assert "text-embedding-3-small" in str(e)
+
+        documents = snapshot_dir / "documents.jsonl"
+        documents.write_text(json.dumps({"id": "a", "document": "Hà Nội!", "metadata": None}) + "\n", encoding="utf-8")
+        try:
+            import_snapshot(db, str(snapshot_dir), embedding_model="text-embedding-3-small")
+            assert False, "expected SnapshotError"
+        except SnapshotError as e:
+            assert "Checksum mismatch" in str(e)
+    print("✅ Model mismatch and corrupt files are rejected")
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    test_snapshot_rejects_bad_input()
+    print("\n✅ All snapshot tests passed!")
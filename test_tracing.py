@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test request trace capture (stage timings, upstream calls) and deterministic replay
+"""
+
+import io
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from PIL import Image
+import app.tracing as tracing
+from app.testing import (FakeEmbeddings, FakeResponse, build_fake_db_manager, build_offline_agent,
+                         hashed_embedding)
+from loadtest.fake_upstreams import FakeUpstreams, chat_reply, parse_profiles
+
+class FakeLLM:
+    """Answers like the load-test fake upstream; fails if ``live`` is False (replay must not call it)"""
+
+    def __init__(self, live=True):
+        self.live = live
+        self.calls = 0
+
+    def invoke(self, messages):
+        assert self.live, "replay called the LLM"
+        self.calls += 1
+        return FakeResponse(chat_reply([{
+            'role': {'system': 'system', 'ai': 'assistant'}.get(m.type, 'user'), 'content': m.content
+        } for m in messages]))
+
+def _image_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 60, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def _agent(tmp, live):
+    db = build_fake_db_manager(str(Path(tmp) / "chroma"), FakeEmbeddings(live=live))
+    if live and db.collection.count() == 0:
+        from loadtest.serve import SEED_DOCUMENTS
+        db.collection.add(documents=SEED_DOCUMENTS, ids=[f"seed_{i}" for i in range(len(SEED_DOCUMENTS))],
+                          embeddings=[hashed_embedding(d) for d in SEED_DOCUMENTS])
+    return build_offline_agent(FakeLLM(live), FakeLLM(live), db)
+
+def _record(tmp):
+    saved = (Config.TRACE_ENABLED, Config.TRACE_PATH, Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL)
+    trace_path = str(Path(tmp) / "traces.jsonl")
+    fast = "llm=1:0,vision=1:0,embeddings=1:0,weather=1:0"
+    with FakeUpstreams(profiles=parse_profiles(fast)) as fake:
+        Config.TRACE_ENABLED, Config.TRACE_PATH = True, trace_path
+        Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = "secret-key", fake.app_env()['OPENWEATHER_BASE_URL']
+        tracing._writer = None
+        try:
+            agent = _agent(tmp, live=True)
+            agent.process_query("Hà Nội có món gì ngon?", session_id="session-1")
+            agent.process_query("Món này ăn ở đâu?", _image_bytes(), image_type="image/jpeg",
+                                chat_history=[{"role": "user", "content": "Chào"}, {"role": "assistant", "content": "Xin chào!"}])
+        finally:
+            Config.TRACE_ENABLED, Config.TRACE_PATH, Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = saved
+            tracing._writer = None
+    return trace_path
+
+def test_trace_capture():
+    print("🧪 Testing request trace capture...")
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = _record(tmp)
+        raw = Path(trace_path).read_text(encoding="utf-8")
+        traces = list(tracing.read_traces(trace_path))
+
+    assert len(traces) == 2
+    assert "secret-key" not in raw and "session-1" not in raw
+    text, image = traces
+
+    assert [s["name"] for s in text["stages"]] == ["analyze_input", "retrieve_docs", "generate_response",
+                                                   "get_weather", "final_response"]
+    sites = [(c["upstream"], c["site"]) for c in text["calls"]]
+    assert sites == [("embeddings", "query"), ("llm", "generate_response"), ("llm", "extract_location"),
+                     ("weather", "weather"), ("llm", "weather_advice")]
+    weather = text["calls"][3]
+    assert weather["request"]["params"]["q"] == "Hanoi" and "appid" not in weather["request"]["params"]
+    assert json.loads(weather["response"]["body"])["name"] == "Hà Nội"
+    assert len(text["outputs"]["retrieved_ids"]) == Config.RETRIEVAL_TOP_K
+    assert "Lời khuyên dựa trên thời tiết" in text["outputs"]["response"]
+
+    # Ảnh chỉ được ghi bằng hash; retrieval theo text chạy trong thread khác vẫn vào trace
+    assert image["inputs"]["image"]["sha256"] and image["inputs"]["image"]["bytes"] > 0
+    assert "base64" not in json.dumps(image["calls"])
+    assert ("vision", "image_analysis") in [(c["upstream"], c["site"]) for c in image["calls"]]
+    assert sum(1 for c in image["calls"] if c["upstream"] == "embeddings") == 2
+    print(f"✅ Recorded {len(traces)} traces, {len(text['calls'])} upstream calls in the text request")
+
+def test_replay_is_offline_and_deterministic():
+    print("🧪 Testing trace replay...")
+    from replay_traces import compare, replay_one
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recordings = list(tracing.read_traces(_record(tmp)))
+        # Không có upstream nào: LLM/embeddings giả báo lỗi nếu bị gọi, OpenWeather trỏ vào cổng đóng
+        saved = Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL
+        Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = "secret-key", "http://127.0.0.1:9/data/2.5"
+        try:
+            agent = _agent(tmp, live=False)
+            replays = [replay_one(agent, recording) for recording in recordings]
+
+            changed = dict(recordings[0], inputs=dict(recordings[0]["inputs"], query="Đà Nẵng có gì chơi?"))
+            fallback = replay_one(agent, changed)
+        finally:
+            Config.OPENWEATHER_API_KEY, Config.OPENWEATHER_BASE_URL = saved
+
+    report = compare(recordings, replays)
+    assert report["errors"] == 0, [r["error"] for r in replays]
+    assert report["same_response"] == report["same_retrieval"] == 2
+    # Vision nhận ảnh giả (trace chỉ có hash) nên khớp theo call site, mọi lệnh gọi khác khớp chính xác
+    assert report["calls"]["missing"] == 0 and report["calls"]["fallback"] == 1 and report["calls"]["exact"] > 0
+    assert set(report["latency"]) == {"analyze_input", "retrieve_docs", "generate_response", "get_weather",
+                                      "final_response", "total"}
+
+    # Prompt khác bản ghi: trả lời bằng lệnh gọi kế tiếp của cùng call site
+    assert fallback["error"] is None and fallback["replay"]["fallback"] >= 2 and fallback["replay"]["missing"] == 0
+    print(f"✅ Replay matched the recording offline: {report['calls']}")
+
+if __name__ == "__main__":
+    test_trace_capture()
+    test_replay_is_offline_and_deterministic()
+    print("\n✅ All tracing tests passed!")
@@ -8,6 +8,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.tts_service import TTSService
+from app.testing import config_overrides
 import time
 
 def test_tts():
@@ -17,7 +18,9 @@ def test_tts():
     # Initialize TTS service
     print("📥 Initializing TTS Service...")
     start_time = time.time()
-    tts = TTSService()
+    # Đo tổng hợp thật mỗi lần chạy, không ghi cache vào ./data/tts_cache
+    with config_overrides(TTS_CACHE_ENABLED=False):
+        tts = TTSService()
     init_time = time.time() - start_time
     print(f"⏱️ Initialization time: {init_time:.2f}s")
     
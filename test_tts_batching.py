@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test sentence-batched TTS synthesis with a small random-weight VITS model
+"""
+
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from app.testing import SAMPLE_TEXT, build_tiny_tts, config_overrides
+
+def test_long_text_not_truncated():
+    print("🧪 Testing that long answers are read in full...")
+    tts = build_tiny_tts()
+
+    clean_text = tts._clean_text_for_tts(" ".join([SAMPLE_TEXT] * 2))
+    assert len(clean_text) > 300
+    assert clean_text.endswith("kết thúc chuyến đi!")
+
+    sentences = tts._split_sentences(clean_text)
+    assert len(sentences) == 16
+    assert all(len(s) <= Config.TTS_SENTENCE_MAX_CHARS for s in sentences)
+    print(f"✅ {len(clean_text)} chars -> {len(sentences)} sentences")
+
+def test_long_sentence_split_at_commas():
+    tts = build_tiny_tts()
+    sentence = ", ".join(["phở bò tái chín"] * 30) + "."
+    parts = tts._split_sentences(sentence)
+    assert len(parts) > 1
+    assert all(len(p) <= Config.TTS_SENTENCE_MAX_CHARS for p in parts)
+    assert tts._split_sentences("... !!! ?") == []
+
+@config_overrides(TTS_BATCH_SIZE=8)
+def test_batched_synthesis_trims_padding():
+    print("🧪 Testing padded batch inference...")
+    tts = build_tiny_tts()
+    sentences = ["Xin chào.", "Phở bò là món ăn truyền thống của Việt Nam, rất nổi tiếng."]
+
+    calls = []
+    original = tts._synthesize_batch
+    tts._synthesize_batch = lambda batch: calls.append(len(batch)) or original(batch)
+
+    waveforms = original(sentences)
+    assert len(waveforms[0]) < len(waveforms[1]), "Padding trimmed from the short sentence"
+
+    audio = tts.synthesize(" ".join(sentences))
+    pause = int(tts.model.config.sampling_rate * Config.TTS_SENTENCE_PAUSE)
+    assert calls == [2], "Both sentences in one forward pass"
+    assert audio.ndim == 1
+    # Kết quả VITS có nhiễu ngẫu nhiên nên chỉ kiểm tra độ dài gần đúng
+    assert abs(len(audio) - (sum(len(w) for w in waveforms) + pause)) < len(waveforms[1])
+    print(f"✅ {len(audio)} samples from {len(sentences)} sentences")
+
+def test_text_to_speech_returns_wav():
+    tts = build_tiny_tts()
+    audio_bytes = tts.text_to_speech("Xin chào! Tôi là trợ lý du lịch AI.")
+    assert audio_bytes[:4] == b"RIFF"
+
+if __name__ == "__main__":
+    test_long_text_not_truncated()
+    test_long_sentence_split_at_commas()
+    test_batched_synthesis_trims_padding()
+    test_text_to_speech_returns_wav()
+    print("\n🎉 TTS batching test completed!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the two-tier TTS audio cache (memory LRU + size-capped disk) and cache warming
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.tts_cache import TTSAudioCache, audio_cache_key
+from app.testing import build_tiny_tts
+
+def test_memory_and_disk_tiers():
+    print("🧪 Testing TTS audio cache tiers...")
+    directory = tempfile.mkdtemp(prefix="tts-cache-")
+    cache = TTSAudioCache(directory=directory, max_memory_bytes=250, max_disk_bytes=10_000)
+
+    for i in range(3):
+        cache.set(audio_cache_key("m", f"câu {i}."), bytes([i]) * 100)
+
+    # Bộ nhớ chỉ giữ được 2 mục, mục đầu tiên vẫn còn trên đĩa
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get(audio_cache_key("m", "câu 0.")) == bytes([0]) * 100
+    assert cache.get(audio_cache_key("m", "câu 2.")) == bytes([2]) * 100
+    assert cache.get(audio_cache_key("m", "khác.")) is None
+
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+    # Khởi động lại: đọc được từ đĩa
+    reopened = TTSAudioCache(directory=directory, max_memory_bytes=250, max_disk_bytes=10_000)
+    assert reopened.stats()["disk_bytes"] == 300
+    assert reopened.get(audio_cache_key("m", "câu 1.")) == bytes([1]) * 100
+    print(f"✅ Cache stats: {stats}")
+
+def test_disk_tier_size_cap():
+    directory = tempfile.mkdtemp(prefix="tts-cache-")
+    cache = TTSAudioCache(directory=directory, max_memory_bytes=1000, max_disk_bytes=1000)
+
+    for i in range(15):
+        cache.set(f"{i:064x}", b"x" * 100)
+
+    files = [f for f in os.listdir(directory) if f.endswith(".pcm")]
+    assert sum(os.path.getsize(os.path.join(directory, f)) for f in files) <= 1000
+    assert cache.stats()["disk_evictions"] > 0
+
+def test_service_hit_skips_synthesis():
+    print("🧪 Testing cached synthesis and warming...")
+    cache = TTSAudioCache(directory=tempfile.mkdtemp(prefix="tts-cache-"))
+    tts = build_tiny_tts()
+    tts.audio_cache = cache  # Dùng thư mục tạm thay vì ./data/tts_cache
+
+    calls = []
+    original = tts.synthesize
+    tts.synthesize = lambda text: calls.append(text) or original(text)
+
+    greeting = "Xin chào! Tôi là trợ lý du lịch AI."
+    first = tts.text_to_speech(greeting)
+    second = tts.text_to_speech(greeting)
+    assert first == second and len(calls) == 1
+
+    # Bản stream dùng chung cache với bản đầy đủ
+    streamed = list(tts.stream_wav(greeting))
+    assert len(calls) == 1 and len(streamed) == 2
+
+    # Warm: câu đã có trong cache được bỏ qua, câu mới được tổng hợp
+    result = tts.warm_cache([greeting, "Phở bò là món ăn truyền thống."])
+    assert result == {"warmed": 1, "skipped": 1}
+    tts.text_to_speech("Phở bò là món ăn truyền thống.")
+    assert len(calls) == 2
+
+    # Warm mặc định: các câu được yêu cầu nhiều nhất
+    assert tts.warm_cache() == {"warmed": 0, "skipped": 2}
+    assert cache.stats()["hit_rate"] > 0.5
+    print(f"✅ {cache.stats()}")
+
+if __name__ == "__main__":
+    test_memory_and_disk_tiers()
+    test_disk_tier_size_cap()
+    test_service_hit_skips_synthesis()
+    print("\n🎉 TTS cache test completed!")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test binary TTS encodings (16-bit WAV, OGG/Opus, MP3) at the model's sampling rate
+"""
+
+import io
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import soundfile as sf
+from app.tts_service import AUDIO_FORMATS, tts_stats
+from app.testing import SAMPLE_TEXT, build_tiny_tts
+
+def test_formats_use_model_sampling_rate():
+    print("🧪 Testing TTS audio formats...")
+    tts = build_tiny_tts()
+    sampling_rate = tts.model.config.sampling_rate
+
+    sizes = {}
+    for audio_format in AUDIO_FORMATS:
+        audio_bytes = tts.text_to_speech(SAMPLE_TEXT, audio_format)
+        audio, rate = sf.read(io.BytesIO(audio_bytes))
+        assert rate == sampling_rate, f"{audio_format} written at {rate} Hz"
+        sizes[audio_format] = len(audio_bytes)
+        print(f"   {audio_format}: {len(audio_bytes)} bytes, {len(audio) / rate:.1f}s")
+
+    info = sf.info(io.BytesIO(tts.text_to_speech("Xin chào.", "wav")))
+    assert info.subtype == "PCM_16"
+
+    # Định dạng nén nhỏ hơn nhiều so với WAV
+    assert sizes["ogg"] < sizes["wav"] / 4
+    assert sizes["mp3"] < sizes["wav"] / 4
+
+    payload = tts_stats.snapshot()["payload"]
+    assert set(AUDIO_FORMATS) <= set(payload)
+    print("✅ All formats encoded at the model sampling rate")
+
+if __name__ == "__main__":
+    test_formats_use_model_sampling_rate()
+    print("\n🎉 TTS formats test completed!")
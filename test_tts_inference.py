@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test CPU inference modes (int8, TorchScript, ONNX) against the fp32 output
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import torch
+
+from app.tts_runtime import compare_to_reference
+from app.testing import SAMPLE_TEXT, build_tiny_tts, config_overrides
+
+def _synthesize(mode):
+    tts = build_tiny_tts(mode, deterministic=True)
+    return tts, tts.synthesize(tts._clean_text_for_tts(SAMPLE_TEXT))
+
+def test_modes_match_fp32():
+    print("🧪 Testing TTS inference modes against fp32...")
+    modes = ["int8", "torchscript"]
+    if importlib.util.find_spec("onnx") and importlib.util.find_spec("onnxruntime"):
+        modes.append("onnx")
+
+    with tempfile.TemporaryDirectory(prefix="tts-export-") as export_dir, \
+            config_overrides(TTS_CACHE_ENABLED=False, TTS_EXPORT_DIR=export_dir):
+        _, reference = _synthesize("fp32")
+        for mode in modes:
+            tts, audio = _synthesize(mode)
+            assert tts.inference_mode == mode
+            quality = compare_to_reference(reference, audio)
+            assert 0.9 <= quality["duration_ratio"] <= 1.1, quality
+            assert quality["log_spectral_distance_db"] < 3, quality
+            print(f"✅ {mode}: {quality}")
+
+        # Lần sau nạp lại file đã export thay vì export lại
+        tts, _ = _synthesize("torchscript")
+        exported = os.stat(tts.runner.path).st_mtime_ns
+        assert _synthesize("torchscript")[0].runner.path == tts.runner.path
+        assert os.stat(tts.runner.path).st_mtime_ns == exported
+
+        # Model khác (ở đây: noise_scale trong config) -> export lại, xóa bản cũ
+        changed = build_tiny_tts("torchscript")
+        assert changed.runner.path != tts.runner.path and not os.path.exists(tts.runner.path)
+        assert sorted(f for f in os.listdir(export_dir) if f.endswith(".pt")) == [os.path.basename(changed.runner.path)]
+
+@config_overrides(TTS_CACHE_ENABLED=False, TTS_NUM_THREADS=2)
+def test_threads_and_fallback():
+    threads = torch.get_num_threads()
+    try:
+        tts = build_tiny_tts("fp32")
+        assert torch.get_num_threads() == 2
+    finally:
+        torch.set_num_threads(threads)
+
+    tts._init_runner("bogus")
+    assert tts.inference_mode == "fp32", "Unknown mode falls back to fp32"
+
+if __name__ == "__main__":
+    test_modes_match_fp32()
+    test_threads_and_fallback()
+    print("\n🎉 TTS inference test completed!")
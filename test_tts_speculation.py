@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test speculative TTS pre-synthesis: prefix reuse, full-answer hits and the CPU guards
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import app.upstream as upstream
+from app.tts_cache import TTSAudioCache, audio_cache_key
+from app.tts_service import SpeculationStats, speculation_stats
+from app.upstream import AdmissionLimiter
+from app.testing import SAMPLE_TEXT, build_tiny_tts, config_overrides
+
+# MAX_LOAD=0: không phụ thuộc tải của máy chạy test
+speculation_config = config_overrides(TTS_CACHE_ENABLED=False, TTS_SPECULATIVE_ENABLED=True,
+                                      TTS_SPECULATIVE_SENTENCES=2, TTS_SPECULATIVE_MAX_LOAD=0)
+
+def _tiny_tts_with_cache():
+    tts = build_tiny_tts(deterministic=True)
+    tts.audio_cache = TTSAudioCache(directory=tempfile.mkdtemp(prefix="tts-cache-"))
+    return tts
+
+@speculation_config
+def test_prefix_speculation():
+    print("🧪 Testing speculative prefix synthesis...")
+    tts = _tiny_tts_with_cache()
+    hits_before = speculation_stats.hits
+
+    assert tts.speculate(SAMPLE_TEXT) == "synthesized"
+    assert tts.speculate(SAMPLE_TEXT) == "cached"
+
+    # Stream: chunk đầu tiên chính là phần đã tổng hợp trước (2 câu)
+    clean_text = tts._clean_text_for_tts(SAMPLE_TEXT)
+    sentences = tts._split_sentences(clean_text)
+    chunks = list(tts.stream_wav(SAMPLE_TEXT))
+    assert len(chunks) == 1 + 1 + len(sentences) - 2
+    assert speculation_stats.hits == hits_before + 1
+
+    # Lần stream sau lấy nguyên câu trả lời từ cache
+    assert len(list(tts.stream_wav(SAMPLE_TEXT))) == 2
+    print(f"✅ Speculation stats: {speculation_stats.snapshot()}")
+
+@speculation_config
+def test_short_answer_and_full_tts():
+    tts = _tiny_tts_with_cache()
+    hits_before = speculation_stats.hits
+
+    # Câu trả lời ngắn: tổng hợp toàn bộ, /api/tts lấy thẳng từ cache
+    text = "Xin chào! Tôi là trợ lý du lịch AI."
+    assert tts.speculate(text) == "synthesized"
+    assert tts.audio_cache.contains(audio_cache_key(tts.model_id, tts._clean_text_for_tts(text)))
+    assert tts.text_to_speech(text)[:4] == b"RIFF"
+    assert speculation_stats.hits == hits_before + 1
+
+    # Câu trả lời dài qua text_to_speech: dùng prefix rồi tổng hợp phần còn lại
+    assert tts.speculate(SAMPLE_TEXT) == "synthesized"
+    assert tts.text_to_speech(SAMPLE_TEXT)[:4] == b"RIFF"
+    assert speculation_stats.hits == hits_before + 2
+
+@speculation_config
+def test_cpu_guards():
+    print("🧪 Testing speculation CPU guards...")
+    tts = _tiny_tts_with_cache()
+
+    # Đang có request thật: không tổng hợp trước
+    with tts._live_request():
+        assert tts.speculate(SAMPLE_TEXT) == "busy"
+    assert not tts.audio_cache.contains(tts._prefix_key(tts._clean_text_for_tts(SAMPLE_TEXT)))
+
+    # Slot tts đang bận (process khác giữ): bỏ qua ngay, không chờ ADMISSION_QUEUE_TIMEOUT
+    saved = upstream._limiters["tts"]
+    limiter = upstream._limiters["tts"] = AdmissionLimiter("tts", max_concurrent=1, max_queue=4, queue_timeout=5)
+    try:
+        admitted_at = limiter.acquire()
+        start = time.perf_counter()
+        assert tts.speculate(SAMPLE_TEXT) == "busy"
+        assert time.perf_counter() - start < 1 and limiter.stats()["waiting"] == 0
+        limiter.release(admitted_at)
+        assert tts.speculate("Hẹn gặp lại bạn nhé.") == "synthesized"
+        assert limiter.stats()["in_flight"] == 0
+    finally:
+        upstream._limiters["tts"] = saved
+
+    # Hàng đợi đầy: câu trả lời mới bị bỏ qua
+    stats = SpeculationStats()
+    assert stats.try_schedule(max_pending=1)
+    assert not stats.try_schedule(max_pending=1)
+    stats.started()
+    assert stats.try_schedule(max_pending=1)
+    assert stats.snapshot()["skipped"] == {"queue_full": 1}
+
+    # Chạy nền qua executor ưu tiên thấp
+    assert tts.speculate_async("Hẹn gặp lại bạn.").result() == "synthesized"
+    print("✅ Guards skip speculation while live requests run")
+
+if __name__ == "__main__":
+    test_prefix_speculation()
+    test_short_answer_and_full_tts()
+    test_cpu_guards()
+    print("\n✅ All speculative TTS tests passed!")
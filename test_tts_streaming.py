@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test streamed TTS: WAV header, sentence-by-sentence PCM chunks and time-to-first-audio
+"""
+
+import io
+import struct
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import soundfile as sf
+from config import Config
+from app.tts_service import tts_stats, wav_stream_header
+from app.testing import SAMPLE_TEXT, build_tiny_tts
+
+def test_wav_stream_header():
+    header = wav_stream_header(16000)
+    assert len(header) == 44
+    assert header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+    assert struct.unpack("<I", header[24:28])[0] == 16000
+
+def test_first_chunk_after_first_sentence():
+    print("🧪 Testing streamed TTS...")
+    tts = build_tiny_tts()
+    clean_text = tts._clean_text_for_tts(SAMPLE_TEXT)
+    sentences = tts._split_sentences(clean_text)
+
+    batches = []
+    original = tts._synthesize_batch
+    tts._synthesize_batch = lambda batch: batches.append(len(batch)) or original(batch)
+
+    batch_size, Config.TTS_BATCH_SIZE = Config.TTS_BATCH_SIZE, 4
+    try:
+        stream = tts.stream_wav(SAMPLE_TEXT)
+        header = next(stream)
+        first_chunk = next(stream)
+        assert batches == [1], "Only the first sentence synthesized before the first audio chunk"
+        assert len(first_chunk) > 0 and len(first_chunk) % 2 == 0
+
+        chunks = [first_chunk] + list(stream)
+    finally:
+        Config.TTS_BATCH_SIZE = batch_size
+    assert len(chunks) == len(sentences)
+    assert batches == [1, 4, 3]
+
+    audio, sampling_rate = sf.read(io.BytesIO(header + b"".join(chunks)), dtype="int16")
+    assert sampling_rate == tts.model.config.sampling_rate
+    assert len(audio) == sum(len(c) for c in chunks) // 2
+
+    stats = tts_stats.snapshot()["stream"]
+    assert stats["requests"] >= 1 and stats["avg_time_to_first_audio_ms"] is not None
+    print(f"✅ {len(chunks)} chunks, time to first audio {stats['avg_time_to_first_audio_ms']}ms")
+
+if __name__ == "__main__":
+    test_wav_stream_header()
+    test_first_chunk_after_first_sentence()
+    print("\n🎉 TTS streaming test completed!")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the out-of-process TTS worker pool: jobs, streaming, backpressure and restarts
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.tts_service import TTSService
+from app.tts_workers import TTSBusyError, TTSWorkerError, TTSWorkerPool
+from app.testing import SAMPLE_TEXT, config_overrides
+
+FACTORY = "app.testing:build_tiny_tts"
+
+# TTSService(pool=...) không được ghi vào ./data/tts_cache, nếu không lần chạy sau toàn cache hit
+no_audio_cache = config_overrides(TTS_CACHE_ENABLED=False)
+
+@no_audio_cache
+def test_worker_pool():
+    print("🧪 Testing TTS worker pool...")
+    pool = TTSWorkerPool(num_workers=1, max_queue=0, factory=FACTORY)
+    try:
+        assert pool.wait_ready() and pool.sampling_rate == 16000
+
+        tts = TTSService(pool=pool)
+        assert tts.ready and tts.model is None
+        audio = tts.text_to_speech("Xin chào! Tôi là trợ lý du lịch AI.")
+        assert audio[:4] == b"RIFF"
+
+        # Stream: header + một chunk cho mỗi câu
+        chunks = list(tts.stream_wav(SAMPLE_TEXT))
+        assert len(chunks) == 1 + len(tts._split_sentences(SAMPLE_TEXT))
+
+        # Worker duy nhất đang bận và không có hàng đợi -> từ chối ngay
+        long_job = threading.Thread(target=pool.synthesize, args=(" ".join([SAMPLE_TEXT] * 3),))
+        long_job.start()
+        time.sleep(0.2)
+        try:
+            pool.synthesize("Xin chào.")
+            assert False, "Expected TTSBusyError"
+        except TTSBusyError as e:
+            assert e.retry_after >= 1
+        long_job.join()
+
+        stats = pool.stats()
+        assert stats["rejected"] == 1 and stats["completed"] == 3
+        assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+        print(f"✅ Pool stats: {stats}")
+    finally:
+        pool.shutdown()
+
+@no_audio_cache
+def test_worker_restart_after_crash():
+    pool = TTSWorkerPool(num_workers=1, max_queue=1, factory=FACTORY)
+    try:
+        assert pool.wait_ready()
+        # Worker chết lúc đang rảnh: job được chạy trên worker khởi động lại, không lỗi
+        process = next(iter(pool._processes.values()))
+        process.kill()
+        process.wait()
+        assert len(pool.synthesize("Xin chào.")) > 0
+        assert pool.stats()["restarts"] == 1 and pool.stats()["alive"] == 1
+
+        # Worker chết giữa job, trước khi trả kết quả: job được chạy lại một lần
+        results = []
+        job = threading.Thread(target=lambda: results.append(pool.synthesize(" ".join([SAMPLE_TEXT] * 3))))
+        job.start()
+        time.sleep(0.3)
+        next(iter(pool._processes.values())).kill()
+        job.join()
+        assert results and len(results[0]) > 0
+        stats = pool.stats()
+        assert stats["restarts"] == 2 and stats["retried"] == 1 and stats["errors"] == 0
+    finally:
+        pool.shutdown()
+
+@no_audio_cache
+def test_worker_that_cannot_start():
+    print("🧪 Testing a worker that fails to start...")
+    start = time.perf_counter()
+    pool = TTSWorkerPool(num_workers=1, max_queue=1, factory="app.tts_workers:no_such_factory", restart_delay=60)
+    try:
+        # Process chết khi load model: không treo tới start_timeout
+        assert not pool.wait_ready() and time.perf_counter() - start < 30
+        tts = TTSService(pool=pool)
+        assert not tts.ready
+        try:
+            pool.synthesize("Xin chào.")
+            assert False, "Expected TTSWorkerError"
+        except TTSWorkerError:
+            pass
+        assert pool.stats()["alive"] == 0
+    finally:
+        pool.shutdown()
+    print(f"✅ Failed start detected in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    test_worker_pool()
+    test_worker_restart_after_crash()
+    test_worker_that_cannot_start()
+    print("\n🎉 TTS worker pool test completed!")
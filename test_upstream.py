@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test shared upstream layer: retries, circuit breaker and connection reuse
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from app.upstream import (CircuitBreaker, UpstreamUnavailable, call_with_retry, get_breaker,
+                          http_get, upstream_stats)
+
+class FlakyWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fail_next = 0
+
+    def do_GET(self):
+        if FlakyWeatherHandler.fail_next > 0:
+            FlakyWeatherHandler.fail_next -= 1
+            status, body = 503, b'{}'
+        else:
+            status, body = 200, b'{"name": "Hanoi"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_weather_retry_and_connection_reuse():
+    print("🧪 Testing retries and keep-alive...")
+    Config.UPSTREAM_RETRY_BASE_DELAY = 0.01
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyWeatherHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/weather"
+
+    try:
+        FlakyWeatherHandler.fail_next = 1
+        response = http_get('weather', url, params={'q': 'Hanoi'})
+        assert response.json()["name"] == "Hanoi"
+        assert get_breaker('weather').retries >= 1
+
+        for _ in range(5):
+            http_get('weather', url)
+
+        pool = upstream_stats()["pools"]["http"]
+        assert pool["connections_opened"] < pool["requests"], "Connections should be reused"
+        print(f"✅ Pool stats: {pool}")
+    finally:
+        server.shutdown()
+
+def test_circuit_breaker_opens_and_recovers():
+    print("🧪 Testing circuit breaker...")
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow(), "Half-open probe should be allowed"
+    assert not breaker.allow(), "Only one probe at a time"
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    print("✅ Breaker opens, probes and closes")
+
+def test_open_breaker_rejects_fast():
+    breaker = get_breaker('vision')
+    breaker.state, breaker.opened_at = 'open', time.time()
+    try:
+        call_with_retry('vision', lambda: "should not run")
+        assert False, "Expected UpstreamUnavailable"
+    except UpstreamUnavailable as e:
+        assert e.upstream == 'vision'
+    finally:
+        breaker.record_success()
+    print("✅ Open breaker rejects without calling upstream")
+
+if __name__ == "__main__":
+    test_weather_retry_and_connection_reuse()
+    test_circuit_breaker_opens_and_recovers()
+    test_open_breaker_rejects_fast()
+    print("\n🎉 Upstream test completed!")
@@ -0,0 +1,20 @@
+"""Production WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+With gunicorn's preload_app this module is imported once in the master. The
+services in WEB_PRELOAD_SERVICES (the TTS model by default) are loaded here,
+before the workers are forked, so every worker shares those pages copy-on-write
+instead of loading its own copy.
+"""
+
+import gc
+from config import Config
+from app import create_app, services
+
+app = create_app(warm_up=False)
+
+# TTS worker pool có thread và socket riêng, không dùng chung qua fork được
+services.warm_up([name for name in Config.WEB_PRELOAD_SERVICES
+                  if not (name == 'tts' and Config.TTS_WORKERS > 0)])
+
+# Đưa các object đã load ra khỏi GC để worker không chạm vào (và copy) các trang nhớ đó
+gc.freeze()